@@ -91,6 +91,10 @@ ACCOUNT_ADAPTER = 'allauth.account.adapter.DefaultAccountAdapter'
 SOCIALACCOUNT_ADAPTER = 'allauth.socialaccount.adapter.DefaultSocialAccountAdapter'
 
 MIDDLEWARE = [
+    # Đặt đầu tiên để đo cả thời gian của các middleware khác (HealthcareApp/instrumentation.py)
+    'HealthcareApp.instrumentation.ServerTimingMiddleware',
+    'HealthcareApp.metrics.MetricsMiddleware',
+    'HealthcareApp.nplusone.NPlusOneMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -99,7 +103,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'allauth.account.middleware.AccountMiddleware'
+    'allauth.account.middleware.AccountMiddleware',
+    'HealthcareApp.profiling.ProfilingMiddleware',
 ]
 
 CORS_ALLOWED_ORIGINS = [
@@ -179,8 +184,9 @@ DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
-        'rest_framework.authentication.TokenAuthentication',
+        # OAuth2Authentication / TokenAuthentication có bộ nhớ đệm token (HealthcareApp/auth_cache.py)
+        'HealthcareApp.auth_cache.CachedOAuth2Authentication',
+        'HealthcareApp.auth_cache.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -189,6 +195,47 @@ REST_FRAMEWORK = {
 
 
 
+# Cache dùng cho kết quả thống kê (HealthcareApp/statistics_cache.py)
+# Khi chạy nhiều worker nên dùng backend dùng chung (Redis/Memcached) để vô hiệu hóa đồng bộ
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'healthcare',
+        'TIMEOUT': 300,
+    }
+}
+
+# Cập nhật tổng của các buổi tập khi sửa bài tập chạy nền (HealthcareApp/workout_totals.py)
+EXERCISE_PROPAGATION_ASYNC = True
+
+# Ảnh đại diện được thu nhỏ và tải lên ở luồng nền (HealthcareApp/avatars.py).
+# Kho ảnh có thể thay bằng 'HealthcareApp.avatars.FileSystemAvatarStorage' (lưu vào MEDIA_ROOT)
+AVATAR_PROCESSING_ASYNC = True
+AVATAR_STORAGE = 'HealthcareApp.avatars.CloudinaryAvatarStorage'
+
+# Bộ nhớ đệm token đã xác thực trong mỗi tiến trình (HealthcareApp/auth_cache.py)
+AUTH_TOKEN_CACHE_TTL = 60  # giây
+AUTH_TOKEN_CACHE_SIZE = 10000
+
+# Đo thời gian xử lý yêu cầu (header Server-Timing, log "HealthcareApp.timing")
+SERVER_TIMING_SAMPLE_RATE = 1.0 if DEBUG else 0.05  # Tỉ lệ yêu cầu được đo chi tiết (số truy vấn, DB, serialize...)
+SERVER_TIMING_SLOW_MS = 1000  # Yêu cầu chậm hơn luôn được ghi log
+SERVER_TIMING_HEADER = True
+
+# Phát hiện truy vấn N+1 (HealthcareApp/nplusone.py): 'off', 'log' (ghi cảnh báo) hoặc 'raise' (kiểm thử)
+NPLUSONE_DETECTION = 'off'
+NPLUSONE_THRESHOLD = 5  # Số lần lặp của cùng một mẫu SELECT trong một yêu cầu
+
+# Số liệu Prometheus tại /metrics/ (HealthcareApp/metrics.py)
+METRICS_DIR = None  # Thư mục ghi số liệu của từng worker (gunicorn nhiều tiến trình), None: chỉ tiến trình hiện tại
+METRICS_FLUSH_INTERVAL = 5  # Số giây tối thiểu giữa hai lần ghi tệp số liệu
+METRICS_SNAPSHOT_MAX_AGE = 3600  # Tệp số liệu không được cập nhật lâu hơn (worker đã dừng) bị xóa
+METRICS_TOKEN = None  # Token Prometheus gửi trong header Authorization: Bearer <METRICS_TOKEN>; None: chỉ nhân viên xem được
+
+# Profile yêu cầu của nhân viên gửi header X-Profile (HealthcareApp/profiling.py), xem tại /admin/profiles/
+PROFILING_DIR = BASE_DIR / 'profiles'  # None: tắt
+PROFILING_MAX_PROFILES = 100  # Chỉ giữ các profile mới nhất
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.mysql',
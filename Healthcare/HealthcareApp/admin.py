@@ -1,6 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.html import format_html
+from . import profiling
 from .utils import summarize_nutrition
 from .forms import CustomUserCreationForm
 from .models import (Diary, Exercise,
@@ -13,6 +17,44 @@ class CourseAppAdminSite(admin.AdminSite):
     site_header = 'Hệ thống kiểm tra sức khỏe'
     site_title = 'Trang Quản Trị'
 
+    def get_urls(self):
+        return [
+            path('profiles/', self.admin_view(self.profile_list), name='request_profiles'),
+            path('profiles/<str:profile_id>/', self.admin_view(self.profile_detail), name='request_profile'),
+            path('profiles/<str:profile_id>/download/', self.admin_view(self.profile_download),
+                 name='request_profile_download'),
+        ] + super().get_urls()
+
+    def profile_list(self, request):
+        """Các yêu cầu đã được profile (HealthcareApp/profiling.py)"""
+        context = {
+            **self.each_context(request),
+            'title': 'Profile yêu cầu',
+            'profiles': profiling.list_profiles(),
+            'profiling_dir': profiling.profile_dir(),
+        }
+        return TemplateResponse(request, 'admin/request_profiles/list.html', context)
+
+    def profile_detail(self, request, profile_id):
+        sort = request.GET.get('sort', 'cumulative')
+        profile = profiling.load(profile_id, sort=sort)
+        if profile is None:
+            raise Http404
+        context = {
+            **self.each_context(request),
+            'title': f'Profile {profile_id}',
+            'profile': profile,
+            'sort': sort,
+            'sort_keys': profiling.SORT_KEYS,
+        }
+        return TemplateResponse(request, 'admin/request_profiles/detail.html', context)
+
+    def profile_download(self, request, profile_id):
+        prof_path = profiling.prof_path(profile_id)
+        if prof_path is None:
+            raise Http404
+        return FileResponse(prof_path.open('rb'), as_attachment=True, filename=prof_path.name)
+
 
 admin_site = CourseAppAdminSite(name='myadmin')
 
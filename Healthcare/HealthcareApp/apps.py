@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class HealthcareappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'HealthcareApp'
+
+    def ready(self):
+        from HealthcareApp import instrumentation, signals  # noqa: F401
+        instrumentation.install()
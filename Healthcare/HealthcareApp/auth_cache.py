@@ -0,0 +1,133 @@
+"""
+Bộ nhớ đệm trong tiến trình cho xác thực bằng OAuth2 access token và DRF Token.
+
+Mỗi token hợp lệ được giữ (user, token) trong một LRU giới hạn số phần tử
+(AUTH_TOKEN_CACHE_SIZE) và thời gian sống (AUTH_TOKEN_CACHE_TTL giây), các yêu
+cầu tiếp theo với cùng token không cần truy vấn bảng token và bảng người dùng.
+
+Mỗi phần tử ghi kèm mã phiên bản của người dùng lưu trong cache dùng chung.
+Thu hồi token, đăng xuất hay mọi thay đổi của người dùng (signals.py, kể cả
+avatar ghi bằng UPDATE trong avatars.py) đổi mã phiên bản, mọi token đã lưu của
+người dùng đó bị bỏ qua ở lần dùng tiếp theo trên mọi worker (khi cache là
+Redis/Memcached; với LocMemCache chỉ trong tiến trình hiện tại, các tiến trình
+khác chờ hết thời gian sống).
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from oauth2_provider.contrib.rest_framework import OAuth2Authentication
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+from HealthcareApp import instrumentation, metrics
+
+VERSION_KEY = 'auth:user-version:{}'
+
+
+class TokenCache:
+    """LRU tối đa `max_size` phần tử, mỗi phần tử sống tối đa `ttl` giây"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            deadline, value = entry
+            if deadline <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+tokens = TokenCache(max_size=getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000),
+                    ttl=getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 60))
+
+
+def user_version(user_id):
+    version = cache.get(VERSION_KEY.format(user_id))
+    if version is None:
+        # Khóa bị xóa khỏi cache: tạo mã mới, các token đã lưu với mã cũ không còn khớp
+        cache.add(VERSION_KEY.format(user_id), str(time.time_ns()), timeout=None)
+        version = cache.get(VERSION_KEY.format(user_id))
+    return version
+
+
+def invalidate_user(user_id):
+    """Bỏ mọi token đã lưu của người dùng, sau khi transaction hiện tại được commit"""
+    if user_id is None:
+        return
+    transaction.on_commit(lambda: cache.set(VERSION_KEY.format(user_id), str(time.time_ns()), timeout=None))
+
+
+def _expired(token):
+    # AccessToken có thời hạn, DRF Token thì không
+    return hasattr(token, 'is_expired') and token.is_expired()
+
+
+def authenticate(raw_key, load):
+    """
+    (user, token) của token `raw_key` từ bộ nhớ đệm, hoặc gọi `load()` (xác
+    thực qua DB) và lưu lại kết quả hợp lệ. Mỗi lần trả về một bản sao của
+    user để yêu cầu này sửa user không ảnh hưởng các yêu cầu khác.
+    """
+    key = hashlib.sha256(raw_key).hexdigest()
+    entry = tokens.get(key)
+    if entry is not None:
+        user, token, version = entry
+        if not _expired(token) and version == user_version(user.pk):
+            metrics.cache_result('auth_token', hit=True)
+            return copy.copy(user), token
+
+    metrics.cache_result('auth_token', hit=False)
+    result = load()
+    if result is not None and result[0] is not None and result[0].pk is not None:
+        user, token = result
+        tokens.set(key, (copy.copy(user), token, user_version(user.pk)))
+    return result
+
+
+class CachedOAuth2Authentication(OAuth2Authentication):
+    """OAuth2Authentication dùng bộ nhớ đệm cho access token gửi trong header Authorization: Bearer"""
+
+    def authenticate(self, request):
+        with instrumentation.timed(instrumentation.AUTH):
+            auth = get_authorization_header(request).split()
+            if len(auth) != 2 or auth[0].lower() != b'bearer':
+                return super().authenticate(request)
+            return authenticate(b'bearer:' + auth[1],
+                                lambda: super(CachedOAuth2Authentication, self).authenticate(request))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication dùng bộ nhớ đệm"""
+
+    def authenticate(self, request):
+        with instrumentation.timed(instrumentation.AUTH):
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        return authenticate(f'token:{key}'.encode(),
+                            lambda: super(CachedTokenAuthentication, self).authenticate_credentials(key))
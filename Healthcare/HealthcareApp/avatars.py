@@ -0,0 +1,152 @@
+"""
+Ảnh đại diện của người dùng.
+
+URL ảnh được tính sẵn khi avatar thay đổi và lưu trong User.avatar_urls
+({'original': ..., 'small': ..., 'medium': ...}), serializer đọc thẳng từ dòng
+dữ liệu thay vì gọi Cloudinary SDK cho từng người dùng ở mỗi lần trả về.
+
+Ảnh mới tải lên (đăng ký, trang quản trị, API) không được upload trong yêu cầu:
+signals.py giữ lại nội dung ảnh, lưu người dùng với avatar cũ và xếp việc xử lý
+vào luồng nền sau khi transaction được commit. Luồng nền thu nhỏ và nén lại ảnh
+(JPEG, tối đa MAX_DIMENSION px), lưu vào kho ảnh AVATAR_STORAGE rồi cập nhật
+avatar và avatar_urls của người dùng.
+"""
+import io
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import cloudinary.uploader
+from cloudinary import CloudinaryResource
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import UploadedFile
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps
+
+from HealthcareApp import auth_cache
+from HealthcareApp.models import User
+
+logger = logging.getLogger(__name__)
+
+ORIGINAL = 'original'
+# Ảnh thu nhỏ vuông, cắt theo khuôn mặt
+THUMBNAIL_SIZES = {'small': 64, 'medium': 256}
+FOLDER = 'user_avatar'
+
+MAX_DIMENSION = 1024
+JPEG_QUALITY = 85
+
+# Một luồng nền: các ảnh được xử lý theo thứ tự tải lên, ảnh sau cùng của một người dùng được giữ lại
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='avatar-processing')
+
+
+def _resource(avatar):
+    if isinstance(avatar, CloudinaryResource):
+        return avatar
+    # Giá trị dạng chuỗi lưu trong DB, ví dụ "image/upload/v1712/user_avatar/abc.jpg"
+    return User._meta.get_field('avatar').parse_cloudinary_resource(str(avatar))
+
+
+class CloudinaryAvatarStorage:
+    """Lưu ảnh lên Cloudinary, ảnh thu nhỏ được Cloudinary tạo qua tham số biến đổi trong URL"""
+
+    def save(self, name, content):
+        """Lưu ảnh JPEG `content` (bytes), trả về giá trị lưu vào trường User.avatar"""
+        resource = cloudinary.uploader.upload_resource(io.BytesIO(content), folder=FOLDER, public_id=name,
+                                                       resource_type='image')
+        return resource.get_prep_value()
+
+    def urls(self, avatar):
+        resource = _resource(avatar)
+        urls = {ORIGINAL: resource.build_url()}
+        for size_name, size in THUMBNAIL_SIZES.items():
+            urls[size_name] = resource.build_url(width=size, height=size, crop='fill', gravity='face')
+        return urls
+
+
+class FileSystemAvatarStorage:
+    """Lưu ảnh vào MEDIA_ROOT/user_avatar (kiểm thử, môi trường phát triển), mọi kích thước dùng chung một ảnh"""
+
+    def __init__(self):
+        self.storage = FileSystemStorage()
+
+    def save(self, name, content):
+        return self.storage.save(f'{FOLDER}/{name}.jpg', ContentFile(content))
+
+    def urls(self, avatar):
+        resource = _resource(avatar)
+        path = f'{resource.public_id}.{resource.format}' if resource.format else resource.public_id
+        url = self.storage.url(path)
+        return {ORIGINAL: url, **{size_name: url for size_name in THUMBNAIL_SIZES}}
+
+
+def get_storage():
+    return import_string(getattr(settings, 'AVATAR_STORAGE', 'HealthcareApp.avatars.CloudinaryAvatarStorage'))()
+
+
+def avatar_key(avatar):
+    """Giá trị so sánh được của avatar (chuỗi lưu trong DB), None nếu không có hoặc chưa được tải lên"""
+    if not avatar or isinstance(avatar, UploadedFile):
+        return None
+    if isinstance(avatar, CloudinaryResource):
+        return avatar.get_prep_value()
+    return str(avatar)
+
+
+def build_urls(avatar):
+    """{kích thước: URL} của avatar, {} nếu không có"""
+    if not avatar:
+        return {}
+    return get_storage().urls(avatar)
+
+
+def refresh_urls(user):
+    """Tính lại và lưu avatar_urls của `user` (một UPDATE, không gửi lại post_save nên tự bỏ token đã lưu)"""
+    user.avatar_urls = build_urls(user.avatar)
+    User.objects.filter(pk=user.pk).update(avatar_urls=user.avatar_urls)
+    auth_cache.invalidate_user(user.pk)
+
+
+def prepare(data):
+    """Xoay theo EXIF, thu nhỏ về tối đa MAX_DIMENSION px và nén lại thành JPEG"""
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image.thumbnail((MAX_DIMENSION, MAX_DIMENSION))
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+    return output.getvalue()
+
+
+def process_avatar(user_id, data):
+    """Xử lý và lưu ảnh `data` (bytes ảnh gốc), cập nhật avatar của người dùng `user_id`"""
+    value = get_storage().save(f'{user_id}_{uuid.uuid4().hex}', prepare(data))
+    # update() không gửi post_save: avatar_urls được ghi cùng lúc
+    User.objects.filter(pk=user_id).update(avatar=value, avatar_urls=build_urls(value))
+    auth_cache.invalidate_user(user_id)
+    return value
+
+
+def _run_processing(user_id, data):
+    try:
+        process_avatar(user_id, data)
+    except Exception:
+        logger.exception("Lỗi khi xử lý ảnh đại diện của người dùng %s", user_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_processing(user_id, data):
+    """
+    Xử lý ảnh sau khi transaction hiện tại được commit: chạy nền nếu
+    AVATAR_PROCESSING_ASYNC, ngược lại chạy ngay.
+    """
+    def run():
+        if getattr(settings, 'AVATAR_PROCESSING_ASYNC', True):
+            _executor.submit(_run_processing, user_id, data)
+        else:
+            process_avatar(user_id, data)
+
+    transaction.on_commit(run)
@@ -0,0 +1,84 @@
+"""
+Danh mục dùng chung cho mọi người dùng (bài tập gợi ý, nhóm cơ) được phục vụ
+từ bản chụp trong bộ nhớ của từng tiến trình, kèm ETag mạnh.
+
+Mã phiên bản của danh mục được lưu trong cache (dùng chung giữa các worker khi
+cache là Redis/Memcached) và được đổi khi Exercise/MuscleGroup thay đổi (xem
+signals.py). Mỗi tiến trình chỉ truy vấn và serialize lại khi mã phiên bản
+khác với bản chụp đang giữ.
+"""
+import hashlib
+import json
+import threading
+import time
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.response import Response
+
+from HealthcareApp import conditional, metrics
+from HealthcareApp.models import Exercise, MuscleGroup
+from HealthcareApp.query_planner import optimize_queryset
+from HealthcareApp.serializers import ExerciseSerializer, MuscleGroupSerializer
+
+VERSION_KEY = 'catalog:version'
+
+SUGGESTED_EXERCISES = 'suggested-exercises'
+MUSCLE_GROUPS = 'muscle-groups'
+
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def _suggested_exercises():
+    queryset = Exercise.objects.filter(created_by__isnull=True, is_active=True).order_by('id')
+    return ExerciseSerializer(optimize_queryset(queryset, ExerciseSerializer), many=True).data
+
+
+def _muscle_groups():
+    return MuscleGroupSerializer(MuscleGroup.objects.filter(is_active=True).order_by('id'), many=True).data
+
+
+BUILDERS = {
+    SUGGESTED_EXERCISES: _suggested_exercises,
+    MUSCLE_GROUPS: _muscle_groups,
+}
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Khóa bị xóa khỏi cache: tạo mã mới để các tiến trình dựng lại bản chụp
+        cache.add(VERSION_KEY, str(time.time_ns()), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """Đánh dấu danh mục đã thay đổi, mọi tiến trình sẽ dựng lại bản chụp ở lần đọc tiếp theo"""
+    cache.set(VERSION_KEY, str(time.time_ns()), timeout=None)
+
+
+def get(kind):
+    """Dữ liệu và ETag của danh mục `kind`, dựng lại nếu phiên bản đã thay đổi"""
+    version = current_version()
+    snapshot = _snapshots.get(kind)
+    metrics.cache_result('catalog', hit=snapshot is not None and snapshot[0] == version)
+    if snapshot is None or snapshot[0] != version:
+        with _lock:
+            snapshot = _snapshots.get(kind)
+            if snapshot is None or snapshot[0] != version:
+                data = [dict(item) for item in BUILDERS[kind]()]
+                body = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+                etag = f'"{hashlib.md5(body.encode()).hexdigest()}"'
+                snapshot = (version, data, etag)
+                _snapshots[kind] = snapshot
+    return snapshot[1], snapshot[2]
+
+
+def respond(request, kind):
+    """Trả về danh mục, hoặc 304 nếu If-None-Match khớp với ETag hiện tại"""
+    data, etag = get(kind)
+    if conditional.etag_matches(request, etag):
+        return conditional.not_modified(etag)
+    return Response(data, headers={'ETag': etag})
@@ -0,0 +1,103 @@
+"""
+GET có điều kiện (ETag / If-None-Match, Last-Modified / If-Modified-Since)
+cho các viewset có trường updated_date.
+
+Validator được tính bằng một truy vấn tổng hợp trên queryset (max updated_date,
+số dòng và max updated_date của các quan hệ được hiển thị lồng), không cần
+serialize dữ liệu. Danh sách chỉ dùng ETag vì thời điểm sửa mới nhất không
+phản ánh được việc xóa bản ghi; If-Modified-Since chỉ áp dụng cho một đối tượng.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from HealthcareApp import metrics
+
+
+def etag_matches(request, etag):
+    """If-None-Match khớp với `etag` (so sánh yếu, chấp nhận '*')"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    client_etags = {tag.removeprefix('W/') for tag in parse_etags(header)}
+    matches = etag in client_etags or '*' in client_etags
+    metrics.cache_result('http_conditional', hit=matches)
+    return matches
+
+
+def not_modified(etag, last_modified=None):
+    response = Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def validator(request, queryset, related=()):
+    """
+    (etag, last_modified) của queryset: một truy vấn aggregate gồm max
+    updated_date, số dòng và max `<quan hệ>__updated_date` của từng quan hệ
+    trong `related`. ETag gắn với người dùng, đường dẫn đầy đủ (kể cả tham số)
+    và định dạng trả về.
+    """
+    aggregates = {'last_modified': Max('updated_date'), 'rows': Count('pk', distinct=bool(related))}
+    for index, lookup in enumerate(related):
+        aggregates[f'related_{index}'] = Max(f'{lookup}__updated_date')
+    values = queryset.order_by().aggregate(**aggregates)
+
+    modified = [value for key, value in values.items() if key != 'rows' and value is not None]
+    last_modified = max(modified) if modified else None
+
+    raw = '|'.join(str(values[key]) for key in sorted(values))
+    renderer = getattr(request, 'accepted_renderer', None)
+    raw = f'{request.user.pk}|{request.get_full_path()}|{getattr(renderer, "format", "")}|{raw}'
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"', last_modified
+
+
+def _modified_since(request, last_modified):
+    if last_modified is None or 'If-None-Match' in request.headers:
+        return True
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    # HTTP date chỉ chính xác đến giây
+    return since is None or int(last_modified.timestamp()) > since
+
+
+class ConditionalGetMixin:
+    """
+    Trả về 304 cho list/retrieve khi dữ liệu không đổi kể từ lần tải trước.
+    `conditional_related`: các quan hệ được serializer hiển thị lồng (ví dụ
+    'exercise', 'exercise__muscle_groups'), thay đổi của chúng cũng làm đổi
+    validator. Thêm/bớt phần tử của quan hệ many-to-many không đổi updated_date
+    của các bản ghi liên quan, nên signals.py cập nhật updated_date của đối
+    tượng chứa quan hệ khi có m2m_changed.
+    """
+    conditional_related = ()
+
+    def list(self, request, *args, **kwargs):
+        etag, _ = validator(request, self.filter_queryset(self.get_queryset()), self.conditional_related)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        etag, last_modified = validator(request, queryset, self.conditional_related)
+        if last_modified is not None and (etag_matches(request, etag)
+                                          or not _modified_since(request, last_modified)):
+            return not_modified(etag, last_modified)
+
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
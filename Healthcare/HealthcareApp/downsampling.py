@@ -0,0 +1,73 @@
+"""
+Giảm số điểm của chuỗi thời gian trước khi trả về cho biểu đồ trên điện thoại.
+
+Cả hai thuật toán duyệt chuỗi đúng một lượt (O(n)) và giữ nguyên điểm đầu,
+điểm cuối. Điểm có dạng (x, y) với x là số (timestamp) tăng dần.
+"""
+LTTB = 'lttb'
+MINMAX = 'minmax'
+METHODS = (LTTB, MINMAX)
+
+
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets: chọn điểm tạo tam giác lớn nhất trong mỗi nhóm"""
+    size = len(points)
+    if threshold >= size or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (size - 2) / (threshold - 2)
+    selected = 0
+
+    for i in range(threshold - 2):
+        # Trung bình của nhóm kế tiếp
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, size)
+        avg_count = avg_end - avg_start
+        avg_x = sum(points[j][0] for j in range(avg_start, avg_end)) / avg_count
+        avg_y = sum(points[j][1] for j in range(avg_start, avg_end)) / avg_count
+
+        # Chọn điểm trong nhóm hiện tại tạo tam giác lớn nhất với điểm đã chọn và điểm trung bình
+        point_x, point_y = points[selected][0], points[selected][1]
+        max_area = -1
+        next_selected = selected
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((point_x - avg_x) * (points[j][1] - point_y)
+                       - (point_x - points[j][0]) * (avg_y - point_y))
+            if area > max_area:
+                max_area = area
+                next_selected = j
+
+        sampled.append(points[next_selected])
+        selected = next_selected
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def minmax(points, threshold):
+    """Chia chuỗi thành các nhóm, giữ điểm nhỏ nhất và lớn nhất của mỗi nhóm (theo thứ tự thời gian)"""
+    size = len(points)
+    if threshold >= size or threshold < 4:
+        return list(points)
+
+    buckets = (threshold - 2) // 2
+    every = (size - 2) / buckets
+    sampled = [points[0]]
+    for i in range(buckets):
+        start = int(i * every) + 1
+        end = min(int((i + 1) * every) + 1, size - 1)
+        if start >= end:
+            continue
+        low = min(range(start, end), key=lambda j: points[j][1])
+        high = max(range(start, end), key=lambda j: points[j][1])
+        for j in sorted({low, high}):
+            sampled.append(points[j])
+    sampled.append(points[-1])
+    return sampled
+
+
+def downsample(points, max_points, method=LTTB):
+    if method == MINMAX:
+        return minmax(points, max_points)
+    return lttb(points, max_points)
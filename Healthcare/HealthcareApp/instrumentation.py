@@ -0,0 +1,160 @@
+"""
+Đo thời gian xử lý yêu cầu: số truy vấn và thời gian DB, thời gian xác thực,
+serialize, view và tổng, trả về trong header Server-Timing và ghi log có cấu
+trúc (logger "HealthcareApp.timing").
+
+Chỉ một phần yêu cầu được đo chi tiết (SERVER_TIMING_SAMPLE_RATE) để có thể bật
+thường trực trên production; yêu cầu không được lấy mẫu chỉ đo thời gian tổng
+và được ghi log nếu chậm hơn SERVER_TIMING_SLOW_MS.
+"""
+import contextvars
+import logging
+import random
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger('HealthcareApp.timing')
+
+DB = 'db'
+AUTH = 'auth'
+SERIALIZE = 'serialize'
+VIEW = 'view'
+TOTAL = 'total'
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Số truy vấn và thời gian (giây) theo từng phần của một yêu cầu"""
+
+    def __init__(self):
+        self.queries = 0
+        self.durations = defaultdict(float)
+        self.view_name = None
+
+    def add(self, name, seconds):
+        self.durations[name] += seconds
+
+    def as_dict(self):
+        data = {f'{name}_ms': round(seconds * 1000, 2) for name, seconds in self.durations.items()}
+        data['db_queries'] = self.queries
+        data['view_name'] = self.view_name
+        return data
+
+    def header(self):
+        parts = []
+        for name in (DB, AUTH, SERIALIZE, VIEW, TOTAL):
+            if name in self.durations or name == DB:
+                part = f'{name};dur={self.durations[name] * 1000:.1f}'
+                if name == DB:
+                    part += f';desc="{self.queries} queries"'
+                parts.append(part)
+        return ', '.join(parts)
+
+
+def current():
+    """RequestTimings của yêu cầu đang được đo, None nếu yêu cầu không được lấy mẫu"""
+    return _current.get()
+
+
+@contextmanager
+def timed(name):
+    """Cộng thời gian chạy của khối lệnh vào phần `name` của yêu cầu đang được đo"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if timings is not None:
+            timings.queries += 1
+            timings.add(DB, time.perf_counter() - start)
+
+
+def _timed_serializer_data(fget):
+    # Serializer lồng nhau gọi to_representation chứ không gọi .data nên chỉ serializer ngoài cùng được đo
+    def data(self):
+        with timed(SERIALIZE):
+            return fget(self)
+    data._timed = True
+    return data
+
+
+def install():
+    """Đo thời gian serialize qua BaseSerializer.data (gọi một lần từ AppConfig.ready)"""
+    fget = BaseSerializer.data.fget
+    if not getattr(fget, '_timed', False):
+        BaseSerializer.data = property(_timed_serializer_data(fget))
+
+
+def _view_name(view_func):
+    view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+    return (view_class or view_func).__name__
+
+
+class ServerTimingMiddleware:
+    """
+    Đặt ở đầu MIDDLEWARE để thời gian tổng gồm cả các middleware còn lại.
+    Cấu hình: SERVER_TIMING_SAMPLE_RATE (0-1), SERVER_TIMING_SLOW_MS,
+    SERVER_TIMING_HEADER (có trả header Server-Timing hay không).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'SERVER_TIMING_SAMPLE_RATE', 0.1)
+        self.slow_ms = getattr(settings, 'SERVER_TIMING_SLOW_MS', 1000)
+        self.send_header = getattr(settings, 'SERVER_TIMING_HEADER', True)
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        if random.random() >= self.sample_rate:
+            response = self.get_response(request)
+            total_ms = (time.perf_counter() - start) * 1000
+            if total_ms >= self.slow_ms:
+                self.log(request, response, {'total_ms': round(total_ms, 2), 'sampled': False})
+            return response
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+            view_start = getattr(request, '_timing_view_start', None)
+            if view_start is not None:
+                timings.add(VIEW, time.perf_counter() - view_start)
+            timings.add(TOTAL, time.perf_counter() - start)
+
+        if self.send_header:
+            response['Server-Timing'] = timings.header()
+        self.log(request, response, {**timings.as_dict(), 'sampled': True})
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = _current.get()
+        if timings is not None:
+            timings.view_name = _view_name(view_func)
+            request._timing_view_start = time.perf_counter()
+
+    def log(self, request, response, data):
+        data = {'method': request.method, 'path': request.path, 'status': response.status_code, **data}
+        logger.info(' '.join(f'{key}={value}' for key, value in data.items()), extra={'timing': data})
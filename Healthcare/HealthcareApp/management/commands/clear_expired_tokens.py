@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from HealthcareApp import token_cleanup
+
+
+class Command(BaseCommand):
+    help = "Xóa token OAuth2 hết hạn theo từng lô (chạy định kỳ, ví dụ bằng cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=token_cleanup.BATCH_SIZE,
+                            help="Số dòng xóa trong mỗi lô")
+
+    def handle(self, *args, **options):
+        deleted = token_cleanup.clear_expired_tokens(batch_size=options['batch_size'])
+        for kind, count in deleted.items():
+            self.stdout.write(f"{kind}: {count}")
+        self.stdout.write(self.style.SUCCESS("Đã xóa token hết hạn"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from HealthcareApp import workout_totals
+from HealthcareApp.models import Exercise
+
+
+class Command(BaseCommand):
+    help = "Tính lại tổng của các buổi tập chứa các bài tập đã cho (theo từng nhóm buổi tập)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('exercise_ids', type=int, nargs='+')
+        parser.add_argument('--chunk-size', type=int, default=workout_totals.PROPAGATION_CHUNK_SIZE,
+                            help="Số buổi tập mỗi lần cập nhật")
+
+    def handle(self, *args, **options):
+        exercise_ids = options['exercise_ids']
+        missing = set(exercise_ids) - set(Exercise.objects.filter(id__in=exercise_ids).values_list('id', flat=True))
+        if missing:
+            raise CommandError(f"Không tìm thấy bài tập: {', '.join(map(str, sorted(missing)))}")
+
+        for exercise_id in exercise_ids:
+            updated = workout_totals.propagate_exercise(exercise_id, chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f"Bài tập {exercise_id}: đã cập nhật {updated} buổi tập"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from HealthcareApp import search_index
+
+
+class Command(BaseCommand):
+    help = "Dựng lại chỉ mục tìm kiếm bài tập (ExerciseSearchTerm)"
+
+    def handle(self, *args, **options):
+        count = search_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Đã đánh chỉ mục {count} bài tập"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from HealthcareApp import rollups
+from HealthcareApp.models import HealthStat, WorkoutSession
+
+
+class Command(BaseCommand):
+    help = "Dựng lại bảng tổng hợp thống kê theo ngày/tháng từ HealthStat và WorkoutSession"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, nargs='*', dest='user_ids',
+                            help="Chỉ dựng lại cho các user id này")
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if not user_ids:
+            user_ids = set(HealthStat.objects.values_list('user_id', flat=True).distinct())
+            user_ids |= set(WorkoutSession.objects.exclude(user=None).values_list('user_id', flat=True).distinct())
+
+        total_days = 0
+        for user_id in sorted(user_ids):
+            total_days += rollups.rebuild_user(user_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã dựng lại thống kê cho {len(user_ids)} người dùng ({total_days} ngày)"
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from HealthcareApp import user_search
+
+
+class Command(BaseCommand):
+    help = "Dựng lại chỉ mục tìm kiếm người dùng (UserSearchTerm)"
+
+    def handle(self, *args, **options):
+        count = user_search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Đã đánh chỉ mục {count} người dùng"))
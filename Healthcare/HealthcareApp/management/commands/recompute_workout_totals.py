@@ -0,0 +1,20 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from HealthcareApp import workout_totals
+
+
+class Command(BaseCommand):
+    help = ("Tính lại total_duration và calories_burned của mọi WorkoutSession từ các bài tập, "
+            "bảng tổng hợp thống kê được cập nhật theo chênh lệch")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild-statistics', action='store_true',
+                            help="Dựng lại toàn bộ bảng tổng hợp thống kê sau khi tính lại")
+
+    def handle(self, *args, **options):
+        updated = workout_totals.recompute_all()
+        self.stdout.write(self.style.SUCCESS(f"Đã tính lại tổng cho {updated} buổi tập"))
+
+        if options['rebuild_statistics']:
+            call_command('rebuild_statistics', stdout=self.stdout)
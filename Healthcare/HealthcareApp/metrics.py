@@ -0,0 +1,228 @@
+"""
+Số liệu theo route (định dạng văn bản Prometheus) tại endpoint metrics/.
+
+Mỗi tiến trình cộng dồn số liệu trong bộ nhớ. Khi METRICS_DIR được cấu hình
+(nên là thư mục riêng, xóa trống mỗi lần khởi động dịch vụ), mỗi tiến trình
+ghi bản chụp số liệu của mình vào một tệp riêng tối đa mỗi
+METRICS_FLUSH_INTERVAL giây, endpoint cộng các tệp của mọi worker lại. Tệp
+không được cập nhật quá METRICS_SNAPSHOT_MAX_AGE giây (worker đã dừng) bị xóa.
+Không cấu hình METRICS_DIR thì endpoint chỉ thấy số liệu của tiến trình trả lời.
+
+Endpoint chỉ trả số liệu cho Prometheus gửi header Authorization: Bearer
+<METRICS_TOKEN> hoặc nhân viên đã đăng nhập (session).
+
+Route là "<basename>.<action>" với viewset của router (ví dụ
+"health-statistic.list") và mẫu URL với các view khác (ví dụ
+"api/my-statistics/").
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# tên: (loại, mô tả, nhãn, bucket)
+METRICS = {
+    'http_requests_total': (COUNTER, "Số yêu cầu theo route, phương thức và mã trạng thái",
+                            ('route', 'method', 'status'), None),
+    'http_request_duration_seconds': (HISTOGRAM, "Thời gian xử lý yêu cầu (giây)", ('route',), LATENCY_BUCKETS),
+    'http_request_db_queries': (HISTOGRAM, "Số truy vấn DB của mỗi yêu cầu", ('route',), QUERY_BUCKETS),
+    'http_response_size_bytes': (HISTOGRAM, "Kích thước nội dung trả về (byte)", ('route',), SIZE_BUCKETS),
+    'cache_requests_total': (COUNTER, "Số lần đọc bộ nhớ đệm theo kết quả (hit/miss)", ('cache', 'result'), None),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Registry:
+    """Số liệu của tiến trình hiện tại: counter {nhãn: giá trị}, histogram {nhãn: [bucket..., +Inf, sum]}"""
+
+    def __init__(self):
+        self._values = {name: {} for name in METRICS}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        # pid và thời điểm khởi động: tiến trình mới dùng lại pid không ghi đè tệp của tiến trình cũ
+        self._filename = f'metrics-{os.getpid()}-{time.time_ns()}.json'
+
+    def inc(self, name, labels, value=1):
+        key = tuple(labels)
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][3]
+        key = tuple(labels)
+        with self._lock:
+            series = self._values[name]
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * (len(buckets) + 1) + [0.0]
+            # Lưu số lần rơi vào từng bucket, cộng dồn khi xuất
+            counts[bisect_left(buckets, value)] += 1
+            counts[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {name: [[list(key), value if isinstance(value, (int, float)) else list(value)]
+                           for key, value in series.items()]
+                    for name, series in self._values.items()}
+
+    def flush(self, force=False):
+        """Ghi bản chụp vào METRICS_DIR (ghi tệp tạm rồi đổi tên để không ai đọc được tệp ghi dở)"""
+        directory = getattr(settings, 'METRICS_DIR', None)
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        now = time.monotonic()
+        if not directory or (not force and now - self._last_flush < interval):
+            return
+        self._last_flush = now
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        temporary = path / f'.{self._filename}.tmp'
+        temporary.write_text(json.dumps(self.snapshot()))
+        os.replace(temporary, path / self._filename)
+
+
+registry = Registry()
+
+
+def inc(name, labels, value=1):
+    registry.inc(name, labels, value)
+
+
+def observe(name, labels, value):
+    registry.observe(name, labels, value)
+
+
+def cache_result(cache_name, hit, count=1):
+    """Ghi nhận `count` lần đọc bộ nhớ đệm `cache_name` trúng (hit) hoặc trượt"""
+    if count:
+        registry.inc('cache_requests_total', (cache_name, 'hit' if hit else 'miss'), count)
+
+
+def collect():
+    """Số liệu của mọi worker (các tệp trong METRICS_DIR), hoặc của tiến trình hiện tại"""
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        snapshots = [registry.snapshot()]
+    else:
+        registry.flush(force=True)
+        snapshots = []
+        max_age = getattr(settings, 'METRICS_SNAPSHOT_MAX_AGE', 3600)
+        for path in Path(directory).glob('metrics-*.json'):
+            try:
+                if time.time() - path.stat().st_mtime > max_age:
+                    # Worker đã dừng; worker còn chạy sẽ ghi lại tệp ở lần ghi tiếp theo
+                    path.unlink(missing_ok=True)
+                    continue
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+
+    merged = {name: {} for name in METRICS}
+    for snapshot in snapshots:
+        for name, series in snapshot.items():
+            if name not in merged:
+                continue
+            for key, value in series:
+                key = tuple(key)
+                if isinstance(value, list):
+                    current = merged[name].setdefault(key, [0] * len(value))
+                    merged[name][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    merged[name][key] = merged[name].get(key, 0) + value
+    return merged
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def render(merged):
+    lines = []
+    for name, (kind, description, label_names, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for key, value in sorted(merged[name].items()):
+            if kind == COUNTER:
+                lines.append(f'{name}{_labels(label_names, key)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), value[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(label_names, key, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(label_names, key)} {value[-1]}')
+            lines.append(f'{name}_count{_labels(label_names, key)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Endpoint cho Prometheus (header Authorization: Bearer <METRICS_TOKEN>) hoặc nhân viên đã đăng nhập"""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    authorized = bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    user = getattr(request, 'user', None)
+    if not authorized and not (user is not None and user.is_active and user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(render(collect()), content_type=CONTENT_TYPE)
+
+
+def route_name(request, view_func):
+    view_class = getattr(view_func, 'cls', None)
+    actions = getattr(view_func, 'actions', None)
+    basename = getattr(view_func, 'initkwargs', {}).get('basename')
+    if view_class is not None and actions and basename:
+        return f"{basename}.{actions.get(request.method.lower(), request.method.lower())}"
+    match = request.resolver_match
+    return match.route if match is not None else view_func.__name__
+
+
+class MetricsMiddleware:
+    """Ghi số yêu cầu, thời gian, số truy vấn DB và kích thước nội dung theo route"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        route = getattr(request, '_metrics_route', None) or 'unmatched'
+        registry.inc('http_requests_total', (route, request.method, response.status_code))
+        registry.observe('http_request_duration_seconds', (route,), duration)
+        registry.observe('http_request_db_queries', (route,), queries[0])
+        if not response.streaming:
+            registry.observe('http_response_size_bytes', (route,), len(response.content))
+        registry.flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_route = route_name(request, view_func)
@@ -0,0 +1,160 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:41
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+HEALTH_FIELDS = ('weight', 'bmi', 'water_intake', 'step_count', 'heart_rate')
+SUM_FIELDS = ('sessions', 'calories_burned', 'total_duration', 'health_records',
+              'weight_sum', 'weight_count', 'bmi_sum', 'bmi_count',
+              'water_intake_sum', 'step_count_sum', 'heart_rate_sum', 'heart_rate_count')
+LATEST_FIELDS = tuple(f'latest_{field}' for field in HEALTH_FIELDS)
+
+
+def _empty():
+    return {**dict.fromkeys(SUM_FIELDS, 0), **dict.fromkeys(LATEST_FIELDS),
+            'first_stat_id': None, 'first_weight': None, 'latest_stat_id': None}
+
+
+def _add_health(totals, row):
+    totals['health_records'] += 1
+    for field in ('weight', 'bmi', 'heart_rate'):
+        if row[field] is not None:
+            totals[f'{field}_sum'] += row[field]
+            totals[f'{field}_count'] += 1
+    totals['water_intake_sum'] += row['water_intake'] or 0
+    totals['step_count_sum'] += row['step_count'] or 0
+    if totals['first_stat_id'] is None:
+        totals['first_stat_id'] = row['id']
+        totals['first_weight'] = row['weight']
+    totals['latest_stat_id'] = row['id']
+    for field in HEALTH_FIELDS:
+        totals[f'latest_{field}'] = row[field]
+
+
+def _merge(totals, other):
+    for field in SUM_FIELDS:
+        totals[field] += other[field]
+    if other['health_records']:
+        if totals['first_stat_id'] is None:
+            totals['first_stat_id'] = other['first_stat_id']
+            totals['first_weight'] = other['first_weight']
+        totals['latest_stat_id'] = other['latest_stat_id']
+        for field in LATEST_FIELDS:
+            totals[field] = other[field]
+
+
+def build_rollups(apps, schema_editor):
+    # Dựng bảng tổng hợp từ dữ liệu đã có (cùng cách tính với rollups.rebuild_user),
+    # sau đó bảng được cập nhật khi dữ liệu thay đổi (signals.py)
+    HealthStat = apps.get_model('HealthcareApp', 'HealthStat')
+    WorkoutSession = apps.get_model('HealthcareApp', 'WorkoutSession')
+    DailyStatistic = apps.get_model('HealthcareApp', 'DailyStatistic')
+    MonthlyStatistic = apps.get_model('HealthcareApp', 'MonthlyStatistic')
+
+    user_ids = set(HealthStat.objects.values_list('user_id', flat=True).distinct())
+    user_ids |= set(WorkoutSession.objects.exclude(user=None).values_list('user_id', flat=True).distinct())
+    for user_id in sorted(user_ids):
+        daily = defaultdict(_empty)
+        for row in HealthStat.objects.filter(user_id=user_id).order_by('date', 'id').values(
+                'id', 'date', *HEALTH_FIELDS).iterator(chunk_size=2000):
+            _add_health(daily[row['date'].date()], row)
+        for row in WorkoutSession.objects.filter(user_id=user_id, is_active=True).annotate(
+                day=TruncDate('updated_date')
+        ).values('day').annotate(
+            count=Count('id'), calories=Sum('calories_burned'), duration=Sum('total_duration')
+        ).order_by():
+            totals = daily[row['day']]
+            totals['sessions'] += row['count'] or 0
+            totals['calories_burned'] += row['calories'] or 0
+            totals['total_duration'] += row['duration'] or 0
+
+        monthly = defaultdict(_empty)
+        for day in sorted(daily):
+            _merge(monthly[day.replace(day=1)], daily[day])
+
+        DailyStatistic.objects.bulk_create([
+            DailyStatistic(user_id=user_id, period_start=day, **totals) for day, totals in daily.items()
+        ], batch_size=1000)
+        MonthlyStatistic.objects.bulk_create([
+            MonthlyStatistic(user_id=user_id, period_start=month, **totals) for month, totals in monthly.items()
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HealthcareApp', '0010_alter_user_date_of_birth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('sessions', models.IntegerField(default=0)),
+                ('calories_burned', models.FloatField(default=0)),
+                ('total_duration', models.IntegerField(default=0)),
+                ('health_records', models.IntegerField(default=0)),
+                ('weight_sum', models.FloatField(default=0)),
+                ('weight_count', models.IntegerField(default=0)),
+                ('bmi_sum', models.FloatField(default=0)),
+                ('bmi_count', models.IntegerField(default=0)),
+                ('water_intake_sum', models.FloatField(default=0)),
+                ('step_count_sum', models.BigIntegerField(default=0)),
+                ('heart_rate_sum', models.BigIntegerField(default=0)),
+                ('heart_rate_count', models.IntegerField(default=0)),
+                ('first_weight', models.FloatField(blank=True, null=True)),
+                ('latest_weight', models.FloatField(blank=True, null=True)),
+                ('latest_bmi', models.FloatField(blank=True, null=True)),
+                ('latest_water_intake', models.FloatField(blank=True, null=True)),
+                ('latest_step_count', models.IntegerField(blank=True, null=True)),
+                ('latest_heart_rate', models.IntegerField(blank=True, null=True)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+                ('first_stat', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='HealthcareApp.healthstat')),
+                ('latest_stat', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='HealthcareApp.healthstat')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_statistics', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'period_start')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('sessions', models.IntegerField(default=0)),
+                ('calories_burned', models.FloatField(default=0)),
+                ('total_duration', models.IntegerField(default=0)),
+                ('health_records', models.IntegerField(default=0)),
+                ('weight_sum', models.FloatField(default=0)),
+                ('weight_count', models.IntegerField(default=0)),
+                ('bmi_sum', models.FloatField(default=0)),
+                ('bmi_count', models.IntegerField(default=0)),
+                ('water_intake_sum', models.FloatField(default=0)),
+                ('step_count_sum', models.BigIntegerField(default=0)),
+                ('heart_rate_sum', models.BigIntegerField(default=0)),
+                ('heart_rate_count', models.IntegerField(default=0)),
+                ('first_weight', models.FloatField(blank=True, null=True)),
+                ('latest_weight', models.FloatField(blank=True, null=True)),
+                ('latest_bmi', models.FloatField(blank=True, null=True)),
+                ('latest_water_intake', models.FloatField(blank=True, null=True)),
+                ('latest_step_count', models.IntegerField(blank=True, null=True)),
+                ('latest_heart_rate', models.IntegerField(blank=True, null=True)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+                ('first_stat', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='HealthcareApp.healthstat')),
+                ('latest_stat', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='HealthcareApp.healthstat')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_statistics', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'period_start')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
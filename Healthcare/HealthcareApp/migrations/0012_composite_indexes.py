@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HealthcareApp', '0011_dailystatistic_monthlystatistic'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(fields=['created_by', 'is_active'], name='exercise_creator_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthstat',
+            index=models.Index(fields=['user', 'date', 'id'], name='healthstat_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutsession',
+            index=models.Index(fields=['user', 'is_active', 'updated_date'], name='workout_user_active_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutsession',
+            index=models.Index(fields=['user', 'schedule'], name='workout_user_schedule_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HealthcareApp', '0012_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='healthstat',
+            name='date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HealthcareApp', '0013_alter_healthstat_date_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='healthstat',
+            name='updated_date',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.7 on 2026-10-19 03:01
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Bản sao cách tách từ của search_index.py tại thời điểm tạo migration: migration
+# không import mã của ứng dụng vì mã đó có thể thay đổi sau này
+FIELD_WEIGHTS = (('name', 3), ('equipment', 2), ('description', 1))
+MAX_TERM_LENGTH = 64
+
+_WORD = re.compile(r'\w+')
+
+
+def fold(text):
+    text = unicodedata.normalize('NFD', text.lower().replace('đ', 'd'))
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def terms_for(exercise):
+    terms = {}
+    for field, weight in FIELD_WEIGHTS:
+        for term in _WORD.findall(fold(getattr(exercise, field) or '')):
+            term = term[:MAX_TERM_LENGTH]
+            terms[term] = max(weight, terms.get(term, 0))
+    return terms
+
+
+def build_search_index(apps, schema_editor):
+    # Đánh chỉ mục các bài tập đã có; bài tập mới được đánh chỉ mục khi lưu (signals.py)
+    Exercise = apps.get_model('HealthcareApp', 'Exercise')
+    ExerciseSearchTerm = apps.get_model('HealthcareApp', 'ExerciseSearchTerm')
+    rows = [
+        ExerciseSearchTerm(exercise_id=exercise.id, term=term, weight=weight, owner_id=exercise.created_by_id)
+        for exercise in Exercise.objects.filter(is_active=True).iterator()
+        for term, weight in terms_for(exercise).items()
+    ]
+    ExerciseSearchTerm.objects.bulk_create(rows, batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HealthcareApp', '0014_healthstat_updated_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExerciseSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.SmallIntegerField(default=1)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='HealthcareApp.exercise')),
+                ('owner', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'term'], name='exercise_search_term_idx')],
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.7 on 2026-10-19 03:04
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def assign_bits(apps, schema_editor):
+    # Gán bit cho các nhóm cơ đã có (tối đa 63) và tính muscle_mask của bài tập
+    MuscleGroup = apps.get_model('HealthcareApp', 'MuscleGroup')
+    Exercise = apps.get_model('HealthcareApp', 'Exercise')
+
+    bits = {}
+    for bit, group in enumerate(MuscleGroup.objects.order_by('id')[:63]):
+        group.bit = bit
+        group.save(update_fields=['bit'])
+        bits[group.id] = bit
+
+    masks = defaultdict(int)
+    for exercise_id, group_id in Exercise.muscle_groups.through.objects.values_list('exercise_id', 'musclegroup_id'):
+        if group_id in bits:
+            masks[exercise_id] |= 1 << bits[group_id]
+    Exercise.objects.bulk_update(
+        [Exercise(id=exercise_id, muscle_mask=mask) for exercise_id, mask in masks.items()],
+        ['muscle_mask'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HealthcareApp', '0015_exercise_search_term'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercise',
+            name='muscle_mask',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='musclegroup',
+            name='bit',
+            field=models.SmallIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.RunPython(assign_bits, migrations.RunPython.noop),
+    ]
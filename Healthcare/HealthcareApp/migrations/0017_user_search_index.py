@@ -0,0 +1,82 @@
+# Generated by Django 5.1.7 on 2026-10-19 03:15
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Bản sao cách tách từ của user_search.py tại thời điểm tạo migration: migration
+# không import mã của ứng dụng vì mã đó có thể thay đổi sau này
+FIELDS = ('first_name', 'last_name', 'username')
+MAX_TERM_LENGTH = 64
+TRIGRAM_MARK = '~'
+TRIGRAM_LENGTH = 3
+
+_WORD = re.compile(r'\w+')
+
+
+def fold(text):
+    text = unicodedata.normalize('NFD', text.lower().replace('đ', 'd'))
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def terms_for(user):
+    terms = set()
+    for field in FIELDS:
+        for word in _WORD.findall(fold(getattr(user, field) or '')):
+            word = word[:MAX_TERM_LENGTH]
+            terms.add(word)
+            if len(word) > TRIGRAM_LENGTH:
+                terms |= {TRIGRAM_MARK + word[i:i + TRIGRAM_LENGTH]
+                          for i in range(len(word) - TRIGRAM_LENGTH + 1)}
+    return terms
+
+
+def build_search_index(apps, schema_editor):
+    # Đánh chỉ mục người dùng đã có; người dùng mới được đánh chỉ mục khi lưu (signals.py)
+    User = apps.get_model('HealthcareApp', 'User')
+    UserSearchTerm = apps.get_model('HealthcareApp', 'UserSearchTerm')
+    rows = [
+        UserSearchTerm(user_id=user.id, term=term, role=user.role)
+        for user in User.objects.filter(is_active=True).iterator()
+        for term in terms_for(user)
+    ]
+    UserSearchTerm.objects.bulk_create(rows, batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HealthcareApp', '0016_muscle_group_bitmask'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('role', models.CharField(max_length=50)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['date_joined', 'id'], name='user_date_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'date_joined', 'id'], name='user_role_date_joined_idx'),
+        ),
+        migrations.AddField(
+            model_name='usersearchterm',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='usersearchterm',
+            index=models.Index(fields=['term', 'role', 'user'], name='user_search_term_idx'),
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.7 on 2026-10-19 03:17
+
+from cloudinary import CloudinaryResource
+from django.db import migrations, models
+
+# Bản sao cách tạo URL của avatars.py tại thời điểm tạo migration (ảnh lưu trên
+# Cloudinary): migration không import mã của ứng dụng vì mã đó có thể thay đổi sau này
+THUMBNAIL_SIZES = {'small': 64, 'medium': 256}
+
+
+def build_urls(field, avatar):
+    if not isinstance(avatar, CloudinaryResource):
+        avatar = field.parse_cloudinary_resource(str(avatar))
+    urls = {'original': avatar.build_url()}
+    for size_name, size in THUMBNAIL_SIZES.items():
+        urls[size_name] = avatar.build_url(width=size, height=size, crop='fill', gravity='face')
+    return urls
+
+
+def build_avatar_urls(apps, schema_editor):
+    # Tính URL cho avatar đã có; avatar mới được tính khi lưu (signals.py)
+    User = apps.get_model('HealthcareApp', 'User')
+    field = User._meta.get_field('avatar')
+    users = [user for user in User.objects.exclude(avatar__isnull=True).exclude(avatar='').only('id', 'avatar')]
+    for user in users:
+        user.avatar_urls = build_urls(field, user.avatar)
+    User.objects.bulk_update(users, ['avatar_urls'], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HealthcareApp', '0017_user_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_urls',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(build_avatar_urls, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from ckeditor.fields import RichTextField
 from cloudinary.models import CloudinaryField
 from enum import Enum
@@ -35,12 +36,20 @@ class BaseModel(models.Model):
 
 class User(AbstractUser):
     avatar = CloudinaryField(null=True, blank=True, folder='user_avatar')
+    avatar_urls = models.JSONField(default=dict, blank=True, editable=False)  # URL ảnh gốc và ảnh thu nhỏ (xem avatars.py)
     role = models.CharField(max_length=50, choices=[(role.name, role.value) for role in Role], default=Role.USER.value)
     date_of_birth = models.DateField(null=True, blank=True)  # Ngày sinh
     height = models.FloatField(null=True, blank=True)  # Chiều cao cơ bản (m)
     weight = models.FloatField(null=True, blank=True)  # Cân nặng cơ bản (kg)
     health_goals = models.CharField(max_length=50, choices=[(goal.name, goal.value) for goal in HealthGoals], default=HealthGoals.MAINTAIN_HEALTH.value)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Danh sách người dùng / chuyên gia sắp xếp theo (date_joined, id) giảm dần, phân trang theo khóa
+            models.Index(fields=['date_joined', 'id'], name='user_date_joined_idx'),
+            models.Index(fields=['role', 'date_joined', 'id'], name='user_role_date_joined_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if self.date_joined and not isinstance(self.date_joined, datetime):
             self.date_joined = datetime.combine(self.date_joined, datetime.min.time())
@@ -48,21 +57,31 @@ class User(AbstractUser):
 
 class HealthStat(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='health_stats')
-    date = models.DateTimeField(auto_now_add=True)  # Ngày ghi nhận
+    date = models.DateTimeField(default=timezone.now)  # Ngày ghi nhận (có thể do thiết bị gửi lên)
     bmi = models.FloatField(null=True, blank=True)  # BMI
     weight = models.FloatField(null=True, blank=True)  # Cân nặng (kg)
     height = models.FloatField(null=True, blank=True)  # Chiều cao (m)
     water_intake = models.FloatField(default=0)  # Lượng nước uống (lít)
     step_count = models.IntegerField(default=0)  # Số bước đi bộ
     heart_rate = models.IntegerField(null=True, blank=True)  # Nhịp tim (bpm)
+    updated_date = models.DateTimeField(auto_now=True)  # Thời điểm sửa gần nhất (dùng cho GET có điều kiện)
+
+    class Meta:
+        indexes = [
+            # Lọc theo người dùng + khoảng thời gian, sắp xếp theo (date, id)
+            models.Index(fields=['user', 'date', 'id'], name='healthstat_user_date_idx'),
+        ]
+
+    @staticmethod
+    def calculate_bmi(weight, height):
+        if not (height and weight):
+            return None
+        return round(weight / (height ** 2), 2)  # Làm tròn đến 2 số thập phân
 
     def save(self, *args, **kwargs):
         # Tính toán BMI
         if self.height and self.weight:
-            try:
-                self.bmi = round(self.weight / (self.height ** 2), 2)  # Làm tròn đến 2 số thập phân
-            except ZeroDivisionError:
-                self.bmi = None
+            self.bmi = self.calculate_bmi(self.weight, self.height)
         super().save(*args, **kwargs)
     def __str__(self):
         return f"{self.user.username} - {self.date}"
@@ -82,6 +101,12 @@ class WorkoutSession(BaseModel):
     steps = models.IntegerField(null=True, blank=True)
     calories_burned = models.FloatField(default=0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_active', 'updated_date'], name='workout_user_active_upd_idx'),
+            models.Index(fields=['user', 'schedule'], name='workout_user_schedule_idx'),
+        ]
+
 
 class Exercise(BaseModel):
     name = models.CharField(max_length=255)
@@ -94,6 +119,8 @@ class Exercise(BaseModel):
     sets = models.IntegerField(null=True, blank=True)
     calories_burned = models.FloatField(default=None)
     rating = models.FloatField(default=None)
+    # Bitmask các nhóm cơ (bit MuscleGroup.bit), cập nhật khi muscle_groups thay đổi (xem muscle_facets.py)
+    muscle_mask = models.BigIntegerField(default=0)
 
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -103,11 +130,18 @@ class Exercise(BaseModel):
         related_name='created_exercises'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_by', 'is_active'], name='exercise_creator_active_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 class MuscleGroup(BaseModel):
     name = models.CharField(max_length=255)
+    # Vị trí bit trong Exercise.muscle_mask (0-62), NULL nếu đã dùng hết bit
+    bit = models.SmallIntegerField(null=True, blank=True, unique=True)
 
     def __str__(self):
         return self.name
@@ -249,4 +283,78 @@ class FoodItem(BaseModel):
     def __str__(self):
         return self.name
 
+class StatisticRollup(models.Model):
+    # Bảng tổng hợp thống kê, được cập nhật khi HealthStat/WorkoutSession thay đổi (xem rollups.py)
+    period_start = models.DateField()  # Ngày đầu của chu kỳ
+    # Tập luyện
+    sessions = models.IntegerField(default=0)
+    calories_burned = models.FloatField(default=0)
+    total_duration = models.IntegerField(default=0)
+    # Sức khỏe: lưu tổng và số lượng để tính trung bình và gộp chu kỳ
+    health_records = models.IntegerField(default=0)
+    weight_sum = models.FloatField(default=0)
+    weight_count = models.IntegerField(default=0)
+    bmi_sum = models.FloatField(default=0)
+    bmi_count = models.IntegerField(default=0)
+    water_intake_sum = models.FloatField(default=0)
+    step_count_sum = models.BigIntegerField(default=0)
+    heart_rate_sum = models.BigIntegerField(default=0)
+    heart_rate_count = models.IntegerField(default=0)
+    # Bản ghi đầu tiên và mới nhất trong chu kỳ
+    first_stat = models.ForeignKey(HealthStat, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    first_weight = models.FloatField(null=True, blank=True)
+    latest_stat = models.ForeignKey(HealthStat, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    latest_weight = models.FloatField(null=True, blank=True)
+    latest_bmi = models.FloatField(null=True, blank=True)
+    latest_water_intake = models.FloatField(null=True, blank=True)
+    latest_step_count = models.IntegerField(null=True, blank=True)
+    latest_heart_rate = models.IntegerField(null=True, blank=True)
+    updated_date = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.user_id} - {self.period_start}"
+
+class DailyStatistic(StatisticRollup):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_statistics')
+
+    class Meta:
+        unique_together = ('user', 'period_start')
+
+class MonthlyStatistic(StatisticRollup):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_statistics')
+
+    class Meta:
+        unique_together = ('user', 'period_start')
+
 
+
+class ExerciseSearchTerm(models.Model):
+    # Chỉ mục tìm kiếm bài tập: mỗi dòng là một từ (đã bỏ dấu, chữ thường) của một bài tập (xem search_index.py)
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=64)
+    weight = models.SmallIntegerField(default=1)  # Trọng số theo trường: tên > dụng cụ > mô tả
+    # Người tạo bài tập (NULL: bài tập gợi ý), lưu lại để lọc quyền xem không cần join
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+                              db_index=False)
+
+    class Meta:
+        indexes = [
+            # "owner = user OR owner IS NULL" kết hợp khoảng tiền tố của term: hai đoạn quét trên cùng index
+            models.Index(fields=['owner', 'term'], name='exercise_search_term_idx'),
+        ]
+
+
+class UserSearchTerm(models.Model):
+    # Chỉ mục tìm kiếm người dùng: từ (hoặc trigram) đã bỏ dấu của tên/username (xem user_search.py)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=64)
+    role = models.CharField(max_length=50)  # Sao chép role của người dùng để lọc chuyên gia ngay trên index
+
+    class Meta:
+        indexes = [
+            # Khoảng tiền tố / danh sách trigram của term, role và user_id đọc thẳng từ index
+            models.Index(fields=['term', 'role', 'user'], name='user_search_term_idx'),
+        ]
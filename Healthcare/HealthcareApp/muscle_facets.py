@@ -0,0 +1,137 @@
+"""
+Lọc bài tập theo nhiều nhóm cơ bằng bitmask và đếm số bài tập theo từng giá
+trị lọc (facet).
+
+Mỗi MuscleGroup được gán một bit (0-62), Exercise.muscle_mask là OR các bit
+của những nhóm cơ của bài tập. "Ngực VÀ tay sau" trở thành một phép so sánh
+muscle_mask & mask = mask trên một bảng thay vì mỗi nhóm cơ một lần join.
+Nhóm cơ không còn bit trống được lọc qua bảng trung gian như cũ.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, Q
+
+from HealthcareApp.models import Exercise, MuscleGroup
+
+MAX_BITS = 63  # Bit 63 là bit dấu của BIGINT
+MATCH_ALL = 'all'
+MATCH_ANY = 'any'
+NO_EQUIPMENT = 'none'
+
+Membership = Exercise.muscle_groups.through
+
+
+def assign_bit(group):
+    """Gán bit trống nhỏ nhất cho nhóm cơ mới (giữ NULL nếu đã dùng hết)"""
+    used = set(MuscleGroup.objects.exclude(bit=None).values_list('bit', flat=True))
+    group.bit = next((bit for bit in range(MAX_BITS) if bit not in used), None)
+
+
+def recompute_masks(exercise_ids):
+    """Tính lại muscle_mask của các bài tập từ bảng trung gian (một SELECT và một bulk_update)"""
+    exercise_ids = set(exercise_ids)
+    if not exercise_ids:
+        return
+    masks = dict.fromkeys(exercise_ids, 0)
+    for exercise_id, bit in Membership.objects.filter(
+            exercise_id__in=exercise_ids, musclegroup__bit__isnull=False
+    ).values_list('exercise_id', 'musclegroup__bit'):
+        masks[exercise_id] |= 1 << bit
+
+    Exercise.objects.bulk_update(
+        [Exercise(id=exercise_id, muscle_mask=mask) for exercise_id, mask in masks.items()],
+        ['muscle_mask'], batch_size=500
+    )
+
+
+def _split(group_ids):
+    # Nhóm cơ có bit được lọc bằng mask, nhóm chưa có bit (hoặc không tồn tại) lọc qua join
+    bits = dict(MuscleGroup.objects.filter(id__in=group_ids).values_list('id', 'bit'))
+    mask = 0
+    unindexed = []
+    for group_id in group_ids:
+        if bits.get(group_id) is None:
+            unindexed.append(group_id)
+        else:
+            mask |= 1 << bits[group_id]
+    return mask, unindexed
+
+
+def filter_by_muscle_groups(queryset, group_ids, match=MATCH_ALL):
+    if not group_ids:
+        return queryset
+    mask, unindexed = _split(group_ids)
+    if match == MATCH_ANY:
+        # Subquery thay cho join để mỗi bài tập chỉ xuất hiện một lần (đếm facet chính xác)
+        condition = Q(pk__in=Membership.objects.filter(musclegroup_id__in=unindexed).values('exercise_id')) \
+            if unindexed else Q(pk__in=[])
+        if mask:
+            condition |= Q(muscle_hits__gt=0)
+        return queryset.alias(muscle_hits=F('muscle_mask').bitand(mask)).filter(condition)
+
+    if mask:
+        queryset = queryset.alias(muscle_hits=F('muscle_mask').bitand(mask)).filter(muscle_hits=mask)
+    for group_id in unindexed:
+        queryset = queryset.filter(muscle_groups=group_id)
+    return queryset
+
+
+def filter_by_equipment(queryset, equipment):
+    if equipment is None:
+        return queryset
+    if equipment == NO_EQUIPMENT:
+        return queryset.filter(Q(equipment__isnull=True) | Q(equipment=''))
+    return queryset.filter(equipment=equipment)
+
+
+def filter_by_difficulty(queryset, difficulty):
+    if difficulty is None:
+        return queryset
+    return queryset.filter(difficulty_level=difficulty)
+
+
+def muscle_group_counts(queryset):
+    """Số bài tập trong `queryset` có từng nhóm cơ (một truy vấn aggregate cho các nhóm có bit)"""
+    groups = list(MuscleGroup.objects.filter(is_active=True).order_by('id').values('id', 'name', 'bit'))
+    indexed = [group for group in groups if group['bit'] is not None]
+    counts = {}
+    if indexed:
+        # Tên alias phải khác tên kết quả aggregate, nếu không FILTER (WHERE ...) tham chiếu nhầm cột kết quả
+        aliases = {f"has_{group['id']}": F('muscle_mask').bitand(1 << group['bit']) for group in indexed}
+        counts = queryset.order_by().alias(**aliases).aggregate(**{
+            f"bit_{group['id']}": Count('pk', filter=Q(**{f"has_{group['id']}__gt": 0})) for group in indexed
+        })
+    unindexed = [group['id'] for group in groups if group['bit'] is None]
+    if unindexed:
+        for group_id, count in Membership.objects.filter(
+                musclegroup_id__in=unindexed, exercise__in=queryset.values('pk')
+        ).values_list('musclegroup_id').annotate(count=Count('exercise_id', distinct=True)):
+            counts[f'bit_{group_id}'] = count
+
+    return [{'id': group['id'], 'name': group['name'], 'count': counts.get(f"bit_{group['id']}", 0)}
+            for group in groups]
+
+
+def value_counts(queryset, field):
+    """[{value, count}] theo `field`, giá trị rỗng gộp thành NO_EQUIPMENT với trường equipment"""
+    counts = defaultdict(int)
+    for value, count in queryset.order_by().values_list(field).annotate(count=Count('pk')):
+        if field == 'equipment' and not value:
+            value = NO_EQUIPMENT
+        counts[value] += count
+    return [{'value': value, 'count': count}
+            for value, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))]
+
+
+def facet_search(queryset, group_ids=(), match=MATCH_ALL, difficulty=None, equipment=None):
+    """
+    Kết quả lọc và số lượng theo từng facet. Số lượng của một facet được tính
+    trên kết quả lọc bởi các facet còn lại, để người dùng thấy các lựa chọn khác.
+    """
+    by_muscles = filter_by_muscle_groups(queryset, list(group_ids), match)
+    matches = filter_by_equipment(filter_by_difficulty(by_muscles, difficulty), equipment)
+    return matches, {
+        'muscle_groups': muscle_group_counts(matches),
+        'difficulty_level': value_counts(filter_by_equipment(by_muscles, equipment), 'difficulty_level'),
+        'equipment': value_counts(filter_by_difficulty(by_muscles, difficulty), 'equipment'),
+    }
@@ -0,0 +1,151 @@
+"""
+Phát hiện truy vấn N+1: cùng một câu SELECT (khác tham số) chạy lặp lại nhiều
+lần trong một yêu cầu, ví dụ truy vấn theo từng ngày trong vòng lặp hoặc quan hệ
+lồng nhau của serializer chưa được prefetch.
+
+Mỗi mẫu truy vấn lặp từ NPLUSONE_THRESHOLD lần trở lên được báo cáo kèm view,
+trường serializer đang được serialize và dòng mã trong dự án đã gọi truy vấn.
+NPLUSONE_DETECTION: 'off' (mặc định), 'log' (ghi cảnh báo một lần cho mỗi mẫu
+trong mỗi tiến trình) hoặc 'raise' (ném NPlusOneError, dùng khi kiểm thử).
+"""
+import contextvars
+import logging
+import re
+import sys
+import threading
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('HealthcareApp.nplusone')
+
+OFF = 'off'
+LOG = 'log'
+RAISE = 'raise'
+
+# Các cách viết IN (%s, %s, ...) với số tham số khác nhau là cùng một mẫu truy vấn
+_IN_LIST = re.compile(r'IN \((?:%s(?:, )?)+\)')
+_PROJECT_DIR = str(Path(settings.BASE_DIR).resolve())
+# Các wrapper truy vấn và điểm khởi chạy, không phải nơi gọi truy vấn
+_IGNORED_FILES = ('nplusone.py', 'instrumentation.py', 'manage.py', 'wsgi.py', 'asgi.py')
+_MAX_REPORTED = 1000
+
+_current = contextvars.ContextVar('nplusone_detector', default=None)
+_reported = set()
+_reported_lock = threading.Lock()
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+def normalize(sql):
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+def _attribution():
+    """(trường serializer, dòng mã trong dự án) của truy vấn đang chạy"""
+    field = source = None
+    frame = sys._getframe(2)
+    while frame is not None and (field is None or source is None):
+        code = frame.f_code
+        filename = code.co_filename
+        if field is None and code.co_name == 'to_representation' \
+                and filename.endswith(('rest_framework/serializers.py', 'rest_framework\\serializers.py')) \
+                and 'field' in frame.f_locals and 'self' in frame.f_locals:
+            field = f"{type(frame.f_locals['self']).__name__}.{frame.f_locals['field'].field_name}"
+        if source is None and filename.startswith(_PROJECT_DIR) and not filename.endswith(_IGNORED_FILES) \
+                and 'site-packages' not in filename:
+            source = f'{Path(filename).relative_to(_PROJECT_DIR)}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    return field, source
+
+
+class Detector:
+    """Đếm các mẫu SELECT của một yêu cầu (hoặc một khối mã)"""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = Counter()
+        self.locations = {}
+        self.view_name = None
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip()[:6].upper() == 'SELECT':
+            pattern = normalize(sql)
+            self.counts[pattern] += 1
+            if self.counts[pattern] == self.threshold:
+                # Chỉ duyệt stack khi mẫu vừa vượt ngưỡng
+                self.locations[pattern] = _attribution()
+        return execute(sql, params, many, context)
+
+    def report(self):
+        return [
+            {'view': self.view_name, 'field': field, 'source': source,
+             'count': self.counts[pattern], 'sql': pattern}
+            for pattern, (field, source) in self.locations.items()
+        ]
+
+
+def format_report(report):
+    return '\n'.join(
+        f"{item['count']} truy vấn giống nhau (view={item['view']}, field={item['field']}, "
+        f"source={item['source']}): {item['sql'][:300]}"
+        for item in report
+    )
+
+
+def _log_once(report):
+    for item in report:
+        key = (item['view'], item['field'], item['source'], item['sql'])
+        with _reported_lock:
+            if key in _reported or len(_reported) >= _MAX_REPORTED:
+                continue
+            _reported.add(key)
+        logger.warning("Phát hiện truy vấn N+1: %s", format_report([item]), extra={'nplusone': item})
+
+
+@contextmanager
+def detect(mode=RAISE, threshold=None):
+    """
+    Theo dõi truy vấn của khối lệnh; khi kết thúc báo cáo các mẫu lặp theo `mode`.
+    Dùng trực tiếp trong kiểm thử: `with nplusone.detect(): ...`
+    """
+    detector = Detector(threshold or getattr(settings, 'NPLUSONE_THRESHOLD', 5))
+    token = _current.set(detector)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(detector))
+            yield detector
+    finally:
+        _current.reset(token)
+
+    report = detector.report()
+    if report:
+        if mode == RAISE:
+            raise NPlusOneError(format_report(report))
+        _log_once(report)
+
+
+class NPlusOneMiddleware:
+    """Bật theo NPLUSONE_DETECTION (đọc ở mỗi yêu cầu, có thể đổi bằng override_settings)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = getattr(settings, 'NPLUSONE_DETECTION', OFF)
+        if mode == OFF:
+            return self.get_response(request)
+        with detect(mode):
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        detector = _current.get()
+        if detector is not None:
+            view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+            detector.view_name = (view_class or view_func).__name__
@@ -0,0 +1,92 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(pagination.BasePagination):
+    """
+    Phân trang theo khóa (date, id) giảm dần: mỗi trang chỉ đọc `page_size + 1`
+    dòng bắt đầu từ vị trí con trỏ, không dùng OFFSET và không đếm tổng số dòng,
+    nên chi phí không tăng theo độ dài lịch sử.
+    """
+    date_field = 'date'
+    page_size = 30
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor không hợp lệ'
+    # True: chỉ phân trang khi yêu cầu có cursor hoặc page_size, giữ dạng trả về cũ cho client chưa hỗ trợ
+    opt_in = False
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, instance):
+        raw = f"{getattr(instance, self.date_field).isoformat()}|{instance.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode()).decode()
+            moment, pk = raw.split('|')
+            return datetime.fromisoformat(moment), int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.opt_in and not self.is_requested(request):
+            return None
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        queryset = queryset.order_by(f'-{self.date_field}', '-id')
+        if cursor:
+            moment, pk = cursor
+            queryset = queryset.filter(Q(**{f'{self.date_field}__lt': moment})
+                                       | Q(**{self.date_field: moment, 'id__lt': pk}))
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        self.is_first_page = cursor is None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data
+        })
+
+
+class UserKeysetPagination(KeysetPagination):
+    """
+    Danh sách người dùng theo (date_joined, id) giảm dần. Ứng dụng di động đọc
+    danh sách đầy đủ nên chỉ phân trang khi client gửi cursor hoặc page_size.
+    """
+    date_field = 'date_joined'
+    opt_in = True
+    page_size = 20
+    max_page_size = 100
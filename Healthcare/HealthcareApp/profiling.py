@@ -0,0 +1,180 @@
+"""
+Profile một yêu cầu theo yêu cầu của nhân viên (is_staff).
+
+Gửi yêu cầu kèm header "X-Profile: 1" bằng tài khoản nhân viên (session, Token
+hoặc OAuth2 như mọi API khác): yêu cầu được chạy dưới cProfile, kết quả lưu vào
+PROFILING_DIR gồm tệp .prof (mở được bằng pstats/snakeviz) và tệp .json ghi
+route, người dùng, thời gian và danh sách truy vấn DB (chỉ câu SQL, không lưu
+tham số vì có thể chứa dữ liệu của người dùng). Mã profile trả về trong header
+X-Profile-Id, xem lại tại trang quản trị /admin/profiles/.
+
+Header của người dùng không phải nhân viên bị bỏ qua. Mỗi tiến trình chỉ
+profile một yêu cầu tại một thời điểm, chỉ giữ PROFILING_MAX_PROFILES profile
+mới nhất.
+"""
+import cProfile
+import io
+import json
+import pstats
+import re
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from HealthcareApp import metrics
+
+HEADER = 'X-Profile'
+ID_HEADER = 'X-Profile-Id'
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+
+_ID = re.compile(r'^\d{8}-\d{12}-[0-9a-f]{8}$')
+# cProfile không cho chạy lồng nhau
+_lock = threading.Lock()
+
+
+def profile_dir():
+    directory = getattr(settings, 'PROFILING_DIR', None)
+    return Path(directory) if directory else None
+
+
+def _staff_user(request):
+    """Người dùng nhân viên gửi yêu cầu, xác thực như các API (DEFAULT_AUTHENTICATION_CLASSES); None nếu không phải"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+        try:
+            user = drf_request.user
+        except APIException:
+            return None
+    return user if user.is_authenticated and user.is_active and user.is_staff else None
+
+
+class QueryLog:
+    """Các truy vấn DB của yêu cầu đang được profile"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'ms': round((time.perf_counter() - start) * 1000, 3),
+            })
+
+
+def save(profiler, data):
+    """Lưu kết quả profile và thông tin yêu cầu, trả về mã profile"""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    profile_id = f'{datetime.now():%Y%m%d-%H%M%S%f}-{uuid.uuid4().hex[:8]}'
+    profiler.dump_stats(directory / f'{profile_id}.prof')
+    (directory / f'{profile_id}.json').write_text(json.dumps({'id': profile_id, **data}, ensure_ascii=False))
+    _prune(directory)
+    return profile_id
+
+
+def _prune(directory):
+    limit = getattr(settings, 'PROFILING_MAX_PROFILES', 100)
+    # Mã profile bắt đầu bằng thời điểm tạo: sắp xếp theo tên là theo thời gian
+    for path in sorted(directory.glob('*.json'))[:-limit]:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.prof').unlink(missing_ok=True)
+
+
+def list_profiles():
+    """Thông tin các profile đã lưu, mới nhất trước (không kèm danh sách truy vấn)"""
+    directory = profile_dir()
+    if directory is None or not directory.is_dir():
+        return []
+    profiles = []
+    for path in sorted(directory.glob('*.json'), reverse=True):
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        queries = data.pop('queries', [])
+        data['query_count'] = len(queries)
+        data['query_ms'] = round(sum(query['ms'] for query in queries), 3)
+        profiles.append(data)
+    return profiles
+
+
+def prof_path(profile_id):
+    """Đường dẫn tệp .prof, None nếu mã không hợp lệ hoặc không tồn tại"""
+    directory = profile_dir()
+    if directory is None or not _ID.match(profile_id):
+        return None
+    path = directory / f'{profile_id}.prof'
+    return path if path.is_file() else None
+
+
+def load(profile_id, sort='cumulative', limit=60):
+    """Thông tin yêu cầu và bảng thống kê pstats (dạng văn bản) của profile, None nếu không có"""
+    path = prof_path(profile_id)
+    if path is None:
+        return None
+    data = json.loads(path.with_suffix('.json').read_text())
+    stream = io.StringIO()
+    stats = pstats.Stats(str(path), stream=stream)
+    stats.strip_dirs().sort_stats(sort if sort in SORT_KEYS else 'cumulative').print_stats(limit)
+    data['stats'] = stream.getvalue()
+    return data
+
+
+class ProfilingMiddleware:
+    """Đặt sau AuthenticationMiddleware (cần request.user của session)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.headers.get(HEADER) or profile_dir() is None:
+            return self.get_response(request)
+        staff = _staff_user(request)
+        if staff is None or not _lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            profiler = cProfile.Profile()
+            query_log = QueryLog()
+            start = time.perf_counter()
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(query_log))
+                profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profiler.disable()
+            duration_ms = (time.perf_counter() - start) * 1000
+        finally:
+            _lock.release()
+
+        response[ID_HEADER] = save(profiler, {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'route': getattr(request, '_profile_route', None),
+            'user_id': staff.pk,
+            'username': staff.get_username(),
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+            'queries': query_log.queries,
+        })
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._profile_route = metrics.route_name(request, view_func)
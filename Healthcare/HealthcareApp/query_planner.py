@@ -0,0 +1,92 @@
+"""
+Tự động thêm select_related/prefetch_related cho queryset dựa trên cây
+serializer, tránh N+1 khi serializer lồng nhau (ví dụ WorkoutSession ->
+Exercise -> MuscleGroup).
+
+- Serializer lồng (một đối tượng) trên khóa ngoại/one-to-one: select_related
+- Serializer lồng many=True hoặc danh sách khóa chính (ManyRelatedField):
+  Prefetch, queryset lồng được tối ưu đệ quy theo serializer con
+- PrimaryKeyRelatedField đơn chỉ đọc cột khóa ngoại nên không cần join
+
+Planner chỉ thay đổi cách tải dữ liệu, không lọc bản ghi: kết quả serialize
+giống hệt khi không tối ưu.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.serializers import ListSerializer, ModelSerializer
+
+
+def _relation(model, field):
+    # Chỉ xử lý field ánh xạ trực tiếp tới một quan hệ của model (source không có dấu chấm)
+    if field.write_only or len(getattr(field, 'source_attrs', ())) != 1:
+        return None
+    try:
+        model_field = model._meta.get_field(field.source_attrs[0])
+    except FieldDoesNotExist:
+        return None
+    return model_field if model_field.is_relation else None
+
+
+def plan(serializer, model):
+    """Danh sách đường dẫn select_related và các Prefetch cần cho `serializer` trên `model`"""
+    select, prefetch = [], []
+    for field in serializer.fields.values():
+        model_field = _relation(model, field)
+        if model_field is None:
+            continue
+        name = field.source_attrs[0]
+        related_model = model_field.related_model
+
+        if isinstance(field, ListSerializer) and isinstance(field.child, ModelSerializer):
+            queryset = optimize_queryset(related_model._default_manager.all(), field.child)
+            prefetch.append(Prefetch(name, queryset=queryset))
+        elif isinstance(field, ManyRelatedField):
+            prefetch.append(Prefetch(name))
+        elif model_field.many_to_one or model_field.one_to_one:
+            if isinstance(field, ModelSerializer):
+                select.append(name)
+                nested_select, nested_prefetch = plan(field, related_model)
+                select += [f'{name}__{path}' for path in nested_select]
+                prefetch += [Prefetch(f'{name}__{lookup.prefetch_to}', queryset=lookup.queryset)
+                             for lookup in nested_prefetch]
+            elif isinstance(field, RelatedField) and not field.use_pk_only_optimization():
+                select.append(name)
+    return select, prefetch
+
+
+def optimize_queryset(queryset, serializer):
+    """
+    Thêm select_related/prefetch_related cần thiết cho `serializer` (class
+    hoặc instance) vào `queryset`.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+    if not isinstance(serializer, ModelSerializer):
+        return queryset
+
+    select, prefetch = plan(serializer, queryset.model)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class OptimizedQuerysetMixin:
+    """
+    Áp dụng optimize_queryset cho queryset của view theo serializer đang dùng.
+    Gắn vào filter_queryset để áp dụng cả khi view tự định nghĩa get_queryset.
+    Chỉ áp dụng cho yêu cầu đọc: yêu cầu ghi chỉ cần bản ghi chính, và
+    UpdateModelMixin xóa cache prefetch trước khi trả kết quả nên dữ liệu tải
+    trước không được dùng.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        return optimize_queryset(queryset, self.get_serializer_class())
@@ -0,0 +1,260 @@
+"""
+Duy trì bảng tổng hợp DailyStatistic/MonthlyStatistic của từng người dùng.
+
+Khi một HealthStat hoặc WorkoutSession được lưu/xóa, chỉ ngày chứa bản ghi đó
+được tính lại từ dữ liệu gốc, sau đó tháng được gộp lại từ các dòng theo ngày.
+Lệnh `python manage.py rebuild_statistics` dựng lại toàn bộ từ đầu.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+from HealthcareApp import statistics_cache
+from HealthcareApp.models import DailyStatistic, HealthStat, MonthlyStatistic, WorkoutSession
+from HealthcareApp.utils import date_bounds
+
+HEALTH_FIELDS = ('weight', 'bmi', 'water_intake', 'step_count', 'heart_rate')
+
+SUM_FIELDS = ('sessions', 'calories_burned', 'total_duration', 'health_records',
+              'weight_sum', 'weight_count', 'bmi_sum', 'bmi_count',
+              'water_intake_sum', 'step_count_sum', 'heart_rate_sum', 'heart_rate_count')
+
+LATEST_FIELDS = tuple(f'latest_{field}' for field in HEALTH_FIELDS)
+
+
+class RollupTotals:
+    """
+    Bộ cộng dồn giá trị của một chu kỳ. Dữ liệu phải được đưa vào theo thứ tự
+    thời gian để xác định đúng bản ghi đầu tiên và mới nhất.
+    """
+
+    def __init__(self):
+        for field in SUM_FIELDS:
+            setattr(self, field, 0)
+        self.first_stat_id = None
+        self.first_weight = None
+        self.latest_stat_id = None
+        for field in LATEST_FIELDS:
+            setattr(self, field, None)
+
+    @property
+    def is_empty(self):
+        return not self.sessions and not self.health_records
+
+    def add_health(self, row):
+        """Cộng một bản ghi HealthStat (dict có id và các trường HEALTH_FIELDS)"""
+        self.health_records += 1
+        if row['weight'] is not None:
+            self.weight_sum += row['weight']
+            self.weight_count += 1
+        if row['bmi'] is not None:
+            self.bmi_sum += row['bmi']
+            self.bmi_count += 1
+        self.water_intake_sum += row['water_intake'] or 0
+        self.step_count_sum += row['step_count'] or 0
+        if row['heart_rate'] is not None:
+            self.heart_rate_sum += row['heart_rate']
+            self.heart_rate_count += 1
+
+        if self.first_stat_id is None:
+            self.first_stat_id = row['id']
+            self.first_weight = row['weight']
+        self.latest_stat_id = row['id']
+        for field in HEALTH_FIELDS:
+            setattr(self, f'latest_{field}', row[field])
+
+    def add_workouts(self, sessions, calories_burned, total_duration):
+        self.sessions += sessions or 0
+        self.calories_burned += calories_burned or 0
+        self.total_duration += total_duration or 0
+
+    def merge(self, other):
+        """Gộp một RollupTotals hoặc một dòng DailyStatistic/MonthlyStatistic"""
+        for field in SUM_FIELDS:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        if other.health_records:
+            if self.first_stat_id is None:
+                self.first_stat_id = other.first_stat_id
+                self.first_weight = other.first_weight
+            self.latest_stat_id = other.latest_stat_id
+            for field in LATEST_FIELDS:
+                setattr(self, field, getattr(other, field))
+
+    def average(self, field):
+        """Giá trị trung bình của một chỉ số sức khỏe trong chu kỳ"""
+        if field in ('water_intake', 'step_count'):
+            count = self.health_records
+        else:
+            count = getattr(self, f'{field}_count')
+        if not count:
+            return None
+        return getattr(self, f'{field}_sum') / count
+
+    def as_fields(self):
+        fields = {field: getattr(self, field) for field in SUM_FIELDS + LATEST_FIELDS}
+        fields.update(
+            first_stat_id=self.first_stat_id,
+            first_weight=self.first_weight,
+            latest_stat_id=self.latest_stat_id,
+        )
+        return fields
+
+
+def health_stats_between(user_id, start_date, end_date):
+    """
+    HealthStat của người dùng trong khoảng ngày. So sánh trực tiếp trên cột date
+    (không bọc DATE()) để dùng được index (user, date, id).
+    """
+    lower, upper = date_bounds(start_date, end_date)
+    return HealthStat.objects.filter(user_id=user_id, date__gte=lower, date__lt=upper)
+
+
+def workout_sessions_between(user_id, start_date, end_date):
+    """WorkoutSession đang hoạt động trong khoảng ngày, dùng index (user, is_active, updated_date)"""
+    lower, upper = date_bounds(start_date, end_date)
+    return WorkoutSession.objects.filter(
+        user_id=user_id, is_active=True,
+        updated_date__gte=lower, updated_date__lt=upper
+    )
+
+
+def _store(model, user_id, period_start, totals):
+    if totals.is_empty:
+        model.objects.filter(user_id=user_id, period_start=period_start).delete()
+    else:
+        model.objects.update_or_create(
+            user_id=user_id, period_start=period_start,
+            defaults=totals.as_fields()
+        )
+
+
+def refresh_month(user_id, day):
+    """Gộp lại tháng chứa `day` từ các dòng DailyStatistic"""
+    month_start = day.replace(day=1)
+    month_end = (month_start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+
+    totals = RollupTotals()
+    for daily in DailyStatistic.objects.filter(
+            user_id=user_id,
+            period_start__range=(month_start, month_end)
+    ).order_by('period_start'):
+        totals.merge(daily)
+    _store(MonthlyStatistic, user_id, month_start, totals)
+
+
+def _daily_totals(user_id, day):
+    totals = RollupTotals()
+    for row in health_stats_between(user_id, day, day).order_by('date', 'id').values('id', *HEALTH_FIELDS):
+        totals.add_health(row)
+
+    workouts = workout_sessions_between(user_id, day, day).aggregate(
+        sessions=Count('id'),
+        calories_burned=Sum('calories_burned'),
+        total_duration=Sum('total_duration'),
+    )
+    totals.add_workouts(**workouts)
+    return totals
+
+
+def refresh_days(user_days):
+    """
+    Tính lại thống kê của nhiều cặp (user_id, ngày) từ dữ liệu gốc, mỗi cặp chỉ
+    một lần. Mỗi tháng bị ảnh hưởng chỉ được gộp lại và vô hiệu hóa cache một
+    lần, dù có nhiều ngày thay đổi.
+    """
+    pairs = sorted({(u, d) for u, d in user_days if u is not None and d is not None})
+    if not pairs:
+        return
+    months = sorted({(user_id, day.replace(day=1)) for user_id, day in pairs})
+
+    with transaction.atomic():
+        for user_id, day in pairs:
+            _store(DailyStatistic, user_id, day, _daily_totals(user_id, day))
+        for user_id, month in months:
+            refresh_month(user_id, month)
+    statistics_cache.invalidate_days(months)
+
+
+def apply_workout_deltas(deltas):
+    """
+    Cộng chênh lệch tập luyện {(user_id, ngày): (total_duration, calories_burned)}
+    vào DailyStatistic/MonthlyStatistic bằng bulk_update, không đọc lại dữ liệu
+    gốc. Ngày hoặc tháng chưa có dòng tổng hợp được tính lại đầy đủ.
+    """
+    deltas = {key: value for key, value in deltas.items() if key[0] is not None and any(value)}
+    if not deltas:
+        return
+
+    monthly = defaultdict(lambda: [0, 0])
+    for (user_id, day), (duration, calories) in deltas.items():
+        month = monthly[(user_id, day.replace(day=1))]
+        month[0] += duration
+        month[1] += calories
+
+    missing_days, missing_months = [], []
+    with transaction.atomic():
+        for model, changes, missing in ((DailyStatistic, deltas, missing_days),
+                                        (MonthlyStatistic, monthly, missing_months)):
+            rows = {
+                (row.user_id, row.period_start): row
+                for row in model.objects.select_for_update().filter(
+                    user_id__in={user_id for user_id, _ in changes},
+                    period_start__in={period for _, period in changes}
+                )
+            }
+            updated = []
+            for key, (duration, calories) in changes.items():
+                row = rows.get(key)
+                if row is None:
+                    missing.append(key)
+                    continue
+                row.total_duration += duration
+                row.calories_burned += calories
+                updated.append(row)
+            model.objects.bulk_update(updated, ['total_duration', 'calories_burned'], batch_size=500)
+
+    refresh_days(missing_days)
+    for user_id, month in missing_months:
+        refresh_month(user_id, month)
+    statistics_cache.invalidate_days(deltas)
+
+
+def rebuild_user(user_id):
+    """Dựng lại toàn bộ bảng tổng hợp của một người dùng"""
+    daily = defaultdict(RollupTotals)
+
+    for row in HealthStat.objects.filter(user_id=user_id).order_by('date', 'id').values(
+            'id', 'date', *HEALTH_FIELDS).iterator(chunk_size=2000):
+        daily[row['date'].date()].add_health(row)
+
+    for row in WorkoutSession.objects.filter(user_id=user_id, is_active=True).annotate(
+            day=TruncDate('updated_date')
+    ).values('day').annotate(
+        sessions=Count('id'),
+        calories_burned=Sum('calories_burned'),
+        total_duration=Sum('total_duration'),
+    ).order_by():
+        daily[row['day']].add_workouts(row['sessions'], row['calories_burned'], row['total_duration'])
+
+    monthly = defaultdict(RollupTotals)
+    for day in sorted(daily):
+        monthly[day.replace(day=1)].merge(daily[day])
+
+    with transaction.atomic():
+        DailyStatistic.objects.filter(user_id=user_id).delete()
+        MonthlyStatistic.objects.filter(user_id=user_id).delete()
+        DailyStatistic.objects.bulk_create(
+            [DailyStatistic(user_id=user_id, period_start=day, **totals.as_fields())
+             for day, totals in daily.items()],
+            batch_size=1000
+        )
+        MonthlyStatistic.objects.bulk_create(
+            [MonthlyStatistic(user_id=user_id, period_start=month, **totals.as_fields())
+             for month, totals in monthly.items()],
+            batch_size=1000
+        )
+    statistics_cache.invalidate_user(user_id)
+    return len(daily)
@@ -0,0 +1,118 @@
+"""
+Chỉ mục tìm kiếm bài tập không phân biệt dấu tiếng Việt.
+
+Tên, dụng cụ và mô tả của bài tập được tách thành từ, bỏ dấu ("Đẩy ngực" ->
+"day", "nguc") và lưu vào ExerciseSearchTerm khi bài tập được lưu. Tìm kiếm
+chỉ đọc bảng chỉ mục theo tiền tố của từ (dùng index (owner, term)), mọi từ
+trong câu truy vấn phải khớp, kết quả xếp hạng theo trọng số của trường chứa
+từ và khớp trọn từ được cộng điểm gấp đôi.
+"""
+import re
+import unicodedata
+
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Max, Q, Sum, Value, When
+
+from HealthcareApp.models import Exercise, ExerciseSearchTerm
+
+FIELD_WEIGHTS = (('name', 3), ('equipment', 2), ('description', 1))
+MAX_TERM_LENGTH = 64
+# Từ ngắn hơn chỉ so khớp trọn từ, tránh tiền tố một ký tự quét phần lớn chỉ mục
+MIN_PREFIX_LENGTH = 2
+MAX_QUERY_TERMS = 8
+
+_WORD = re.compile(r'\w+')
+
+
+def fold(text):
+    """Chữ thường, bỏ dấu tiếng Việt (kể cả đ/Đ)"""
+    text = unicodedata.normalize('NFD', text.lower().replace('đ', 'd'))
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return [word[:MAX_TERM_LENGTH] for word in _WORD.findall(fold(text or ''))]
+
+
+def terms_for(exercise):
+    """{từ: trọng số} của bài tập, mỗi từ giữ trọng số cao nhất"""
+    terms = {}
+    for field, weight in FIELD_WEIGHTS:
+        for term in tokenize(getattr(exercise, field)):
+            terms[term] = max(weight, terms.get(term, 0))
+    return terms
+
+
+def index_exercise(exercise):
+    """Cập nhật chỉ mục của một bài tập; bài tập không hoạt động bị xóa khỏi chỉ mục"""
+    with transaction.atomic():
+        ExerciseSearchTerm.objects.filter(exercise=exercise).delete()
+        if exercise.is_active:
+            ExerciseSearchTerm.objects.bulk_create([
+                ExerciseSearchTerm(exercise=exercise, term=term, weight=weight, owner_id=exercise.created_by_id)
+                for term, weight in terms_for(exercise).items()
+            ])
+
+
+def rebuild(batch_size=1000):
+    """Dựng lại toàn bộ chỉ mục, trả về số bài tập được đánh chỉ mục"""
+    count = 0
+    with transaction.atomic():
+        ExerciseSearchTerm.objects.all().delete()
+        rows = []
+        for exercise in Exercise.objects.filter(is_active=True).only(
+                'id', 'created_by', *(field for field, _ in FIELD_WEIGHTS)).iterator(chunk_size=batch_size):
+            count += 1
+            rows += [ExerciseSearchTerm(exercise_id=exercise.id, term=term, weight=weight,
+                                        owner_id=exercise.created_by_id)
+                     for term, weight in terms_for(exercise).items()]
+            if len(rows) >= batch_size:
+                ExerciseSearchTerm.objects.bulk_create(rows)
+                rows = []
+        ExerciseSearchTerm.objects.bulk_create(rows)
+    return count
+
+
+def match_term(term):
+    if len(term) < MIN_PREFIX_LENGTH:
+        return Q(term=term)
+    if connection.vendor == 'sqlite':
+        # SQLite so sánh theo BINARY (thứ tự mã Unicode) nhưng không dùng index cho LIKE:
+        # tiền tố dưới dạng khoảng [term, term kế tiếp)
+        return Q(term__gte=term, term__lt=term[:-1] + chr(ord(term[-1]) + 1))
+    # MySQL: collation *_unicode_ci không theo thứ tự mã Unicode nên không dùng khoảng trên;
+    # LIKE 'term%' vẫn được quét theo khoảng trên index
+    return Q(term__startswith=term)
+
+
+def search(user, query, limit=20):
+    """
+    Danh sách (exercise_id, điểm) xếp hạng giảm dần, chỉ gồm bài tập của
+    `user` và bài tập gợi ý.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+
+    condition = Q()
+    for term in terms:
+        condition |= match_term(term)
+
+    annotations = {}
+    score = Value(0)
+    for index, term in enumerate(terms):
+        # 1 nếu bài tập có ít nhất một từ khớp với từ thứ `index` của truy vấn
+        annotations[f'hit_{index}'] = Max(Case(When(match_term(term), then=Value(1)),
+                                               default=Value(0), output_field=IntegerField()))
+        score = score + Sum(Case(
+            When(term=term, then=F('weight') * 2),
+            When(match_term(term), then=F('weight')),
+            default=Value(0), output_field=IntegerField()
+        ))
+
+    rows = ExerciseSearchTerm.objects.filter(
+        condition, Q(owner=user) | Q(owner__isnull=True)
+    ).values('exercise_id').annotate(score=score, **annotations).filter(
+        **{f'hit_{index}': 1 for index in range(len(terms))}
+    ).order_by('-score', 'exercise_id')[:limit]
+    return [(row['exercise_id'], row['score']) for row in rows]
@@ -1,4 +1,4 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from django.utils import timezone
 
 
@@ -9,7 +9,9 @@ from rest_framework.serializers import ModelSerializer, FloatField, CharField, D
 from HealthcareApp.models import User, WorkoutSession, Exercise, MuscleGroup, Diary, \
      NutritionGoal, NutritionPlan, Meal, FoodItem, HealthStat
 from django.contrib.auth import get_user_model, authenticate
+from django.db import transaction
 from rest_framework import serializers
+from HealthcareApp import rollups
 
 
 User = get_user_model()
@@ -39,15 +41,8 @@ class RegisterSerializer(ModelSerializer):
     def create(self, validated_data):
         try:
             validated_data.pop('password2')
-            avatar = validated_data.pop('avatar', None)
-
-            user = User.objects.create_user(**validated_data)
-
-            if avatar:
-                user.avatar = avatar
-                user.save()
-
-            return user
+            # Ảnh đại diện được thu nhỏ và tải lên ở luồng nền sau khi tạo người dùng (avatars.py)
+            return User.objects.create_user(**validated_data)
         except Exception as e:
             raise ValidationError({"error": f"Lỗi khi tạo tài khoản: {str(e)}"})
 
@@ -96,27 +91,9 @@ class RegisterSerializer(ModelSerializer):
 class UserSerializer(ModelSerializer):
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        # Xử lý avatar URL an toàn và trả về absolute URL
-        avatar_url = ''
-        if instance.avatar:
-            try:
-                if hasattr(instance.avatar, 'url'):
-                    avatar_url = instance.avatar.url
-                    # Nếu URL không phải absolute URL, thêm base URL
-                    if avatar_url and not avatar_url.startswith('http'):
-                        request = self.context.get('request')
-                        if request:
-                            avatar_url = request.build_absolute_uri(avatar_url)
-                elif isinstance(instance.avatar, str):
-                    avatar_url = instance.avatar
-                    if not avatar_url.startswith('http'):
-                        request = self.context.get('request')
-                        if request:
-                            avatar_url = request.build_absolute_uri(avatar_url)
-            except Exception as e:
-                print(f"Error getting avatar URL for user {instance.username}: {str(e)}")
-                avatar_url = ''
-        data['avatar'] = avatar_url
+        # URL avatar đã được tính sẵn khi tải ảnh lên (avatars.py)
+        data['avatar'] = instance.avatar_urls.get('original', '')
+        data['avatar_urls'] = instance.avatar_urls
         return data
 
     class Meta:
@@ -146,7 +123,7 @@ class HieuUserInforSerializer(ModelSerializer):
     
     class Meta:
         model = User
-        fields = ['id', 'username', 'first_name', 'last_name', 'avatar', 'date_of_birth', 'date_joined', 'role']
+        fields = ['id', 'username', 'first_name', 'last_name', 'avatar', 'avatar_urls', 'date_of_birth', 'date_joined', 'role']
 
     def get_date_of_birth(self, obj):
         if obj.date_of_birth:
@@ -204,6 +181,96 @@ class HealthStatSerializer(ModelSerializer):
         health_stat = HealthStat.objects.create(user=user, **validated_data)
         return health_stat
 
+class HealthStatBulkItemSerializer(serializers.Serializer):
+    """Một bản ghi sức khỏe do thiết bị đeo gửi lên, kèm thời điểm ghi nhận"""
+    # USE_TZ=False: thời điểm có múi giờ được đổi về giờ địa phương (TIME_ZONE) như các HealthStat khác
+    date = DateTimeField(default_timezone=timezone.get_default_timezone())
+    weight = FloatField(required=False, allow_null=True, min_value=0)
+    height = FloatField(required=False, allow_null=True, min_value=0)
+    water_intake = FloatField(required=False, min_value=0, default=0)
+    step_count = serializers.IntegerField(required=False, min_value=0, default=0)
+    heart_rate = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+
+    def validate_date(self, value):
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value, timezone.get_default_timezone())
+        # Cho phép lệch đồng hồ vài phút giữa điện thoại và máy chủ
+        if value > timezone.now() + timedelta(minutes=10):
+            raise ValidationError("Thời điểm ghi nhận không được ở tương lai.")
+        return value
+
+class HealthStatBulkSerializer(serializers.Serializer):
+    """
+    Nhận nhiều bản ghi sức khỏe trong một yêu cầu (đồng bộ từ thiết bị đeo).
+    Bản ghi không hợp lệ hoặc trùng thời điểm với dữ liệu đã có được bỏ qua,
+    kết quả trả về theo từng phần tử.
+    """
+    BATCH_SIZE = 500
+
+    readings = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=5000)
+
+    def validate(self, attrs):
+        item_serializer = HealthStatBulkItemSerializer()
+        items = []
+        for index, reading in enumerate(attrs['readings']):
+            try:
+                items.append((index, item_serializer.run_validation(reading), None))
+            except ValidationError as e:
+                items.append((index, None, e.detail))
+        attrs['items'] = items
+        return attrs
+
+    def create(self, validated_data):
+        user = self.context['request'].user
+        items = validated_data['items']
+        valid = [(index, data) for index, data, errors in items if errors is None]
+
+        # Bỏ qua bản ghi đã đồng bộ trước đó (cùng người dùng, cùng thời điểm)
+        existing = set()
+        if valid:
+            moments = [data['date'] for _, data in valid]
+            existing = set(HealthStat.objects.filter(
+                user=user, date__gte=min(moments), date__lte=max(moments)
+            ).values_list('date', flat=True))
+
+        results = {index: {'index': index, 'status': 'error', 'errors': errors}
+                   for index, data, errors in items if errors is not None}
+        objs, indexes = [], []
+        for index, data in valid:
+            if data['date'] in existing:
+                results[index] = {'index': index, 'status': 'duplicate'}
+                continue
+            existing.add(data['date'])
+            # BMI được tính cho cả lô, không qua HealthStat.save()
+            data['bmi'] = HealthStat.calculate_bmi(data.get('weight'), data.get('height'))
+            objs.append(HealthStat(user=user, **data))
+            indexes.append(index)
+
+        with transaction.atomic():
+            for start in range(0, len(objs), self.BATCH_SIZE):
+                batch = objs[start:start + self.BATCH_SIZE]
+                HealthStat.objects.bulk_create(batch)
+                if batch[0].pk is None:
+                    # MySQL không trả về id của các dòng vừa thêm: đọc lại theo thời điểm
+                    # (thời điểm không trùng nhau trong lô và với dữ liệu đã có)
+                    ids = dict(HealthStat.objects.filter(
+                        user=user, date__in=[obj.date for obj in batch]
+                    ).values_list('date', 'id'))
+                    for obj in batch:
+                        obj.pk = ids.get(obj.date)
+            # bulk_create không gửi signal nên cập nhật bảng tổng hợp cho các ngày bị ảnh hưởng
+            rollups.refresh_days((user.id, obj.date.date()) for obj in objs)
+
+        for index, obj in zip(indexes, objs):
+            results[index] = {'index': index, 'status': 'created', 'id': obj.pk}
+
+        return {
+            'created': len(objs),
+            'duplicates': sum(1 for r in results.values() if r['status'] == 'duplicate'),
+            'errors': sum(1 for r in results.values() if r['status'] == 'error'),
+            'results': [results[index] for index in sorted(results)]
+        }
+
 class HealthStatisticSerializer(ModelSerializer):
     date = serializers.SerializerMethodField()
 
@@ -258,15 +325,14 @@ class WorkoutSessionWriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = WorkoutSession
         exclude = ['user']
+        # Tổng thời gian và calories được tính từ các bài tập (xem workout_totals)
+        read_only_fields = ['total_duration', 'calories_burned']
 
     def create(self, validated_data):
         exercises = validated_data.pop('exercise', [])
         instance = super().create(validated_data)
         instance.exercise.set(exercises)
-        # Tính lại tổng calories và thời gian
-        instance.total_duration = sum(ex.duration for ex in instance.exercise.all())
-        instance.calories_burned = sum(ex.calories_burned for ex in instance.exercise.all())
-        instance.save(update_fields=['total_duration', 'calories_burned'])
+        instance.refresh_from_db(fields=['total_duration', 'calories_burned', 'updated_date'])
         return instance
 
     def update(self, instance, validated_data):
@@ -274,9 +340,7 @@ class WorkoutSessionWriteSerializer(serializers.ModelSerializer):
         instance = super().update(instance, validated_data)
         if exercises is not None:
             instance.exercise.set(exercises)
-        instance.total_duration = sum(ex.duration for ex in instance.exercise.all())
-        instance.calories_burned = sum(ex.calories_burned for ex in instance.exercise.all())
-        instance.save(update_fields=['total_duration', 'calories_burned'])
+            instance.refresh_from_db(fields=['total_duration', 'calories_burned', 'updated_date'])
         return instance
 
 class DiarySerializer(ModelSerializer):
@@ -328,7 +392,7 @@ class ExpertCoachSerializer(ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'first_name', 'last_name', 'full_name',
-                 'email', 'role', 'avatar', 'avatar_url', 'date_of_birth',
+                 'email', 'role', 'avatar', 'avatar_url', 'avatar_urls', 'date_of_birth',
                  'health_goals', 'date_joined']
 
     def get_full_name(self, obj):
@@ -339,9 +403,7 @@ class ExpertCoachSerializer(ModelSerializer):
 
     def get_avatar_url(self, obj):
         """Trả về URL của avatar"""
-        if obj.avatar:
-            return obj.avatar.url
-        return None
+        return obj.avatar_urls.get('original')
 
     def get_date_of_birth(self, obj):
         """Trả về ngày sinh dưới dạng chuỗi YYYY-MM-DD"""
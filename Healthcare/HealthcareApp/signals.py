@@ -0,0 +1,280 @@
+from django.contrib.auth.signals import user_logged_out
+from django.core.files.uploadedfile import UploadedFile
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from oauth2_provider.models import get_access_token_model
+from rest_framework.authtoken.models import Token
+
+from HealthcareApp import auth_cache, avatars, catalog, muscle_facets, rollups, search_index, user_search, workout_totals
+from HealthcareApp.models import Exercise, HealthStat, Meal, MuscleGroup, NutritionPlan, User, WorkoutSession
+
+
+def _stat_day(instance):
+    # Chỉ đọc giá trị đã nạp: truy cập trường bị hoãn (only/defer, refresh_from_db(fields=...))
+    # trong post_init sẽ nạp lại đối tượng và gọi lại post_init
+    field = 'date' if isinstance(instance, HealthStat) else 'updated_date'
+    moment = instance.__dict__.get(field)
+    return moment.date() if moment else None
+
+
+def _touch(model, ids):
+    # Thay đổi many-to-many không gọi save(): cập nhật updated_date của đối tượng chứa
+    # quan hệ để GET có điều kiện (conditional.py) nhận ra danh sách đã thay đổi
+    if ids:
+        model.objects.filter(pk__in=list(ids)).update(updated_date=timezone.now())
+
+
+def _deleted_with_user(origin):
+    # Khi xóa người dùng, các bảng tổng hợp bị xóa theo nên không cần tính lại
+    if isinstance(origin, User):
+        return True
+    return isinstance(origin, QuerySet) and origin.model is User
+
+
+@receiver(post_init, sender=HealthStat)
+@receiver(post_init, sender=WorkoutSession)
+def remember_statistic_day(sender, instance, **kwargs):
+    # Lưu ngày ban đầu: updated_date của WorkoutSession thay đổi mỗi lần save()
+    instance._statistic_origin = (instance.__dict__.get('user_id'), _stat_day(instance))
+
+
+@receiver(post_save, sender=HealthStat)
+@receiver(post_save, sender=WorkoutSession)
+def refresh_statistics_on_save(sender, instance, **kwargs):
+    current = (instance.user_id, _stat_day(instance))
+    rollups.refresh_days([current, instance._statistic_origin])
+    instance._statistic_origin = current
+
+
+@receiver(post_delete, sender=HealthStat)
+@receiver(post_delete, sender=WorkoutSession)
+def refresh_statistics_on_delete(sender, instance, origin=None, **kwargs):
+    if _deleted_with_user(origin):
+        return
+    rollups.refresh_days([instance._statistic_origin])
+
+
+@receiver(m2m_changed, sender=WorkoutSession.exercise.through)
+def refresh_session_totals(sender, instance, action, reverse, pk_set, **kwargs):
+    # reverse=True: thay đổi từ phía Exercise (exercise.workout_sessions), pk_set là id buổi tập
+    if action == 'pre_clear' and reverse:
+        instance._cleared_session_ids = list(instance.workout_sessions.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        session_ids = [instance.pk]
+    elif action == 'post_clear':
+        session_ids = instance.__dict__.pop('_cleared_session_ids', [])
+    else:
+        session_ids = pk_set
+    workout_totals.exercises_changed(session_ids)
+
+
+@receiver(post_init, sender=Exercise)
+def remember_exercise_totals(sender, instance, **kwargs):
+    instance._totals_origin = (instance.__dict__.get('duration'), instance.__dict__.get('calories_burned'))
+    instance._catalog_origin = instance.__dict__.get('created_by_id') is None
+
+
+@receiver(post_save, sender=Exercise)
+def refresh_totals_on_exercise_save(sender, instance, created, **kwargs):
+    current = (instance.__dict__.get('duration'), instance.__dict__.get('calories_burned'))
+    if not created and current != instance._totals_origin:
+        # Bài tập phổ biến có thể nằm trong rất nhiều buổi tập nên cập nhật chạy nền
+        workout_totals.schedule_propagation(instance.pk)
+    instance._totals_origin = current
+
+
+@receiver(pre_delete, sender=Exercise)
+def remember_exercise_sessions(sender, instance, **kwargs):
+    # Xóa bài tập xóa dòng trong bảng trung gian mà không gửi m2m_changed
+    instance._affected_session_ids = list(instance.workout_sessions.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Exercise)
+def refresh_totals_on_exercise_delete(sender, instance, **kwargs):
+    workout_totals.exercises_changed(getattr(instance, '_affected_session_ids', []))
+
+
+def _in_catalog(instance):
+    # Chỉ bài tập gợi ý (không có người tạo) thuộc danh mục dùng chung
+    return instance.created_by_id is None or getattr(instance, '_catalog_origin', False)
+
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+def refresh_catalog_on_exercise_change(sender, instance, **kwargs):
+    if _in_catalog(instance):
+        catalog.bump_version()
+    instance._catalog_origin = instance.created_by_id is None
+
+
+@receiver(post_save, sender=MuscleGroup)
+@receiver(post_delete, sender=MuscleGroup)
+def refresh_catalog_on_muscle_group_change(sender, **kwargs):
+    catalog.bump_version()
+
+
+@receiver(m2m_changed, sender=Exercise.muscle_groups.through)
+def refresh_catalog_on_muscle_groups_change(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse or _in_catalog(instance):
+        catalog.bump_version()
+
+
+@receiver(post_save, sender=Exercise)
+def refresh_search_index(sender, instance, **kwargs):
+    search_index.index_exercise(instance)
+
+
+@receiver(pre_save, sender=MuscleGroup)
+def assign_muscle_group_bit(sender, instance, **kwargs):
+    if instance._state.adding and instance.bit is None:
+        muscle_facets.assign_bit(instance)
+
+
+@receiver(m2m_changed, sender=Exercise.muscle_groups.through)
+def refresh_muscle_mask(sender, instance, action, reverse, pk_set, **kwargs):
+    # reverse=True: thay đổi từ phía MuscleGroup, pk_set là id bài tập
+    if action == 'pre_clear' and reverse:
+        instance._cleared_exercise_ids = list(instance.exercise_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        exercise_ids = [instance.pk]
+    elif action == 'post_clear':
+        exercise_ids = instance.__dict__.pop('_cleared_exercise_ids', [])
+    else:
+        exercise_ids = pk_set
+    muscle_facets.recompute_masks(exercise_ids)
+    _touch(Exercise, exercise_ids)
+
+
+@receiver(pre_delete, sender=MuscleGroup)
+def remember_muscle_group_exercises(sender, instance, **kwargs):
+    # Xóa nhóm cơ xóa dòng trong bảng trung gian mà không gửi m2m_changed
+    instance._affected_exercise_ids = list(instance.exercise_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=MuscleGroup)
+def refresh_masks_on_muscle_group_delete(sender, instance, **kwargs):
+    exercise_ids = getattr(instance, '_affected_exercise_ids', [])
+    muscle_facets.recompute_masks(exercise_ids)
+    _touch(Exercise, exercise_ids)
+
+
+@receiver(m2m_changed, sender=NutritionPlan.meals.through)
+def touch_plans_on_meals_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # reverse=True: thay đổi từ phía Meal (meal.nutrition_plans), pk_set là id thực đơn
+    if action == 'pre_clear' and reverse:
+        instance._cleared_plan_ids = list(instance.nutrition_plans.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        _touch(NutritionPlan, [instance.pk])
+    elif action == 'post_clear':
+        _touch(NutritionPlan, instance.__dict__.pop('_cleared_plan_ids', []))
+    else:
+        _touch(NutritionPlan, pk_set)
+
+
+@receiver(pre_delete, sender=Meal)
+def remember_meal_plans(sender, instance, **kwargs):
+    # Xóa bữa ăn xóa dòng trong bảng trung gian mà không gửi m2m_changed
+    instance._affected_plan_ids = list(instance.nutrition_plans.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Meal)
+def touch_plans_on_meal_delete(sender, instance, **kwargs):
+    _touch(NutritionPlan, getattr(instance, '_affected_plan_ids', []))
+
+
+def _search_fields(instance):
+    return tuple(instance.__dict__.get(field) for field in (*user_search.FIELDS, 'role', 'is_active'))
+
+
+@receiver(post_init, sender=User)
+def remember_user_search_fields(sender, instance, **kwargs):
+    instance._search_origin = _search_fields(instance)
+
+
+@receiver(post_save, sender=User)
+def refresh_user_search_index(sender, instance, created, **kwargs):
+    # Bỏ qua các lần lưu không đổi tên/role/trạng thái (ví dụ cập nhật last_login khi đăng nhập)
+    current = _search_fields(instance)
+    if created or current != instance._search_origin:
+        user_search.index_user(instance)
+    instance._search_origin = current
+
+
+@receiver(post_init, sender=User)
+def remember_avatar(sender, instance, **kwargs):
+    instance._avatar_origin = avatars.avatar_key(instance.__dict__.get('avatar'))
+
+
+@receiver(pre_save, sender=User)
+def defer_avatar_upload(sender, instance, **kwargs):
+    # Ảnh mới tải lên được xử lý nền (avatars.py): lưu người dùng với avatar cũ,
+    # không để CloudinaryField upload trong yêu cầu
+    upload = instance.__dict__.get('avatar')
+    if isinstance(upload, UploadedFile):
+        upload.seek(0)
+        instance._pending_avatar = upload.read()
+        instance.avatar = instance._avatar_origin
+
+
+@receiver(post_save, sender=User)
+def process_pending_avatar(sender, instance, **kwargs):
+    data = instance.__dict__.pop('_pending_avatar', None)
+    if data:
+        avatars.schedule_processing(instance.pk, data)
+
+
+@receiver(post_save, sender=User)
+def refresh_avatar_urls(sender, instance, created, **kwargs):
+    # Sau khi lưu, avatar mới đã được CloudinaryField tải lên
+    current = avatars.avatar_key(instance.avatar)
+    if (created and current) or current != instance._avatar_origin:
+        avatars.refresh_urls(instance)
+    instance._avatar_origin = current
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_tokens_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    # Bộ nhớ đệm token giữ cả đối tượng User (auth_cache.py): mọi thay đổi của người dùng đều phải bỏ
+    # các bản đã lưu, trừ lần cập nhật last_login khi đăng nhập
+    if not created and set(update_fields or ()) != {'last_login'}:
+        auth_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_cached_tokens_on_user_delete(sender, instance, **kwargs):
+    auth_cache.invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_cached_tokens_on_logout(sender, user, **kwargs):
+    if user is not None:
+        auth_cache.invalidate_user(user.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token_on_delete(sender, instance, **kwargs):
+    auth_cache.invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=get_access_token_model())
+@receiver(post_delete, sender=get_access_token_model())
+def invalidate_cached_access_token(sender, instance, created=False, **kwargs):
+    # Token đã hết hạn bị bộ nhớ đệm từ chối sẵn (ví dụ khi dọn token hết hạn)
+    if not created and not instance.is_expired():
+        auth_cache.invalidate_user(instance.user_id)
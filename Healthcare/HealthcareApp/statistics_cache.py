@@ -0,0 +1,124 @@
+"""
+Cache kết quả thống kê theo người dùng, loại thống kê và khoảng thời gian.
+
+Mỗi người dùng có một mã phiên bản cho từng tháng có dữ liệu và một mã phiên
+bản chung. Khóa cache chứa mã phiên bản của các tháng mà khoảng thời gian bao
+phủ, nên khi dữ liệu của một ngày thay đổi chỉ các kết quả chứa tháng đó bị
+vô hiệu hóa; thống kê của các kỳ đã kết thúc được giữ lâu dài.
+"""
+import hashlib
+import time
+from datetime import date
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.timezone import now
+
+from HealthcareApp import metrics
+
+# Kỳ đang diễn ra (còn nhận dữ liệu mới) chỉ giữ ngắn hạn
+OPEN_PERIOD_TIMEOUT = 60 * 10
+# Kỳ đã kết thúc chỉ thay đổi khi dữ liệu cũ bị chỉnh sửa
+CLOSED_PERIOD_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def _user_version_key(user_id):
+    return f'statistics:version:{user_id}'
+
+
+def _month_version_key(user_id, month):
+    return f'statistics:version:{user_id}:{month:%Y-%m}'
+
+
+def _months(start_date, end_date):
+    month = start_date.replace(day=1)
+    while month <= end_date:
+        yield month
+        year, index = divmod(month.month, 12)
+        month = date(month.year + year, index + 1, 1)
+
+
+def _new_version():
+    return str(time.time_ns())
+
+
+def _version_keys(user_id, start_date, end_date):
+    keys = [_user_version_key(user_id)]
+    keys += [_month_version_key(user_id, month) for month in _months(start_date, end_date)]
+    return keys
+
+
+def _versions_many(user_ids, start_date, end_date):
+    keys_by_user = {user_id: _version_keys(user_id, start_date, end_date) for user_id in user_ids}
+    all_keys = [key for keys in keys_by_user.values() for key in keys]
+
+    versions = cache.get_many(all_keys)
+    missing = {key: _new_version() for key in all_keys if key not in versions}
+    if missing:
+        # Mã phiên bản mới (không phải 0) để không dùng lại kết quả cũ khi khóa phiên bản bị xóa khỏi cache
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    # Băm các mã phiên bản để khóa cache không vượt quá 250 ký tự (giới hạn của memcached)
+    return {
+        user_id: hashlib.md5('.'.join(versions[key] for key in keys).encode()).hexdigest()
+        for user_id, keys in keys_by_user.items()
+    }
+
+
+def get_many_or_compute(namespace, user_ids, start_date, end_date, params, compute_many):
+    """
+    Như get_or_compute nhưng cho nhiều người dùng: đọc mã phiên bản và kết quả
+    bằng get_many, chỉ gọi `compute_many(missing_user_ids)` một lần cho các
+    người dùng chưa có trong cache. `compute_many` trả về dict theo user_id.
+    """
+    versions = _versions_many(user_ids, start_date, end_date)
+    params_key = ':'.join(str(value) for value in params)
+    keys = {
+        user_id: f'statistics:{namespace}:{user_id}:{start_date}:{end_date}:{params_key}:{version}'
+        for user_id, version in versions.items()
+    }
+
+    cached = cache.get_many(keys.values())
+    results = {user_id: cached[key] for user_id, key in keys.items() if key in cached}
+    missing = [user_id for user_id in keys if user_id not in results]
+    metrics.cache_result('statistics', hit=True, count=len(results))
+    metrics.cache_result('statistics', hit=False, count=len(missing))
+    if missing:
+        computed = compute_many(missing)
+        timeout = CLOSED_PERIOD_TIMEOUT if end_date < now().date() else OPEN_PERIOD_TIMEOUT
+        cache.set_many({keys[user_id]: computed[user_id] for user_id in missing}, timeout=timeout)
+        results.update(computed)
+    return results
+
+
+def get_or_compute(namespace, user_id, start_date, end_date, params, compute):
+    """
+    Lấy kết quả thống kê từ cache hoặc tính bằng `compute()` rồi lưu lại.
+    `params` là các tham số (ngoài khoảng thời gian) ảnh hưởng đến kết quả.
+    """
+    results = get_many_or_compute(namespace, [user_id], start_date, end_date, params,
+                                  lambda user_ids: {user_id: compute()})
+    return results[user_id]
+
+
+def _bump_on_commit(keys):
+    # Đổi mã phiên bản sau khi transaction được commit: nếu đổi ngay, yêu cầu đọc đồng thời
+    # có thể tính lại từ dữ liệu cũ và lưu kết quả dưới mã phiên bản mới
+    keys = set(keys)
+    if keys:
+        transaction.on_commit(lambda: cache.set_many({key: _new_version() for key in keys}, timeout=None))
+
+
+def invalidate_day(user_id, day):
+    """Vô hiệu hóa các kết quả có khoảng thời gian chứa `day` (sau khi transaction hiện tại được commit)"""
+    _bump_on_commit([_month_version_key(user_id, day)])
+
+
+def invalidate_days(user_days):
+    """Như invalidate_day cho nhiều cặp (user_id, ngày), ghi bằng một lệnh set_many"""
+    _bump_on_commit(_month_version_key(user_id, day) for user_id, day in user_days)
+
+
+def invalidate_user(user_id):
+    """Vô hiệu hóa toàn bộ kết quả thống kê của người dùng (sau khi transaction hiện tại được commit)"""
+    _bump_on_commit([_user_version_key(user_id)])
@@ -0,0 +1,331 @@
+"""
+Engine tính thống kê tập luyện và sức khỏe theo từng chu kỳ (ngày/tuần/tháng).
+
+Dữ liệu được đọc từ bảng tổng hợp DailyStatistic/MonthlyStatistic (xem
+rollups.py): thống kê theo tháng đọc một dòng cho mỗi tháng trọn vẹn và các
+dòng theo ngày của phần tháng lẻ ở hai đầu, thống kê theo ngày/tuần đọc một
+dòng cho mỗi ngày. Khoảng thời gian tùy chọn tối đa MAX_CUSTOM_DAYS ngày nên
+mỗi yêu cầu đọc tối đa khoảng một năm dòng tổng hợp; các chu kỳ không có dữ
+liệu được điền trong bộ nhớ.
+"""
+from collections import defaultdict
+import calendar
+from datetime import date, datetime, timedelta
+
+from django.db import connection
+from django.db.models import F, Q, Window
+from django.db.models.functions import FirstValue
+
+from HealthcareApp.models import DailyStatistic, MonthlyStatistic
+from HealthcareApp.rollups import HEALTH_FIELDS, RollupTotals
+
+DAILY = 'daily'
+WEEKLY = 'weekly'
+MONTHLY = 'monthly'
+GRANULARITIES = (DAILY, WEEKLY, MONTHLY)
+
+# Độ dài tối đa của khoảng thời gian tùy chọn (period=custom)
+MAX_CUSTOM_DAYS = 366
+
+# Các chỉ số được tính thay đổi giữa bản ghi đầu và cuối kỳ (track-changes)
+CHANGE_METRICS = ('weight', 'height', 'bmi', 'heart_rate')
+
+
+def bucket_start(day, granularity):
+    """Ngày bắt đầu của chu kỳ chứa `day`"""
+    if granularity == WEEKLY:
+        return day - timedelta(days=day.weekday())
+    if granularity == MONTHLY:
+        return day.replace(day=1)
+    return day
+
+
+def build_buckets(start_date, end_date, granularity):
+    """Danh sách ngày bắt đầu của các chu kỳ trong khoảng [start_date, end_date]"""
+    if granularity not in GRANULARITIES:
+        raise ValueError('Invalid granularity. Use daily, weekly or monthly')
+
+    buckets = []
+    current = bucket_start(start_date, granularity)
+    while current <= end_date:
+        buckets.append(current)
+        if granularity == DAILY:
+            current += timedelta(days=1)
+        elif granularity == WEEKLY:
+            current += timedelta(days=7)
+        else:
+            year, month = divmod(current.month, 12)
+            current = date(current.year + year, month + 1, 1)
+    return buckets
+
+
+def resolve_period(period, params, today):
+    """
+    Xác định khoảng thời gian và độ chi tiết của thống kê từ tham số period
+    (weekly/monthly/yearly/custom) và các tham số week, month, year,
+    start_date, end_date, granularity. Tham số không hợp lệ gây ValueError.
+    """
+    if period == 'weekly':
+        week_param = params.get('week')
+
+        if week_param:
+            try:
+                # Format should be YYYY-Wnn
+                year_str, week_str = week_param.split('-W')
+                year = int(year_str)
+                week = int(week_str)
+
+                # Tính ngày đầu tiên của tuần (thứ 2)
+                first_day = datetime(year, 1, 1).date()
+
+                # Ngày đầu tiên của tuần đầu tiên của năm (ngày thứ 2 đầu tiên)
+                if first_day.weekday() > 0:  # Không phải thứ 2
+                    first_day = first_day - timedelta(days=first_day.weekday())
+                    first_day = first_day + timedelta(days=7)  # Đến thứ 2 tuần sau
+
+                # Tính ngày đầu tiên của tuần được chọn
+                start_date = first_day + timedelta(weeks=week-1)
+                end_date = start_date + timedelta(days=6)  # 7 ngày từ ngày bắt đầu
+
+            except (ValueError, TypeError):
+                raise ValueError('Invalid week format. Use YYYY-Wnn')
+        else:
+            # Default to current week if no week specified
+            start_date = today - timedelta(days=today.weekday())  # Thứ 2 của tuần hiện tại
+            end_date = min(start_date + timedelta(days=6), today)  # Chủ nhật hoặc hôm nay, tùy cái nào sớm hơn
+
+        granularity = DAILY
+
+    elif period == 'monthly':
+        month_param = params.get('month')
+
+        if month_param:
+            try:
+                year, month = map(int, month_param.split('-'))
+                start_date = datetime(year, month, 1).date()
+
+                _, last_day = calendar.monthrange(year, month)
+                end_date = datetime(year, month, last_day).date()
+
+                # Nếu là tháng hiện tại, end_date là hôm nay
+                if year == today.year and month == today.month:
+                    end_date = min(end_date, today)
+            except (ValueError, TypeError):
+                raise ValueError('Invalid month format. Use YYYY-MM')
+        else:
+            # Tháng hiện tại
+            start_date = today.replace(day=1)  # Ngày đầu tiên của tháng
+            _, last_day = calendar.monthrange(today.year, today.month)
+            end_date = min(today.replace(day=last_day), today)  # Ngày cuối cùng của tháng hoặc hôm nay
+
+        granularity = DAILY
+
+    elif period == 'yearly':
+        year_param = params.get('year')
+
+        if year_param:
+            try:
+                year = int(year_param)
+                start_date = datetime(year, 1, 1).date()
+
+                if year == today.year:
+                    # Nếu là năm hiện tại, end_date là hôm nay
+                    end_date = today
+                else:
+                    end_date = datetime(year, 12, 31).date()
+            except (ValueError, TypeError):
+                raise ValueError('Invalid year format. Use YYYY')
+        else:
+            # Năm hiện tại
+            start_date = datetime(today.year, 1, 1).date()
+            end_date = today
+
+        granularity = MONTHLY
+    elif period == 'custom':
+        try:
+            start_date = date.fromisoformat(params.get('start_date', ''))
+            end_date = date.fromisoformat(params.get('end_date', ''))
+        except ValueError:
+            raise ValueError('Invalid date format. Use YYYY-MM-DD')
+        if start_date > end_date:
+            raise ValueError('start_date must be before end_date')
+        if (end_date - start_date).days >= MAX_CUSTOM_DAYS:
+            raise ValueError(f'Custom range must not exceed {MAX_CUSTOM_DAYS} days')
+        granularity = params.get('granularity', DAILY)
+        if granularity not in GRANULARITIES:
+            raise ValueError('Invalid granularity. Use daily, weekly or monthly')
+    else:
+        raise ValueError('Invalid period. Use weekly, monthly, yearly or custom')
+
+    return start_date, end_date, granularity
+
+
+def _next_month(day):
+    year, month = divmod(day.month, 12)
+    return date(day.year + year, month + 1, 1)
+
+
+def _whole_months(start_date, end_date):
+    """
+    [đầu tháng trọn vẹn đầu tiên, đầu tháng sau tháng trọn vẹn cuối cùng) trong
+    khoảng thời gian. Tháng cuối chỉ trọn vẹn khi end_date là ngày cuối tháng: tháng
+    hiện tại kết thúc hôm nay vẫn là phần lẻ, vì MonthlyStatistic còn chứa bản ghi
+    sau end_date (thời điểm ở tương lai, đồng hồ thiết bị lệch).
+    """
+    first = start_date if start_date.day == 1 else _next_month(start_date)
+    if (end_date + timedelta(days=1)).day == 1:
+        after_last = _next_month(end_date)
+    else:
+        after_last = end_date.replace(day=1)
+    return first, after_last
+
+
+def _rollup_querysets(start_date, end_date, granularity):
+    """
+    Các queryset dòng tổng hợp của khoảng thời gian: theo tháng dùng
+    MonthlyStatistic cho các tháng trọn vẹn và DailyStatistic cho phần lẻ ở hai đầu
+    """
+    if granularity == MONTHLY:
+        first, after_last = _whole_months(start_date, end_date)
+        if first < after_last:
+            querysets = [MonthlyStatistic.objects.filter(period_start__gte=first, period_start__lt=after_last)]
+            if start_date < first:
+                querysets.append(DailyStatistic.objects.filter(period_start__gte=start_date, period_start__lt=first))
+            if after_last <= end_date:
+                querysets.append(DailyStatistic.objects.filter(period_start__range=(after_last, end_date)))
+            return querysets
+    return [DailyStatistic.objects.filter(period_start__range=(start_date, end_date))]
+
+
+def load_rollups(user, start_date, end_date, granularity):
+    """Các dòng tổng hợp của người dùng trong khoảng thời gian, theo thứ tự ngày"""
+    rows = [row for queryset in _rollup_querysets(start_date, end_date, granularity)
+            for row in queryset.filter(user=user)]
+    return sorted(rows, key=lambda row: row.period_start)
+
+
+def load_rollups_for_users(user_ids, start_date, end_date, granularity):
+    """
+    Các dòng tổng hợp của nhiều người dùng, đọc bằng một truy vấn cho mỗi bảng
+    (user_id IN ...) và nhóm theo user_id trong bộ nhớ.
+    """
+    grouped = {user_id: [] for user_id in user_ids}
+    for queryset in _rollup_querysets(start_date, end_date, granularity):
+        for row in queryset.filter(user_id__in=list(grouped)):
+            grouped[row.user_id].append(row)
+    for rows in grouped.values():
+        rows.sort(key=lambda row: row.period_start)
+    return grouped
+
+
+def summarize_rollups(rows, start_date, end_date, granularity):
+    """
+    Thống kê đầy đủ cho màn hình Statistic từ các dòng tổng hợp: chuỗi tập
+    luyện, chuỗi sức khỏe và các giá trị tổng hợp của khoảng thời gian.
+    - daily: chỉ số sức khỏe là giá trị của bản ghi mới nhất trong ngày
+    - weekly/monthly: chỉ số sức khỏe là giá trị trung bình trong chu kỳ
+    """
+    buckets = build_buckets(start_date, end_date, granularity)
+
+    per_bucket = defaultdict(RollupTotals)
+    overall = RollupTotals()
+    for row in rows:
+        per_bucket[bucket_start(row.period_start, granularity)].merge(row)
+        overall.merge(row)
+
+    def health_value(bucket, field):
+        if bucket not in per_bucket or not per_bucket[bucket].health_records:
+            return None
+        if granularity == DAILY:
+            return getattr(per_bucket[bucket], f'latest_{field}')
+        return per_bucket[bucket].average(field)
+
+    weight_change = None
+    if overall.health_records > 1 and overall.first_weight and overall.latest_weight:
+        weight_change = overall.latest_weight - overall.first_weight
+
+    return {
+        'granularity': granularity,
+        'buckets': buckets,
+        # Dữ liệu tập luyện
+        'total_calories_burned': [per_bucket[b].calories_burned if b in per_bucket else 0 for b in buckets],
+        'total_time': [per_bucket[b].total_duration if b in per_bucket else 0 for b in buckets],
+        'total_sessions': overall.sessions,
+        # Dữ liệu sức khỏe
+        'weight_data': [health_value(b, 'weight') for b in buckets],
+        'bmi_data': [health_value(b, 'bmi') for b in buckets],
+        'water_intake_data': [health_value(b, 'water_intake') for b in buckets],
+        'step_count_data': [health_value(b, 'step_count') for b in buckets],
+        'heart_rate_data': [health_value(b, 'heart_rate') for b in buckets],
+        # Thống kê tổng hợp
+        'health_summary': {f'avg_{field}': overall.average(field) for field in HEALTH_FIELDS},
+        'weight_change': weight_change,
+    }
+
+
+def compute_statistics(user, start_date, end_date, granularity):
+    """Thống kê của một người dùng (xem summarize_rollups)"""
+    rows = load_rollups(user, start_date, end_date, granularity)
+    return summarize_rollups(rows, start_date, end_date, granularity)
+
+
+def compute_statistics_for_users(user_ids, start_date, end_date, granularity):
+    """Thống kê của nhiều người dùng với số truy vấn cố định, trả về dict theo user_id"""
+    grouped = load_rollups_for_users(user_ids, start_date, end_date, granularity)
+    return {user_id: summarize_rollups(rows, start_date, end_date, granularity)
+            for user_id, rows in grouped.items()}
+
+
+def first_and_last_records(user, start_date, end_date):
+    """
+    Bản ghi HealthStat đầu tiên và mới nhất trong khoảng thời gian, đọc từ
+    DailyStatistic bằng một truy vấn dùng window function (FIRST_VALUE) để lấy
+    ngày đầu và ngày cuối có dữ liệu. Backend không hỗ trợ window function
+    dùng hai truy vấn riêng.
+    """
+    daily_statistics = DailyStatistic.objects.filter(
+        user=user,
+        period_start__range=(start_date, end_date),
+        health_records__gt=0
+    )
+
+    if connection.features.supports_over_clause:
+        rows = list(daily_statistics.annotate(
+            first_day=Window(FirstValue('period_start'), order_by=F('period_start').asc()),
+            last_day=Window(FirstValue('period_start'), order_by=F('period_start').desc()),
+        ).filter(
+            Q(period_start=F('first_day')) | Q(period_start=F('last_day'))
+        ).select_related('first_stat', 'latest_stat').order_by('period_start'))
+        if not rows:
+            return None, None
+        return rows[0].first_stat, rows[-1].latest_stat
+
+    first_day = daily_statistics.select_related('first_stat').order_by('period_start').first()
+    last_day = daily_statistics.select_related('latest_stat').order_by('-period_start').first()
+    return (first_day.first_stat if first_day else None,
+            last_day.latest_stat if last_day else None)
+
+
+def compute_changes(user, start_date, end_date, metrics=CHANGE_METRICS):
+    """Bản ghi đầu, cuối kỳ và mức thay đổi của từng chỉ số trong `metrics`"""
+    first_record, last_record = first_and_last_records(user, start_date, end_date)
+
+    changes = {f'{metric}_change': None for metric in metrics}
+    if first_record and last_record and first_record.id != last_record.id:
+        for metric in metrics:
+            first_value = getattr(first_record, metric)
+            last_value = getattr(last_record, metric)
+            if first_value is not None and last_value is not None:
+                changes[f'{metric}_change'] = round(last_value - first_value, 2)
+
+    def describe(record):
+        if not record:
+            return None
+        return {'id': record.id, 'date': record.date,
+                **{metric: getattr(record, metric) for metric in metrics}}
+
+    return {
+        'first_record': describe(first_record),
+        'last_record': describe(last_record),
+        'changes': changes
+    }
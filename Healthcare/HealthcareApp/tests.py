@@ -1,3 +1,1888 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.http import http_date
+from cloudinary import CloudinaryResource
+from oauth2_provider.models import AccessToken, Application, RefreshToken
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from django.test import TestCase, override_settings
+
+from HealthcareApp import auth_cache, avatars, downsampling, metrics, muscle_facets, nplusone, paginators, profiling, rollups, \
+    search_index, stats, token_cleanup, user_search, workout_totals
+from HealthcareApp.models import DailyStatistic, Exercise, ExerciseSearchTerm, HealthGoals, HealthStat, Meal, \
+    MonthlyStatistic, MuscleGroup, NutritionPlan, Role, User, UserSearchTerm, WorkoutSession
+from HealthcareApp.query_planner import optimize_queryset
+from HealthcareApp.serializers import WorkoutSessionReadSerializer, WorkoutSessionWriteSerializer
+
+
+def _mysql_tables(node):
+    # Duyệt cây EXPLAIN FORMAT=JSON của MySQL, trả về các nút "table"
+    if isinstance(node, dict):
+        if 'table_name' in node:
+            yield node
+        for value in node.values():
+            yield from _mysql_tables(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _mysql_tables(value)
+
+
+def _rounded(value):
+    """`value` với các số thực được làm tròn, đệ quy trong dict và list"""
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, dict):
+        return {key: _rounded(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_rounded(item) for item in value]
+    return value
+
+
+@contextmanager
+def _count_queries():
+    """
+    Đếm truy vấn của khối lệnh. CaptureQueriesContext không dùng được qua test
+    client vì connection.queries bị xóa khi bắt đầu mỗi yêu cầu.
+    """
+    queries = []
+
+    def count(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        yield queries
+
+
+@skipUnless(connection.vendor in ('sqlite', 'mysql'), "Chỉ hỗ trợ kiểm tra query plan trên SQLite/MySQL")
+class QueryPlanTests(TestCase):
+    """
+    Kiểm tra các truy vấn chính dùng đúng index, tránh quét toàn bảng khi có
+    thay đổi về model hoặc cách lọc dữ liệu.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='plan', password='plan')
+        for i in range(20):
+            HealthStat.objects.create(user=cls.user, weight=60 + i, height=1.7)
+            WorkoutSession.objects.create(user=cls.user, name=f'Session {i}',
+                                          schedule=datetime(2025, 1, 1) + timedelta(days=i))
+            Exercise.objects.create(name=f'Exercise {i}', description='', difficulty_level='Easy',
+                                    duration=10, calories_burned=50, rating=4,
+                                    created_by=cls.user if i % 2 else None)
+
+    def assertUsesIndex(self, queryset, index_name=None, boolean_filter=False):
+        """
+        Truy vấn không được quét toàn bảng và (nếu có) phải dùng index `index_name`.
+        SQLite sinh "WHERE is_active" nên không dùng được cột boolean trong index,
+        khi đó tên index chỉ được kiểm tra trên MySQL ("is_active = true").
+        """
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            self.assertRegex(plan, rf'SEARCH {table} USING (COVERING )?INDEX', plan)
+            if index_name and not boolean_filter:
+                self.assertIn(index_name, plan, plan)
+        else:
+            plan = json.loads(queryset.explain(format='json'))
+            nodes = [node for node in _mysql_tables(plan) if node['table_name'] == table]
+            self.assertTrue(nodes, plan)
+            for node in nodes:
+                self.assertNotEqual(node.get('access_type'), 'ALL', plan)
+                if index_name:
+                    self.assertEqual(node.get('key'), index_name, plan)
+
+    def test_health_stats_range_uses_user_date_index(self):
+        queryset = rollups.health_stats_between(self.user.id, date(2025, 1, 1), date(2025, 1, 31))
+        self.assertUsesIndex(queryset.order_by('date', 'id'), 'healthstat_user_date_idx')
+
+    def test_health_stats_history_uses_user_date_index(self):
+        queryset = HealthStat.objects.filter(user=self.user).order_by('-date', '-id')
+        self.assertUsesIndex(queryset, 'healthstat_user_date_idx')
+
+    def test_workout_sessions_range_uses_active_updated_index(self):
+        queryset = rollups.workout_sessions_between(self.user.id, date(2025, 1, 1), date(2025, 1, 31))
+        self.assertUsesIndex(queryset, 'workout_user_active_upd_idx', boolean_filter=True)
+
+    def test_workout_sessions_by_schedule_uses_schedule_index(self):
+        queryset = WorkoutSession.objects.filter(
+            user=self.user,
+            schedule__gte=datetime(2025, 1, 1),
+            schedule__lt=datetime(2025, 2, 1)
+        )
+        self.assertUsesIndex(queryset, 'workout_user_schedule_idx')
+
+    def test_personal_exercises_use_creator_index(self):
+        queryset = Exercise.objects.filter(created_by=self.user, is_active=True)
+        self.assertUsesIndex(queryset, 'exercise_creator_active_idx', boolean_filter=True)
+
+    def test_daily_statistics_range_uses_unique_index(self):
+        queryset = DailyStatistic.objects.filter(
+            user=self.user,
+            period_start__range=(date(2025, 1, 1), date(2025, 12, 31))
+        ).order_by('period_start')
+        self.assertUsesIndex(queryset)
+
+    def test_exercise_search_uses_term_index(self):
+        queryset = ExerciseSearchTerm.objects.filter(
+            search_index.match_term('exer'), Q(owner=self.user) | Q(owner__isnull=True)
+        )
+        self.assertUsesIndex(queryset, 'exercise_search_term_idx')
+
+    def test_user_search_uses_term_index(self):
+        queryset = UserSearchTerm.objects.filter(search_index.match_term('pla'), role__in=[Role.EXPERT.value])
+        self.assertUsesIndex(queryset, 'user_search_term_idx')
+
+    def test_user_list_uses_date_joined_index(self):
+        queryset = User.objects.filter(role=Role.EXPERT.value).order_by('-date_joined', '-id')
+        self.assertUsesIndex(queryset, 'user_role_date_joined_idx')
+
+
+@override_settings(NPLUSONE_DETECTION='raise')
+class NPlusOneTests(TestCase):
+    """Các API danh sách không được chạy lặp cùng một truy vấn cho từng phần tử (xem nplusone.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='nplusone', password='nplusone', role=Role.EXPERT.value)
+        groups = [MuscleGroup.objects.create(name=f'Group {i}') for i in range(3)]
+        exercises = []
+        for i in range(6):
+            exercise = Exercise.objects.create(name=f'Exercise {i}', description='', difficulty_level='Easy',
+                                               duration=10, calories_burned=50, rating=4)
+            exercise.muscle_groups.set(groups)
+            exercises.append(exercise)
+        for i in range(6):
+            User.objects.create_user(username=f'coach{i}', password='coach', role=Role.COACH.value)
+            HealthStat.objects.create(user=cls.user, weight=60 + i, height=1.7)
+            session = WorkoutSession.objects.create(user=cls.user, name=f'Session {i}',
+                                                    schedule=datetime(2025, 1, 1) + timedelta(days=i))
+            session.exercise.set(exercises)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_endpoints(self):
+        for url in ['/workout-sessions/', '/workout-sessions-read/', '/exercises/', '/health-stats/',
+                    '/health-statistic/', '/hieu-user-infor/', '/api/experts-coaches/',
+                    '/api/my-statistics/?period=monthly']:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_serializer_field_and_source_are_reported(self):
+        sessions = WorkoutSession.objects.filter(user=self.user)
+        with self.assertLogs('HealthcareApp.nplusone', 'WARNING') as logs, \
+                mock.patch.object(nplusone, '_reported', set()), nplusone.detect(mode=nplusone.LOG) as detector:
+            line = sys._getframe().f_lineno + 1
+            WorkoutSessionReadSerializer(sessions, many=True).data
+        source = f'HealthcareApp/tests.py:{line} in test_serializer_field_and_source_are_reported'
+        report = {item['field']: item for item in detector.report()}
+        self.assertEqual(set(report), {'WorkoutSessionReadSerializer.exercise', 'ExerciseSerializer.muscle_groups'})
+        self.assertEqual(report['WorkoutSessionReadSerializer.exercise']['count'], 6)
+        self.assertEqual(report['ExerciseSerializer.muscle_groups']['count'], 36)
+        self.assertTrue(all(item['source'] == source for item in report.values()))
+        self.assertEqual(len(logs.records), 2)
+
+    def test_loop_outside_serializer(self):
+        with self.assertRaises(nplusone.NPlusOneError) as raised:
+            with nplusone.detect() as detector:
+                for session in WorkoutSession.objects.filter(user=self.user):
+                    line = sys._getframe().f_lineno + 1
+                    list(session.exercise.all())
+        [item] = detector.report()
+        self.assertIsNone(item['field'])
+        self.assertEqual(item['source'], f'HealthcareApp/tests.py:{line} in test_loop_outside_serializer')
+        self.assertIn('6 truy vấn giống nhau', str(raised.exception))
+
+    def test_prefetched_queryset_is_not_reported(self):
+        sessions = optimize_queryset(WorkoutSession.objects.filter(user=self.user), WorkoutSessionReadSerializer)
+        with nplusone.detect() as detector:
+            WorkoutSessionReadSerializer(sessions, many=True).data
+        self.assertEqual(detector.report(), [])
+
+    def test_view_is_reported(self):
+        with override_settings(NPLUSONE_THRESHOLD=1), self.assertRaises(nplusone.NPlusOneError) as raised:
+            self.client.get('/workout-sessions/')
+        self.assertIn('view=WorkoutSessionViewSet', str(raised.exception))
+
+    def test_log_mode_reports_each_pattern_once(self):
+        with mock.patch.object(nplusone, '_reported', set()):
+            with self.assertLogs('HealthcareApp.nplusone', 'WARNING') as logs:
+                for _ in range(2):
+                    with nplusone.detect(mode=nplusone.LOG):
+                        for session in WorkoutSession.objects.filter(user=self.user):
+                            list(session.exercise.all())
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].nplusone['count'], 6)
+
+
+class ProfilingTests(TestCase):
+    """Chỉ nhân viên profile được yêu cầu, profile không lưu tham số truy vấn (xem profiling.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='staff', password='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='member', password='member')
+        HealthStat.objects.create(user=cls.user, weight=60, height=1.7)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings_override = override_settings(PROFILING_DIR=self.directory.name, PROFILING_MAX_PROFILES=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def token_client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+        return client
+
+    def test_non_staff_header_is_ignored(self):
+        response = self.token_client(self.user).get('/health-stats/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header(profiling.ID_HEADER))
+        self.assertEqual(profiling.list_profiles(), [])
+
+    def test_staff_request_is_profiled_without_params(self):
+        response = self.token_client(self.staff).get('/exercises/', HTTP_X_PROFILE='1')
+        profile = profiling.load(response[profiling.ID_HEADER])
+        self.assertEqual((profile['route'], profile['username']), ('exercises.list', 'staff'))
+        self.assertIn('function calls', profile['stats'])
+        self.assertTrue(profile['queries'])
+        self.assertTrue(all(set(query) == {'sql', 'ms'} for query in profile['queries']))
+
+    def test_only_newest_profiles_are_kept(self):
+        client = self.token_client(self.staff)
+        ids = [client.get('/exercises/', HTTP_X_PROFILE='1')[profiling.ID_HEADER] for _ in range(3)]
+        self.assertEqual({profile['id'] for profile in profiling.list_profiles()}, set(ids[1:]))
+
+    def test_admin_views_require_staff(self):
+        profile_id = self.token_client(self.staff).get('/exercises/', HTTP_X_PROFILE='1')[profiling.ID_HEADER]
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/admin/profiles/').status_code, 302)
+        self.client.force_login(self.staff)
+        self.assertContains(self.client.get('/admin/profiles/'), profile_id)
+        self.assertContains(self.client.get(f'/admin/profiles/{profile_id}/?sort=tottime'), 'function calls')
+        self.assertEqual(self.client.get(f'/admin/profiles/{profile_id}/download/').status_code, 200)
+        self.assertEqual(self.client.get('/admin/profiles/..%2Fsettings/').status_code, 404)
+
+
+class MetricsTests(TestCase):
+    """Số liệu theo route, gộp tệp của các worker và quyền xem /metrics/ (xem metrics.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='metrics', password='metrics')
+        cls.staff = User.objects.create_user(username='metrics-staff', password='staff', is_staff=True)
+
+    def sample(self, body, line_prefix):
+        """Giá trị của dòng số liệu bắt đầu bằng `line_prefix`, 0 nếu chưa có"""
+        for line in body.splitlines():
+            if line.startswith(line_prefix + ' '):
+                return float(line.rsplit(' ', 1)[1])
+        return 0
+
+    def scrape(self):
+        return metrics.render(metrics.collect())
+
+    def test_requests_are_labelled_by_route(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        requests_line = 'http_requests_total{route="exercises.list",method="GET",status="200"}'
+        stats_line = 'http_request_db_queries_count{route="api/my-statistics/"}'
+        before = self.scrape()
+        client.get('/exercises/')
+        client.get('/api/my-statistics/?period=monthly')
+        after = self.scrape()
+        self.assertEqual(self.sample(after, requests_line) - self.sample(before, requests_line), 1)
+        self.assertEqual(self.sample(after, stats_line) - self.sample(before, stats_line), 1)
+
+    def test_histogram_buckets_are_cumulative(self):
+        merged = {name: {} for name in metrics.METRICS}
+        merged['http_request_db_queries'][('route',)] = [1, 0, 2] + [0] * (len(metrics.QUERY_BUCKETS) - 2) + [9]
+        body = metrics.render(merged)
+        self.assertIn('http_request_db_queries_bucket{route="route",le="0"} 1', body)
+        self.assertIn('http_request_db_queries_bucket{route="route",le="2"} 3', body)
+        self.assertIn('http_request_db_queries_bucket{route="route",le="+Inf"} 3', body)
+        self.assertIn('http_request_db_queries_sum{route="route"} 9', body)
+
+    def test_cache_results_are_counted(self):
+        line = 'cache_requests_total{cache="test",result="miss"}'
+        before = self.sample(self.scrape(), line)
+        metrics.cache_result('test', hit=False, count=2)
+        metrics.cache_result('test', hit=False, count=0)
+        self.assertEqual(self.sample(self.scrape(), line) - before, 2)
+
+    def test_worker_snapshots_are_merged_and_stale_ones_pruned(self):
+        line = 'cache_requests_total{cache="worker",result="hit"}'
+        snapshot = {'cache_requests_total': [[['worker', 'hit'], 3]]}
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            fresh = Path(directory, 'metrics-1-1.json')
+            stale = Path(directory, 'metrics-2-2.json')
+            fresh.write_text(json.dumps(snapshot))
+            stale.write_text(json.dumps(snapshot))
+            os.utime(stale, (time.time() - 7200, time.time() - 7200))
+            self.assertEqual(self.sample(self.scrape(), line), 3)
+            self.assertFalse(stale.exists())
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_requires_token_or_staff(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/metrics/').status_code, 200)
+
+    def test_endpoint_is_staff_only_without_token(self):
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+
+class AuthCacheTests(TestCase):
+    """Bộ nhớ đệm token: LRU, thời gian sống và các trường hợp bỏ token đã lưu (xem auth_cache.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cached', password='cached', first_name='Old')
+        cls.application = Application.objects.create(name='app', client_type='confidential',
+                                                     authorization_grant_type='password', user=cls.user)
+
+    def setUp(self):
+        auth_cache.tokens.clear()
+        cache.clear()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get(self, url='/users/current-user/'):
+        with _count_queries() as queries:
+            response = self.client.get(url)
+        return response, len(queries)
+
+    def test_lru_and_ttl(self):
+        tokens = auth_cache.TokenCache(max_size=2, ttl=100)
+        tokens.set('a', 1)
+        tokens.set('b', 2)
+        tokens.get('a')
+        tokens.set('c', 3)
+        self.assertEqual((tokens.get('a'), tokens.get('b'), tokens.get('c')), (1, None, 3))
+        expired = auth_cache.TokenCache(max_size=2, ttl=0)
+        expired.set('a', 1)
+        self.assertIsNone(expired.get('a'))
+
+    def test_cached_token_skips_auth_queries(self):
+        _, first = self.get('/muscle-groups/')
+        response, second = self.get('/muscle-groups/')
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(second, first)
+
+    def test_deleted_token_is_rejected(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(self.get()[0].status_code, 401)
+
+    def test_profile_change_is_visible(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(pk=self.user.pk)
+            user.first_name = 'New'
+            user.save()
+        self.assertEqual(self.get()[0].data['first_name'], 'New')
+
+    def test_avatar_update_is_visible(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True), \
+                override_settings(AVATAR_STORAGE='HealthcareApp.avatars.FileSystemAvatarStorage'):
+            user = User.objects.get(pk=self.user.pk)
+            user.avatar = 'user_avatar/new.jpg'
+            avatars.refresh_urls(user)
+        self.assertEqual(self.get()[0].data['avatar_urls'], user.avatar_urls)
+
+    def test_last_login_update_keeps_cache(self):
+        self.get()
+        _, cached = self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(pk=self.user.pk).save(update_fields=['last_login'])
+        self.assertEqual(self.get()[1], cached)
+
+    def test_revoked_access_token_is_rejected(self):
+        access_token = AccessToken.objects.create(user=self.user, token='bearer-token', application=self.application,
+                                                  expires=timezone.now() + timedelta(hours=1), scope='read')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer bearer-token')
+        self.assertEqual(self.get()[0].status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            access_token.revoke()
+        self.assertEqual(self.get()[0].status_code, 401)
+
+    def test_clear_expired_tokens_in_batches(self):
+        now = timezone.now()
+        for i in range(25):
+            AccessToken.objects.create(user=self.user, token=f'expired{i}', application=self.application,
+                                       expires=now - timedelta(hours=1))
+        refreshed = AccessToken.objects.create(user=self.user, token='refreshed', application=self.application,
+                                               expires=now - timedelta(hours=1))
+        RefreshToken.objects.create(user=self.user, token='refresh', application=self.application,
+                                    access_token=refreshed)
+        AccessToken.objects.create(user=self.user, token='live', application=self.application,
+                                   expires=now + timedelta(hours=1))
+        token_cleanup.clear_expired_tokens(batch_size=10)
+        self.assertEqual(set(AccessToken.objects.values_list('token', flat=True)), {'refreshed', 'live'})
+
+
+class StatisticsCacheTests(TestCase):
+    """Kết quả thống kê được cache theo tháng và chỉ bị vô hiệu hóa sau khi dữ liệu được commit"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cache', password='cache')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        with _count_queries() as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def add_stat(self, weight, day=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            HealthStat.objects.create(user=self.user, weight=weight, height=1.7, date=day or timezone.now())
+
+    def test_repeated_request_is_served_from_cache(self):
+        self.add_stat(70)
+        first, _ = self.get('/api/my-statistics/?period=monthly')
+        second, queries = self.get('/api/my-statistics/?period=monthly')
+        self.assertEqual((first, queries), (second, 0))
+
+    def test_write_invalidates_after_commit(self):
+        self.add_stat(70)
+        before, _ = self.get('/api/my-statistics/?period=monthly')
+        with self.captureOnCommitCallbacks() as callbacks:
+            HealthStat.objects.create(user=self.user, weight=80, height=1.7)
+            # Transaction chưa commit: vẫn đọc kết quả cũ, không lưu dữ liệu chưa commit vào cache
+            self.assertEqual(self.get('/api/my-statistics/?period=monthly'), (before, 0))
+        for callback in callbacks:
+            callback()
+        after, queries = self.get('/api/my-statistics/?period=monthly')
+        self.assertGreater(queries, 0)
+        self.assertNotEqual(after['weight_change'], before['weight_change'])
+
+    def test_write_keeps_other_months_cached(self):
+        self.add_stat(70, datetime(2024, 3, 5, 8))
+        self.get('/api/my-statistics/?period=yearly&year=2024')
+        self.add_stat(75)
+        self.assertEqual(self.get('/api/my-statistics/?period=yearly&year=2024')[1], 0)
+        self.add_stat(72, datetime(2024, 3, 6, 8))
+        self.assertGreater(self.get('/api/my-statistics/?period=yearly&year=2024')[1], 0)
+
+    def test_track_changes_is_invalidated(self):
+        self.add_stat(70)
+        before, _ = self.get('/health-statistic/track-changes/?period=monthly')
+        self.add_stat(90)
+        after, _ = self.get('/health-statistic/track-changes/?period=monthly')
+        self.assertNotEqual(before['changes'], after['changes'])
+
+
+class RollupTests(TestCase):
+    """Bảng tổng hợp theo ngày/tháng được cập nhật khi dữ liệu gốc thay đổi và đọc có giới hạn (xem rollups.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='rollup', password='rollup')
+
+    def add_stat(self, moment, weight):
+        return HealthStat.objects.create(user=self.user, weight=weight, height=1.7, step_count=1000,
+                                         water_intake=1, date=moment)
+
+    def test_save_and_delete_refresh_day_and_month(self):
+        first = self.add_stat(datetime(2025, 3, 5, 8), 70)
+        last = self.add_stat(datetime(2025, 3, 5, 20), 72)
+        self.add_stat(datetime(2025, 3, 20, 8), 74)
+        daily = DailyStatistic.objects.get(user=self.user, period_start=date(2025, 3, 5))
+        self.assertEqual((daily.health_records, daily.weight_sum), (2, 142))
+        self.assertEqual((daily.first_stat_id, daily.latest_stat_id, daily.latest_weight), (first.id, last.id, 72))
+        monthly = MonthlyStatistic.objects.get(user=self.user, period_start=date(2025, 3, 1))
+        self.assertEqual((monthly.health_records, monthly.first_weight, monthly.latest_weight), (3, 70, 74))
+
+        HealthStat.objects.filter(date__date=date(2025, 3, 5)).delete()
+        self.assertFalse(DailyStatistic.objects.filter(user=self.user, period_start=date(2025, 3, 5)).exists())
+        monthly.refresh_from_db()
+        self.assertEqual((monthly.health_records, monthly.first_weight), (1, 74))
+
+    def test_workout_session_counts_on_updated_day(self):
+        session = WorkoutSession.objects.create(user=self.user, name='Session', schedule=datetime(2025, 1, 1),
+                                                total_duration=30, calories_burned=200)
+        daily = DailyStatistic.objects.get(user=self.user, period_start=session.updated_date.date())
+        self.assertEqual((daily.sessions, daily.total_duration, daily.calories_burned), (1, 30, 200))
+
+    def test_rebuild_matches_incremental_rows(self):
+        for day in range(40):
+            self.add_stat(datetime(2025, 1, 20, 8) + timedelta(days=day), 70 + day)
+
+        def rows():
+            return sorted((row.period_start, row.health_records, row.weight_sum, row.first_stat_id, row.latest_stat_id)
+                          for model in (DailyStatistic, MonthlyStatistic) for row in model.objects.all())
+
+        incremental = rows()
+        rollups.rebuild_user(self.user.id)
+        self.assertEqual(rows(), incremental)
+
+    def test_monthly_read_combines_months_and_partial_days(self):
+        for day in range(0, 120, 3):
+            self.add_stat(datetime(2025, 1, 15, 8) + timedelta(days=day), 60 + day / 10)
+        start, end = date(2025, 1, 15), date(2025, 5, 10)
+        rows = stats.load_rollups(self.user, start, end, stats.MONTHLY)
+        self.assertEqual([(type(row), row.period_start) for row in rows if type(row) is MonthlyStatistic],
+                         [(MonthlyStatistic, date(2025, month, 1)) for month in (2, 3, 4)])
+        daily_rows = list(DailyStatistic.objects.filter(user=self.user, period_start__range=(start, end))
+                          .order_by('period_start'))
+        # Cộng theo thứ tự khác nhau: so sánh sau khi làm tròn
+        self.assertEqual(_rounded(stats.summarize_rollups(rows, start, end, stats.MONTHLY)),
+                         _rounded(stats.summarize_rollups(daily_rows, start, end, stats.MONTHLY)))
+
+    def test_custom_range_is_capped(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = '/api/my-statistics/?period=custom&start_date={}&end_date={}&granularity=daily'
+        self.assertEqual(client.get(url.format('2024-01-01', '2024-12-31')).status_code, 200)
+        self.assertEqual(client.get(url.format('2024-01-01', '2025-01-01')).status_code, 400)
+
+
+class PeriodTests(TestCase):
+    """Chia khoảng thời gian thành các chu kỳ ngày/tuần/tháng cho màn hình thống kê (xem stats.py)"""
+
+    def test_bucket_start(self):
+        wednesday = date(2025, 1, 1)
+        self.assertEqual(stats.bucket_start(wednesday, stats.DAILY), wednesday)
+        self.assertEqual(stats.bucket_start(wednesday, stats.WEEKLY), date(2024, 12, 30))
+        self.assertEqual(stats.bucket_start(date(2025, 2, 28), stats.MONTHLY), date(2025, 2, 1))
+
+    def test_build_buckets(self):
+        self.assertEqual(stats.build_buckets(date(2024, 11, 15), date(2025, 2, 1), stats.MONTHLY),
+                         [date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1)])
+        self.assertEqual(stats.build_buckets(date(2025, 1, 1), date(2025, 1, 13), stats.WEEKLY),
+                         [date(2024, 12, 30), date(2025, 1, 6), date(2025, 1, 13)])
+        self.assertEqual(len(stats.build_buckets(date(2024, 2, 1), date(2024, 2, 29), stats.DAILY)), 29)
+        with self.assertRaises(ValueError):
+            stats.build_buckets(date(2025, 1, 1), date(2025, 1, 2), 'hourly')
+
+    def test_resolve_period(self):
+        today = date(2025, 6, 18)
+        self.assertEqual(stats.resolve_period('weekly', {}, today), (date(2025, 6, 16), today, stats.DAILY))
+        self.assertEqual(stats.resolve_period('monthly', {'month': '2024-02'}, today),
+                         (date(2024, 2, 1), date(2024, 2, 29), stats.DAILY))
+        self.assertEqual(stats.resolve_period('monthly', {}, today), (date(2025, 6, 1), today, stats.DAILY))
+        self.assertEqual(stats.resolve_period('yearly', {'year': '2024'}, today),
+                         (date(2024, 1, 1), date(2024, 12, 31), stats.MONTHLY))
+        self.assertEqual(stats.resolve_period('yearly', {}, today), (date(2025, 1, 1), today, stats.MONTHLY))
+        self.assertEqual(
+            stats.resolve_period('custom', {'start_date': '2025-01-01', 'end_date': '2025-03-01',
+                                            'granularity': 'weekly'}, today),
+            (date(2025, 1, 1), date(2025, 3, 1), stats.WEEKLY)
+        )
+        for period, params in [('weekly', {'week': '2025-10'}), ('monthly', {'month': '2025'}),
+                               ('yearly', {'year': 'abc'}), ('daily', {}),
+                               ('custom', {'start_date': '2025-03-01', 'end_date': '2025-01-01'}),
+                               ('custom', {'start_date': '2025-01-01', 'end_date': '2025-02-01',
+                                           'granularity': 'hourly'})]:
+            with self.subTest(period=period, params=params), self.assertRaises(ValueError):
+                stats.resolve_period(period, params, today)
+
+    def test_statistics_are_bucketed_per_period(self):
+        user = User.objects.create_user(username='periods', password='periods')
+        for day, weight in [(1, 70), (1, 71), (10, 72), (20, 74)]:
+            HealthStat.objects.create(user=user, weight=weight, height=1.7, step_count=100 * day,
+                                      date=datetime(2025, 3, day, 8 + weight - 70))
+        client = APIClient()
+        client.force_authenticate(user)
+
+        daily = client.get('/api/my-statistics/?period=monthly&month=2025-03').data
+        self.assertEqual(len(daily['weight_data']), 31)
+        # Theo ngày: giá trị của bản ghi mới nhất trong ngày
+        self.assertEqual((daily['weight_data'][0], daily['weight_data'][9], daily['weight_data'][1]), (71, 72, None))
+        self.assertEqual(daily['weight_change'], 4)
+
+        weekly = client.get('/api/my-statistics/?period=custom&start_date=2025-03-01&end_date=2025-03-31'
+                            '&granularity=weekly').data
+        self.assertEqual(len(weekly['weight_data']), 6)
+        # Theo tuần: giá trị trung bình trong tuần (tuần đầu bắt đầu từ thứ 2, 24/02)
+        self.assertEqual(weekly['weight_data'][0], 70.5)
+        self.assertEqual(weekly['health_summary']['avg_weight'], 71.75)
+
+    def test_month_ending_today_is_read_per_day(self):
+        self.assertEqual(stats._whole_months(date(2024, 1, 1), date(2024, 2, 20)), (date(2024, 1, 1), date(2024, 2, 1)))
+        self.assertEqual(stats._whole_months(date(2024, 1, 1), date(2024, 2, 29)), (date(2024, 1, 1), date(2024, 3, 1)))
+
+        today = timezone.now().date()
+
+        user = User.objects.create_user(username='today', password='today')
+        HealthStat.objects.create(user=user, weight=70, height=1.7, date=datetime.combine(today, datetime.min.time()))
+        # Bản ghi ở tương lai (đồng hồ thiết bị lệch) nằm ngoài khoảng thời gian
+        HealthStat.objects.create(user=user, weight=90, height=1.7,
+                                  date=datetime.combine(today + timedelta(days=1), datetime.min.time()))
+        client = APIClient()
+        client.force_authenticate(user)
+        data = client.get('/api/my-statistics/', {
+            'period': 'custom', 'start_date': today.replace(day=1).isoformat(), 'end_date': today.isoformat(),
+            'granularity': 'monthly'
+        }).data
+        self.assertEqual(data['weight_data'], [70])
+
+
+class KeysetPaginationTests(TestCase):
+    """Phân trang theo khóa (date, id) của lịch sử chỉ số sức khỏe (xem paginators.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='keyset', password='keyset')
+        # Ba bản ghi cùng thời điểm mỗi giờ: trang phải tách đúng cả khi date trùng nhau
+        HealthStat.objects.bulk_create([
+            HealthStat(user=cls.user, weight=50 + index, step_count=index,
+                       date=datetime(2025, 1, 1) + timedelta(hours=index // 3))
+            for index in range(95)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cursor_round_trip(self):
+        paginator = paginators.KeysetPagination()
+        stat = HealthStat.objects.filter(user=self.user).first()
+        request = Request(APIRequestFactory().get('/health-statistic/', {'cursor': paginator.encode_cursor(stat)}))
+        self.assertEqual(paginator.decode_cursor(request), (stat.date, stat.id))
+
+    def test_pages_cover_history_once_in_order(self):
+        expected = list(HealthStat.objects.filter(user=self.user).order_by('-date', '-id').values_list('id', flat=True))
+        latest = HealthStat.objects.get(id=expected[0])
+        seen = []
+        url = '/health-statistic/?page_size=20'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 20)
+            # Giá trị mới nhất giống nhau trên mọi trang
+            self.assertEqual(response.data['latest']['step_count'], latest.step_count)
+            seen += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+    def test_page_size_is_clamped(self):
+        response = self.client.get('/health-statistic/?page_size=0')
+        self.assertEqual(len(response.data['results']), 1)
+        response = self.client.get('/health-statistic/?page_size=1000')
+        self.assertEqual(len(response.data['results']), 95)
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_cursor_is_404(self):
+        # Không phải base64, base64 nhưng sai định dạng, id không phải số
+        for raw in ['zzz', 'bm90LWEtY3Vyc29y', 'MjAyNS0wMS0wMVQwMDowMDowMHxhYmM=']:
+            with self.subTest(cursor=raw):
+                self.assertEqual(self.client.get(f'/health-statistic/?cursor={raw}').status_code, 404)
+
+
+class BulkIngestTests(TestCase):
+    """Đồng bộ nhiều bản ghi sức khỏe trong một yêu cầu (xem HealthStatBulkSerializer)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='bulk', password='bulk')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, readings):
+        return self.client.post('/health-stats/bulk/', {'readings': readings}, format='json')
+
+    def reading(self, moment, **values):
+        return {'date': moment.isoformat(), 'weight': 70, 'height': 1.75, 'step_count': 100, **values}
+
+    def test_batches_are_inserted_with_bmi_and_rollups(self):
+        base = datetime(2025, 5, 1, 6)
+        readings = [self.reading(base + timedelta(minutes=5 * index)) for index in range(1200)]
+        with _count_queries() as queries, \
+                mock.patch.object(rollups, 'refresh_month', wraps=rollups.refresh_month) as refresh_month:
+            response = self.post(readings)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['duplicates'], response.data['errors']),
+                         (1200, 0, 0))
+        # Ba lô bulk_create và tính lại bảng tổng hợp cho 5 ngày, không theo số bản ghi
+        self.assertLess(len(queries), 80)
+        # 5 ngày cùng một tháng: tháng chỉ được gộp lại một lần
+        refresh_month.assert_called_once_with(self.user.id, date(2025, 5, 1))
+        self.assertEqual(set(HealthStat.objects.filter(user=self.user).values_list('bmi', flat=True)), {22.86})
+        self.assertEqual(sum(DailyStatistic.objects.filter(user=self.user).values_list('health_records', flat=True)),
+                         1200)
+
+    def test_duplicates_are_skipped(self):
+        moment = datetime(2025, 5, 1, 6)
+        HealthStat.objects.create(user=self.user, weight=70, height=1.75, date=moment)
+        response = self.post([self.reading(moment), self.reading(moment + timedelta(minutes=1)),
+                              self.reading(moment + timedelta(minutes=1))])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['status'] for item in response.data['results']], ['duplicate', 'created', 'duplicate'])
+        self.assertEqual(HealthStat.objects.filter(user=self.user).count(), 2)
+
+        # Gửi lại cả lô: không tạo thêm bản ghi nào
+        response = self.post([self.reading(moment), self.reading(moment + timedelta(minutes=1))])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['duplicates']), (0, 2))
+
+    def test_invalid_readings_are_reported_per_item(self):
+        moment = datetime(2025, 5, 1, 6)
+        response = self.post([self.reading(moment), {'date': 'bad'},
+                              self.reading(datetime.now() + timedelta(days=1)),
+                              self.reading(moment + timedelta(minutes=1), step_count=-1)])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['errors']), (1, 3))
+        results = response.data['results']
+        self.assertEqual([item['index'] for item in results], [0, 1, 2, 3])
+        self.assertEqual(results[0]['status'], 'created')
+        self.assertIn('date', results[1]['errors'])
+        self.assertIn('date', results[2]['errors'])
+        self.assertIn('step_count', results[3]['errors'])
+
+    def test_offset_timestamps_are_stored_in_local_time(self):
+        response = self.post([
+            {'date': '2025-03-01T23:30:00+07:00', 'weight': 70, 'height': 1.75},
+            {'date': '2025-03-01T17:00:00Z', 'weight': 71, 'height': 1.75},
+            # 00:30 ngày 2/3 giờ Việt Nam: là bản ghi của ngày 2/3
+            {'date': '2025-03-01T17:30:00Z', 'weight': 72, 'height': 1.75},
+            self.reading(datetime(2025, 3, 1, 23, 30)),
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['status'] for item in response.data['results']],
+                         ['created', 'created', 'created', 'duplicate'])
+        self.assertEqual(list(HealthStat.objects.filter(user=self.user).order_by('date').values_list('date', flat=True)),
+                         [datetime(2025, 3, 1, 23, 30), datetime(2025, 3, 2, 0, 0), datetime(2025, 3, 2, 0, 30)])
+        self.assertEqual(dict(DailyStatistic.objects.filter(user=self.user).values_list('period_start', 'health_records')),
+                         {date(2025, 3, 1): 1, date(2025, 3, 2): 2})
+
+        # Kiểm tra thời điểm tương lai theo giờ địa phương
+        ahead = (timezone.now() + timedelta(minutes=30)).replace(tzinfo=timezone.get_default_timezone())
+        response = self.post([{'date': ahead.astimezone(dt_timezone.utc).isoformat(), 'weight': 70}])
+        self.assertEqual(response.data['errors'], 1)
+
+    def test_ids_are_returned_without_bulk_insert_returning(self):
+        # MySQL: bulk_create không gán id cho đối tượng
+        base = datetime(2025, 5, 1, 6)
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            response = self.post([self.reading(base + timedelta(minutes=index)) for index in range(3)])
+        self.assertEqual(response.status_code, 201)
+        ids = dict(HealthStat.objects.filter(user=self.user).values_list('date', 'id'))
+        self.assertEqual([item['id'] for item in response.data['results']],
+                         [ids[base + timedelta(minutes=index)] for index in range(3)])
+
+    def test_empty_or_oversized_request_is_rejected(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        too_many = [self.reading(datetime(2025, 1, 1) + timedelta(minutes=index)) for index in range(5001)]
+        self.assertEqual(self.post(too_many).status_code, 400)
+        self.assertFalse(HealthStat.objects.filter(user=self.user).exists())
+
+
+class DownsamplingTests(TestCase):
+    """Giảm số điểm của chuỗi thời gian cho biểu đồ (xem downsampling.py)"""
+
+    def series(self, size, spike_at=None):
+        points = [(index, float(index % 10)) for index in range(size)]
+        if spike_at is not None:
+            points[spike_at] = (spike_at, 1000.0)
+        return points
+
+    def test_lttb(self):
+        points = self.series(10000, spike_at=4321)
+        sampled = downsampling.lttb(points, 100)
+        self.assertEqual(len(sampled), 100)
+        self.assertEqual((sampled[0], sampled[-1]), (points[0], points[-1]))
+        self.assertEqual([x for x, _ in sampled], sorted({x for x, _ in sampled}))
+        # Đỉnh nhọn tạo tam giác lớn nhất trong nhóm của nó
+        self.assertIn((4321, 1000.0), sampled)
+
+    def test_minmax(self):
+        points = self.series(10000, spike_at=777)
+        sampled = downsampling.minmax(points, 100)
+        self.assertLessEqual(len(sampled), 100)
+        self.assertEqual((sampled[0], sampled[-1]), (points[0], points[-1]))
+        self.assertEqual([x for x, _ in sampled], sorted({x for x, _ in sampled}))
+        self.assertIn((777, 1000.0), sampled)
+        self.assertEqual(min(y for _, y in sampled), 0.0)
+
+    def test_short_series_is_unchanged(self):
+        points = self.series(50)
+        for method in downsampling.METHODS:
+            with self.subTest(method=method):
+                self.assertEqual(downsampling.downsample(points, 50, method), points)
+                self.assertEqual(downsampling.downsample(points, 2, method), points)
+
+    def test_series_endpoint(self):
+        user = User.objects.create_user(username='series', password='series')
+        HealthStat.objects.bulk_create([
+            HealthStat(user=user, date=datetime(2024, 1, 1) + timedelta(hours=index), heart_rate=60 + index % 40)
+            for index in range(3000)
+        ])
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.get('/health-statistic/series/?metric=heart_rate&max_points=100')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['total_points'], len(response.data['points'])), (3000, 100))
+        self.assertEqual(response.data['points'][0], {'date': '2024-01-01 00:00:00', 'value': 60})
+
+        response = client.get('/health-statistic/series/?metric=heart_rate&method=minmax&max_points=50'
+                              '&start_date=2024-01-10&end_date=2024-01-19')
+        self.assertEqual(response.data['total_points'], 240)
+        self.assertLessEqual(len(response.data['points']), 50)
+        self.assertEqual(response.data['points'][0]['date'], '2024-01-10 00:00:00')
+
+        # Chỉ số chưa có dữ liệu: chuỗi rỗng
+        self.assertEqual(client.get('/health-statistic/series/?metric=weight').data['points'], [])
+        for query in ['metric=foo', 'method=avg', 'max_points=abc', 'start_date=2024-13-01']:
+            with self.subTest(query=query):
+                self.assertEqual(client.get(f'/health-statistic/series/?{query}').status_code, 400)
+
+
+class TrackChangesTests(TestCase):
+    """Bản ghi đầu, cuối kỳ và mức thay đổi đọc từ DailyStatistic (xem stats.first_and_last_records)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='changes', password='changes')
+        cls.stats = [
+            HealthStat.objects.create(user=cls.user, weight=70 + index, height=1.7, heart_rate=60 + index,
+                                      date=datetime(2025, 3, 1 + index // 2 * 7, 8 + index))
+            for index in range(6)
+        ]
+        # Ngoài khoảng thời gian
+        HealthStat.objects.create(user=cls.user, weight=90, height=1.7, date=datetime(2025, 4, 2, 8))
+
+    def test_first_and_last_records(self):
+        with _count_queries() as queries:
+            result = stats.compute_changes(self.user, date(2025, 3, 1), date(2025, 3, 31))
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(result['first_record']['id'], self.stats[0].id)
+        self.assertEqual(result['last_record']['id'], self.stats[-1].id)
+        self.assertEqual((result['changes']['weight_change'], result['changes']['height_change'],
+                          result['changes']['heart_rate_change']), (5, 0, 5))
+
+    def test_fallback_without_window_functions(self):
+        expected = stats.compute_changes(self.user, date(2025, 3, 5), date(2025, 3, 20))
+        with mock.patch.object(connection.features, 'supports_over_clause', False), _count_queries() as queries:
+            self.assertEqual(stats.compute_changes(self.user, date(2025, 3, 5), date(2025, 3, 20)), expected)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual((expected['first_record']['id'], expected['last_record']['id']),
+                         (self.stats[2].id, self.stats[5].id))
+
+    def test_single_or_missing_record(self):
+        single = stats.compute_changes(self.user, date(2025, 4, 1), date(2025, 4, 30))
+        self.assertEqual(single['first_record'], single['last_record'])
+        self.assertEqual(set(single['changes'].values()), {None})
+        empty = stats.compute_changes(self.user, date(2025, 5, 1), date(2025, 5, 31))
+        self.assertEqual((empty['first_record'], empty['last_record']), (None, None))
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/health-statistic/track-changes/?period=monthly&month=2025-03')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['changes']['weight_change'], 5)
+        self.assertEqual(client.get('/health-statistic/track-changes/?period=monthly&month=x').status_code, 400)
+
+
+class ClientStatisticsTests(TestCase):
+    """Thống kê của nhiều khách hàng trong một yêu cầu (xem ClientStatisticView)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.coach = User.objects.create_user(username='coach', password='coach', role=Role.COACH.value)
+        cls.clients = [User.objects.create_user(username=f'client{n}', password='client') for n in range(6)]
+        for n, client in enumerate(cls.clients):
+            for day in range(10):
+                HealthStat.objects.create(user=client, weight=70 + n + day / 10, height=1.7, step_count=day,
+                                          date=datetime(2025, 3, 1 + day, 8))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.coach)
+
+    def test_matches_single_user_statistics(self):
+        ids = ','.join(str(client.id) for client in self.clients) + ',99999'
+        with _count_queries() as queries:
+            response = self.client.get(f'/api/clients-statistics/?period=monthly&month=2025-03&user_ids={ids}')
+        self.assertEqual(response.status_code, 200)
+        # Người dùng và bảng tổng hợp: số truy vấn không tăng theo số khách hàng
+        self.assertLessEqual(len(queries), 3)
+        self.assertEqual(response.data['not_found'], [99999])
+        self.assertEqual([entry['target_user']['id'] for entry in response.data['users']],
+                         [client.id for client in self.clients])
+        for entry, client in zip(response.data['users'], self.clients):
+            single = self.client.get(f'/api/my-statistics/?period=monthly&month=2025-03&user_id={client.id}').data
+            for key in ('weight_data', 'step_count_data', 'health_summary', 'weight_change'):
+                self.assertEqual(_rounded(entry[key]), _rounded(single[key]), key)
+
+        # Lần gọi sau đọc từ cache
+        with _count_queries() as queries:
+            self.client.get(f'/api/clients-statistics/?period=monthly&month=2025-03&user_ids={ids}')
+        self.assertEqual(len(queries), 1)
+
+    def test_invalid_requests(self):
+        for query in ['', 'user_ids=a', 'user_ids=1&period=x',
+                      'user_ids=' + ','.join(str(n) for n in range(1, 102))]:
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/clients-statistics/?{query}').status_code, 400)
+        self.client.force_authenticate(self.clients[0])
+        self.assertEqual(self.client.get(f'/api/clients-statistics/?user_ids={self.clients[1].id}').status_code, 403)
+
+
+class QueryPlannerTests(TestCase):
+    """select_related/prefetch_related lập từ cây serializer (xem query_planner.py)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='planner', password='planner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def build(self, count):
+        for index in range(count):
+            exercise = Exercise.objects.create(name=f'Exercise {index}', description='', difficulty_level='Easy',
+                                               duration=10, calories_burned=5, rating=4)
+            exercise.muscle_groups.add(MuscleGroup.objects.create(name=f'Group {index}'),
+                                       MuscleGroup.objects.create(name=f'Old {index}', is_active=False))
+            hidden = Exercise.objects.create(name=f'Hidden {index}', description='', difficulty_level='Easy',
+                                             duration=10, calories_burned=5, rating=4, is_active=False)
+            session = WorkoutSession.objects.create(user=self.user, schedule=datetime(2025, 1, 1), name=f'S{index}')
+            session.exercise.add(exercise, hidden)
+            plan = NutritionPlan.objects.create(name='Plan', user=self.user, total_calories=1, total_proteins=1,
+                                                total_carbs=1, total_fats=1)
+            plan.meals.add(Meal.objects.create(name=f'Meal {index}'))
+
+    def query_counts(self):
+        counts = {}
+        for url in ['/workout-sessions/', '/workout-sessions-read/', '/exercises/', '/nutrition-plans/']:
+            with _count_queries() as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            counts[url] = len(queries)
+        return counts
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.build(2)
+        small = self.query_counts()
+        self.build(8)
+        self.assertEqual(self.query_counts(), small)
+
+    def test_output_matches_unoptimized_serializer(self):
+        self.build(3)
+        sessions = WorkoutSession.objects.order_by('id')
+        for serializer in (WorkoutSessionReadSerializer, WorkoutSessionWriteSerializer):
+            with self.subTest(serializer=serializer.__name__):
+                self.assertEqual(serializer(optimize_queryset(sessions, serializer), many=True).data,
+                                 serializer(sessions, many=True).data)
+        # Planner không lọc quan hệ: bài tập và nhóm cơ không hoạt động vẫn được trả về như trước
+        session = self.client.get('/workout-sessions/').data[0]
+        self.assertEqual(len(session['exercise']), 2)
+        self.assertEqual(len(session['exercise'][0]['muscle_groups']), 2)
+
+    def test_write_response_keeps_all_related_rows(self):
+        self.build(1)
+        session = WorkoutSession.objects.get()
+        response = self.client.patch(f'/workout-sessions-read/{session.id}/', {'name': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data['exercise']), sorted(session.exercise.values_list('id', flat=True)))
+        self.assertEqual(len(self.client.get(f'/workout-sessions-read/{session.id}/').data['exercise']), 2)
+
+
+def _exercise(name, duration, calories, **fields):
+    return Exercise.objects.create(**{'name': name, 'description': '', 'difficulty_level': 'Easy',
+                                      'duration': duration, 'calories_burned': calories, 'rating': 4, **fields})
+
+
+class WorkoutTotalsTests(TestCase):
+    """Tổng thời gian và calories của buổi tập được tính lại khi danh sách bài tập thay đổi (xem workout_totals.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='totals', password='totals')
+        cls.long, cls.medium, cls.short = _exercise('Long', 10, 100), _exercise('Medium', 20, 50.5), \
+            _exercise('Short', 5, 1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertTotals(self, session, duration, calories):
+        session.refresh_from_db()
+        self.assertEqual((session.total_duration, session.calories_burned), (duration, calories))
+
+    def test_api_computes_totals_and_ignores_client_values(self):
+        response = self.client.post('/workout-sessions/', {
+            'name': 'Session', 'schedule': '2025-01-01T00:00', 'exercise': [self.long.id, self.medium.id],
+            'total_duration': 999
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['total_duration'], response.data['calories_burned']), (30, 150.5))
+        self.assertEqual(DailyStatistic.objects.get(user=self.user).calories_burned, 150.5)
+
+        response = self.client.patch(f"/workout-sessions-read/{response.data['id']}/",
+                                     {'exercise': [self.short.id]}, format='json')
+        self.assertEqual((response.data['total_duration'], response.data['calories_burned']), (5, 1))
+        self.assertEqual(DailyStatistic.objects.get(user=self.user).calories_burned, 1)
+
+    def test_m2m_changes_from_both_sides(self):
+        session = WorkoutSession.objects.create(user=self.user, name='Session', schedule=datetime(2025, 1, 1))
+        session.exercise.add(self.long, self.medium)
+        self.assertTotals(session, 30, 150.5)
+        session.exercise.remove(self.medium)
+        self.assertTotals(session, 10, 100)
+        self.short.workout_sessions.add(session)
+        self.assertTotals(session, 15, 101)
+        self.short.workout_sessions.clear()
+        self.assertTotals(session, 10, 100)
+        session.exercise.clear()
+        self.assertTotals(session, 0, 0)
+
+    def test_exercise_delete(self):
+        session = WorkoutSession.objects.create(user=self.user, name='Session', schedule=datetime(2025, 1, 1))
+        session.exercise.add(self.long, self.medium)
+        response = self.client.delete(f'/exercises/{self.long.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertTotals(session, 20, 50.5)
+        self.assertEqual(DailyStatistic.objects.get(user=self.user).calories_burned, 50.5)
+
+    def test_recompute_command(self):
+        session = WorkoutSession.objects.create(user=self.user, name='Session', schedule=datetime(2025, 1, 1))
+        session.exercise.add(self.long, self.short)
+        # Tổng cũ (đã sai) và bảng tổng hợp khớp với tổng cũ
+        WorkoutSession.objects.update(total_duration=0, calories_burned=0)
+        rollups.rebuild_user(self.user.id)
+        call_command('recompute_workout_totals', stdout=StringIO())
+        self.assertTotals(session, 15, 101)
+        daily = DailyStatistic.objects.get(user=self.user)
+        self.assertEqual((daily.total_duration, daily.calories_burned), (15, 101))
+        self.assertEqual(MonthlyStatistic.objects.get(user=self.user).calories_burned, 101)
+
+
+@override_settings(EXERCISE_PROPAGATION_ASYNC=False)
+class ExercisePropagationTests(TestCase):
+    """Sửa bài tập cập nhật tổng của các buổi tập chứa nó theo từng nhóm (xem workout_totals.propagate_exercise)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f'propagate{n}', password='propagate') for n in range(3)]
+        cls.first, cls.second = _exercise('First', 10, 100), _exercise('Second', 20, 50)
+        cls.sessions = []
+        for index in range(12):
+            session = WorkoutSession.objects.create(user=cls.users[index % 3], name=f'S{index}',
+                                                    schedule=datetime(2025, 1, 1), is_active=index != 0)
+            session.exercise.add(*([cls.first, cls.second] if index % 2 else [cls.first]))
+            cls.sessions.append(session)
+        cls.other = User.objects.create_user(username='untouched', password='untouched')
+        WorkoutSession.objects.create(user=cls.other, name='Other', schedule=datetime(2025, 1, 1)) \
+            .exercise.add(cls.second)
+
+    def rollup_rows(self):
+        return sorted((row.user_id, row.period_start, row.sessions, row.total_duration, row.calories_burned)
+                      for model in (DailyStatistic, MonthlyStatistic) for row in model.objects.all())
+
+    def test_exercise_edit_updates_sessions_and_rollups(self):
+        untouched = DailyStatistic.objects.get(user=self.other).updated_date
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.calories_burned = 200
+            self.first.save()
+        for index, session in enumerate(self.sessions):
+            session.refresh_from_db()
+            self.assertEqual(session.calories_burned, 250 if index % 2 else 200)
+        # Người dùng không có buổi tập chứa bài tập bị sửa: bảng tổng hợp không bị ghi lại
+        self.assertEqual(DailyStatistic.objects.get(user=self.other).updated_date, untouched)
+
+        incremental = self.rollup_rows()
+        for user in self.users + [self.other]:
+            rollups.rebuild_user(user.id)
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_chunked_propagation(self):
+        Exercise.objects.filter(id=self.first.id).update(duration=30)
+        with _count_queries() as queries:
+            self.assertEqual(workout_totals.propagate_exercise(self.first.id, chunk_size=5), 12)
+        with _count_queries() as unchanged:
+            self.assertEqual(workout_totals.propagate_exercise(self.first.id, chunk_size=5), 0)
+        # Tổng không thay đổi: chỉ đọc, không UPDATE
+        self.assertLess(len(unchanged), len(queries))
+        self.sessions[1].refresh_from_db()
+        self.assertEqual(self.sessions[1].total_duration, 50)
+
+    def test_command(self):
+        Exercise.objects.filter(id=self.second.id).update(duration=1)
+        out = StringIO()
+        call_command('propagate_exercise_totals', str(self.second.id), '--chunk-size', '2', stdout=out)
+        self.assertIn('đã cập nhật 7 buổi tập', out.getvalue())
+        self.sessions[1].refresh_from_db()
+        self.assertEqual(self.sessions[1].total_duration, 11)
+        with self.assertRaises(CommandError):
+            call_command('propagate_exercise_totals', '99999', stdout=out)
+
+
+class CatalogTests(TestCase):
+    """Bài tập gợi ý và nhóm cơ phục vụ từ bản chụp trong bộ nhớ kèm ETag (xem catalog.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='catalog', password='catalog')
+        cls.group = MuscleGroup.objects.create(name='Chest')
+        cls.exercise = _exercise('Push up', 1, 1)
+        cls.exercise.muscle_groups.add(cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, etag=None):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag) if etag else self.client.get(url)
+
+    def test_snapshot_is_reused_until_catalog_changes(self):
+        response = self.get('/exercises/?type=suggested')
+        self.assertEqual(response.data[0]['muscle_groups'], [{'id': self.group.id, 'name': 'Chest'}])
+        etag = response['ETag']
+        with _count_queries() as queries:
+            self.assertEqual(self.get('/exercises/?type=suggested').data, response.data)
+            self.assertEqual(self.get('/exercises/?type=suggested', etag).status_code, 304)
+            self.assertEqual(self.get('/exercises/?type=suggested', 'W/' + etag).status_code, 304)
+        self.assertEqual(queries, [])
+
+        # Bài tập cá nhân không thuộc danh mục
+        _exercise('Mine', 1, 1, created_by=self.user)
+        self.assertEqual(self.get('/exercises/?type=suggested', etag).status_code, 304)
+
+    def test_changes_invalidate_snapshot(self):
+        etag = self.get('/exercises/?type=suggested')['ETag']
+        self.group.name = 'Pecs'
+        self.group.save()
+        response = self.get('/exercises/?type=suggested', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['muscle_groups'][0]['name'], 'Pecs')
+
+        self.exercise.muscle_groups.clear()
+        response = self.get('/exercises/?type=suggested', response['ETag'])
+        self.assertEqual(response.data[0]['muscle_groups'], [])
+
+        # Bài tập gợi ý được gán cho người dùng: rời khỏi danh mục
+        self.exercise.created_by = self.user
+        self.exercise.save()
+        self.assertEqual(self.get('/exercises/?type=suggested', response['ETag']).data, [])
+
+    def test_muscle_groups(self):
+        MuscleGroup.objects.create(name='Hidden', is_active=False)
+        response = self.get('/muscle-groups/')
+        self.assertEqual(response.data, [{'id': self.group.id, 'name': 'Chest'}])
+        self.assertEqual(self.get('/muscle-groups/', response['ETag']).status_code, 304)
+
+
+class ConditionalGetTests(TestCase):
+    """ETag/Last-Modified cho các viewset có updated_date (xem conditional.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='conditional', password='conditional')
+        cls.group = MuscleGroup.objects.create(name='Legs')
+        cls.exercise = _exercise('Squat', 10, 10)
+        cls.exercise.muscle_groups.add(cls.group)
+        cls.other = _exercise('Lunge', 5, 5)
+        cls.session = WorkoutSession.objects.create(user=cls.user, name='Session', schedule=datetime(2025, 1, 1))
+        cls.session.exercise.add(cls.exercise)
+        cls.stat = HealthStat.objects.create(user=cls.user, weight=60, height=1.7)
+        cls.meal = Meal.objects.create(name='Breakfast')
+        cls.plan = NutritionPlan.objects.create(name='Plan', user=cls.user, total_calories=1, total_proteins=1,
+                                                total_carbs=1, total_fats=1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertChanged(self, url, etag, changed=True):
+        status_code = self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+        self.assertEqual(status_code, 200 if changed else 304)
+
+    def test_unchanged_list_is_304_with_one_query(self):
+        for url in ['/workout-sessions/', '/workout-sessions-read/', '/health-stats/', '/diaries/',
+                    '/nutrition-plans/']:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with _count_queries() as queries:
+                    self.assertChanged(url, etag, changed=False)
+                self.assertEqual(len(queries), 1)
+
+    def test_list_etag_follows_rows(self):
+        etag = self.client.get('/health-stats/')['ETag']
+        extra = HealthStat.objects.create(user=self.user, weight=61, height=1.7)
+        self.assertChanged('/health-stats/', etag)
+        etag = self.client.get('/health-stats/')['ETag']
+        extra.delete()
+        self.assertChanged('/health-stats/', etag)
+
+    def test_nested_changes_change_session_etag(self):
+        url = '/workout-sessions/'
+        changes = [
+            lambda: self.session.exercise.add(self.other),
+            lambda: self.other.workout_sessions.remove(self.session),
+            lambda: self.exercise.muscle_groups.remove(self.group),
+            lambda: self.group.exercise_set.add(self.exercise),
+            lambda: MuscleGroup.objects.get(id=self.group.id).save(),
+            lambda: Exercise.objects.get(id=self.exercise.id).save(),
+        ]
+        for index, change in enumerate(changes):
+            with self.subTest(change=index):
+                etag = self.client.get(url)['ETag']
+                change()
+                self.assertChanged(url, etag)
+
+    def test_meal_changes_change_plan_etag(self):
+        url = '/nutrition-plans/'
+        changes = [
+            lambda: self.plan.meals.add(self.meal),
+            lambda: self.meal.nutrition_plans.clear(),
+            lambda: self.plan.meals.add(self.meal),
+            lambda: self.meal.delete(),
+        ]
+        for index, change in enumerate(changes):
+            with self.subTest(change=index):
+                etag = self.client.get(url)['ETag']
+                change()
+                self.assertChanged(url, etag)
+        self.assertEqual(self.client.get(url).data[0]['meals'], [])
+
+    def test_membership_change_moves_session_to_current_day(self):
+        WorkoutSession.objects.filter(id=self.session.id).update(updated_date=datetime(2025, 1, 1, 8))
+        rollups.rebuild_user(self.user.id)
+        self.session.exercise.add(self.other)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.updated_date.date(), date.today())
+
+        def rows():
+            return sorted((row.period_start, row.sessions, row.total_duration)
+                          for model in (DailyStatistic, MonthlyStatistic) for row in model.objects.filter(
+                              user=self.user, sessions__gt=0))
+
+        incremental = rows()
+        rollups.rebuild_user(self.user.id)
+        self.assertEqual(rows(), incremental)
+        self.assertNotIn(date(2025, 1, 1), [period_start for period_start, _, _ in incremental])
+
+    def test_detail(self):
+        url = f'/health-stats/{self.stat.id}/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(0)).status_code, 200)
+        self.assertEqual(self.client.get('/health-stats/99999/').status_code, 404)
+
+
+class ExerciseSearchTests(TestCase):
+    """Tìm kiếm bài tập không phân biệt dấu qua ExerciseSearchTerm (xem search_index.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='searcher', password='searcher')
+        cls.stranger = User.objects.create_user(username='stranger', password='stranger')
+        cls.press = _exercise('Đẩy ngực với tạ đơn', 1, 1, description='Bài tập ngực', equipment='Tạ đơn')
+        cls.push_up = _exercise('Hít đất', 1, 1, description='Tập ngực và tay sau')
+        cls.shoulder = _exercise('Đẩy vai', 1, 1, description='Vai', created_by=cls.user)
+        cls.private = _exercise('Đẩy ngực riêng', 1, 1, description='Ngực', created_by=cls.stranger)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, query):
+        response = self.client.get('/exercises/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [(row['id'], row['score']) for row in response.data]
+
+    def test_fold(self):
+        self.assertEqual(search_index.fold('Đẩy NGỰC ướt Ống'), 'day nguc uot ong')
+        self.assertEqual(search_index.tokenize('Tạ-đơn, 10kg'), ['ta', 'don', '10kg'])
+
+    def test_match_term(self):
+        self.assertEqual(search_index.match_term('a'), Q(term='a'))
+        self.assertEqual(search_index.match_term('abz'), Q(term__gte='abz', term__lt='ab{'))
+        # MySQL so sánh theo collation *_unicode_ci: dùng LIKE 'term%' thay cho khoảng theo mã Unicode
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            self.assertEqual(search_index.match_term('abz'), Q(term__startswith='abz'))
+
+    def test_ranking(self):
+        # Trọn từ trong tên (3 x 2) xếp trên trọn từ trong mô tả (1 x 2)
+        self.assertEqual(self.search('NGỰC'), [(self.press.id, 6), (self.push_up.id, 2)])
+        # Tiền tố được một nửa số điểm của trọn từ
+        self.assertEqual(self.search('ngu'), [(self.press.id, 3), (self.push_up.id, 1)])
+        # Mọi từ của truy vấn phải khớp
+        self.assertEqual([pk for pk, _ in self.search('day ng')], [self.press.id])
+        self.assertEqual({pk for pk, _ in self.search('day')}, {self.press.id, self.shoulder.id})
+        # "ta": trọn từ trong tên (6) và tiền tố của "tap" trong mô tả (1); "don": trọn từ trong tên (6)
+        self.assertEqual(self.search('ta don'), [(self.press.id, 13)])
+        self.assertEqual(self.search('xyz'), [])
+
+    def test_index_follows_exercise_changes(self):
+        self.press.is_active = False
+        self.press.save()
+        self.assertEqual([pk for pk, _ in self.search('day')], [self.shoulder.id])
+        self.shoulder.name = 'Kéo xà'
+        self.shoulder.save()
+        self.assertEqual(self.search('day'), [])
+
+        indexed = sorted(ExerciseSearchTerm.objects.values_list('exercise_id', 'term', 'weight', 'owner_id'))
+        self.assertEqual(search_index.rebuild(), 3)
+        self.assertEqual(sorted(ExerciseSearchTerm.objects.values_list('exercise_id', 'term', 'weight', 'owner_id')),
+                         indexed)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get('/exercises/search/').status_code, 400)
+        self.assertEqual(self.client.get('/exercises/search/', {'q': '  '}).status_code, 400)
+        self.assertEqual(self.client.get('/exercises/search/', {'q': 'day', 'limit': 'x'}).status_code, 400)
+        self.assertEqual(len(self.client.get('/exercises/search/', {'q': 'day', 'limit': 1}).data), 1)
+
+
+class MuscleFacetTests(TestCase):
+    """Lọc bài tập theo nhóm cơ bằng muscle_mask và đếm theo từng facet (xem muscle_facets.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='facets', password='facets')
+        cls.chest, cls.triceps, cls.legs = [MuscleGroup.objects.create(name=name)
+                                            for name in ('Chest', 'Triceps', 'Legs')]
+        cls.push_up = _exercise('Push up', 1, 1, difficulty_level='Medium')
+        cls.push_up.muscle_groups.add(cls.chest, cls.triceps)
+        cls.bench = _exercise('Bench', 1, 1, difficulty_level='Medium', equipment='Barbell')
+        cls.bench.muscle_groups.add(cls.chest, cls.triceps)
+        cls.fly = _exercise('Fly', 1, 1, equipment='')
+        cls.fly.muscle_groups.add(cls.chest)
+        cls.squat = _exercise('Squat', 1, 1, difficulty_level='Hard', created_by=cls.user)
+        cls.triceps.exercise_set.add(cls.squat)
+        cls.legs.exercise_set.add(cls.squat)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def facets(self, **params):
+        response = self.client.get('/exercises/facets/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def mask(self, exercise):
+        exercise.refresh_from_db()
+        return exercise.muscle_mask
+
+    def test_masks_follow_membership(self):
+        bits = {group.name: 1 << MuscleGroup.objects.get(id=group.id).bit
+                for group in (self.chest, self.triceps, self.legs)}
+        self.assertEqual(len(set(bits.values())), 3)
+        self.assertEqual(self.mask(self.push_up), bits['Chest'] | bits['Triceps'])
+        self.assertEqual(self.mask(self.squat), bits['Triceps'] | bits['Legs'])
+        self.legs.exercise_set.clear()
+        self.assertEqual(self.mask(self.squat), bits['Triceps'])
+        self.triceps.delete()
+        self.assertEqual(self.mask(self.push_up), bits['Chest'])
+
+    def test_counts_per_facet(self):
+        groups = f'{self.chest.id},{self.triceps.id}'
+        data = self.facets(muscle_groups=groups, difficulty='Medium', equipment='none')
+        self.assertEqual((data['count'], [row['id'] for row in data['results']]), (1, [self.push_up.id]))
+        self.assertEqual([(row['name'], row['count']) for row in data['facets']['muscle_groups']],
+                         [('Chest', 1), ('Triceps', 1), ('Legs', 0)])
+        # Mỗi facet được đếm trên kết quả lọc bởi các facet còn lại
+        self.assertEqual(data['facets']['difficulty_level'], [{'value': 'Medium', 'count': 1}])
+        self.assertEqual(data['facets']['equipment'], [{'value': 'Barbell', 'count': 1},
+                                                       {'value': 'none', 'count': 1}])
+
+        self.assertEqual(self.facets(muscle_groups=groups)['count'], 2)
+        self.assertEqual(self.facets(muscle_groups=f'{self.legs.id},{self.chest.id}', match='any')['count'], 4)
+        # Không có dụng cụ: equipment NULL hoặc chuỗi rỗng
+        self.assertEqual(self.facets(equipment='none')['facets']['equipment'][0], {'value': 'none', 'count': 3})
+
+    def test_groups_without_bit_use_join(self):
+        abs_group = MuscleGroup.objects.create(name='Abs')
+        MuscleGroup.objects.filter(id=abs_group.id).update(bit=None)
+        self.fly.muscle_groups.add(abs_group)
+        data = self.facets(muscle_groups=f'{abs_group.id},{self.chest.id}')
+        self.assertEqual([row['id'] for row in data['results']], [self.fly.id])
+        data = self.facets(muscle_groups=f'{abs_group.id},{self.legs.id}', match='any')
+        self.assertEqual([row['id'] for row in data['results']], [self.fly.id, self.squat.id])
+        self.assertEqual([row['count'] for row in data['facets']['muscle_groups']], [1, 1, 1, 1])
+
+    def test_invalid_requests(self):
+        for params in [{'muscle_groups': 'a'}, {'limit': 'x'}, {'match': 'some'}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/exercises/facets/', params).status_code, 400)
+
+
+class UserSearchTests(TestCase):
+    """Tìm người dùng theo tên qua UserSearchTerm và danh sách người dùng/chuyên gia (xem user_search.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        joined = datetime(2025, 1, 1)
+        cls.me = User.objects.create_user(username='me', password='me', first_name='Tôi')
+        cls.nguyen = User.objects.create_user(username='nguyen_a', password='a', first_name='Văn', last_name='Nguyễn')
+        cls.expert = User.objects.create_user(username='tranb', password='b', first_name='Thị', last_name='Trần',
+                                              role=Role.EXPERT.value)
+        cls.coach = User.objects.create_user(username='coachx', password='c', first_name='Đức', last_name='Nguyễn',
+                                             role=Role.COACH.value)
+        for index, user in enumerate([cls.me, cls.nguyen, cls.expert, cls.coach]):
+            User.objects.filter(id=user.id).update(date_joined=joined + timedelta(days=index))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.me)
+
+    def ids(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        rows = response.data if isinstance(response.data, list) else response.data['results']
+        return [row['id'] for row in rows]
+
+    def test_terms(self):
+        self.assertEqual(user_search.terms_for(self.coach),
+                         {'duc', 'nguyen', '~ngu', '~guy', '~uye', '~yen', 'coachx', '~coa', '~oac', '~ach', '~chx'})
+
+    def test_prefix_and_trigram_matches(self):
+        url = '/hieu-user-infor/'
+        self.assertEqual(self.ids(url, search='NGUYỄN'), [self.coach.id, self.nguyen.id])
+        # "uyen" không phải tiền tố nhưng mọi trigram đều có trong "nguyen"
+        self.assertEqual(self.ids(url, search='uyen duc'), [self.coach.id])
+        self.assertEqual(self.ids(url, search='ngu  Văn'), [self.nguyen.id])
+        # "ngy": trigram không có trong tên nào
+        self.assertEqual(self.ids(url, search='ngy'), [])
+        # Câu truy vấn không có từ nào: không lọc
+        self.assertEqual(len(self.ids(url, search='--')), 4)
+
+    def test_index_follows_user_changes(self):
+        self.assertEqual(self.ids('/hieu-user-infor/', search='le'), [])
+        self.nguyen.last_name = 'Lê'
+        self.nguyen.save()
+        self.assertEqual(self.ids('/hieu-user-infor/', search='le'), [self.nguyen.id])
+        self.assertFalse(UserSearchTerm.objects.filter(user=self.nguyen, term='nguyen').exists())
+        with _count_queries() as queries:
+            self.nguyen.save(update_fields=['last_login'])
+        self.assertEqual(len(queries), 1)
+        self.coach.is_active = False
+        self.coach.save()
+        self.assertFalse(UserSearchTerm.objects.filter(user=self.coach).exists())
+
+        indexed = sorted(UserSearchTerm.objects.values_list('user_id', 'term', 'role'))
+        self.assertEqual(user_search.rebuild(), 3)
+        self.assertEqual(sorted(UserSearchTerm.objects.values_list('user_id', 'term', 'role')), indexed)
+
+    def test_experts_filter_roles_on_index(self):
+        url = '/api/experts-coaches/'
+        self.assertEqual(self.ids(url, search='nguyen'), [self.coach.id])
+        self.assertEqual(self.ids(url, search='tran', role=Role.COACH.value), [])
+        self.assertEqual(self.ids(url, search='tran', role=Role.EXPERT.value), [self.expert.id])
+
+    def test_lists_keep_full_response_without_pagination_params(self):
+        # Ứng dụng di động đọc mảng (chuyên gia) và {count, results} (người dùng)
+        response = self.client.get('/api/experts-coaches/')
+        self.assertEqual([row['id'] for row in response.data], [self.coach.id, self.expert.id])
+        response = self.client.get('/hieu-user-infor/')
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual([row['id'] for row in response.data['results']],
+                         [self.coach.id, self.expert.id, self.nguyen.id, self.me.id])
+
+    def test_cursor_pagination_is_opt_in(self):
+        for url in ['/hieu-user-infor/', '/api/experts-coaches/']:
+            with self.subTest(url=url):
+                seen = []
+                response = self.client.get(url, {'page_size': 1})
+                while True:
+                    self.assertEqual(set(response.data), {'next', 'results'})
+                    self.assertLessEqual(len(response.data['results']), 1)
+                    seen += [row['id'] for row in response.data['results']]
+                    if not response.data['next']:
+                        break
+                    response = self.client.get(response.data['next'])
+                self.assertEqual(seen, self.ids(url))
+                self.assertEqual(self.client.get(url, {'cursor': 'zzz'}).status_code, 404)
+
+
+@override_settings(AVATAR_STORAGE='HealthcareApp.avatars.CloudinaryAvatarStorage')
+class AvatarUrlTests(TestCase):
+    """URL avatar được tính sẵn khi lưu (User.avatar_urls), không tạo lại mỗi lần trả danh sách"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.me = User.objects.create_user(username='me', password='me')
+        for index in range(30):
+            User.objects.create_user(username=f'expert{index}', password='x', role=Role.EXPERT.value,
+                                     avatar=f'image/upload/v1/user_avatar/a{index}.jpg')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.me)
+
+    def test_urls_are_precomputed(self):
+        expert = User.objects.get(username='expert3')
+        self.assertEqual(set(expert.avatar_urls), {avatars.ORIGINAL, *avatars.THUMBNAIL_SIZES})
+        self.assertTrue(expert.avatar_urls['original'].endswith('/v1/user_avatar/a3.jpg'))
+        self.assertIn('c_fill,g_face,h_64,w_64', expert.avatar_urls['small'])
+        self.assertIn('c_fill,g_face,h_256,w_256', expert.avatar_urls['medium'])
+        self.assertEqual(self.me.avatar_urls, {})
+
+    def test_list_does_not_build_urls(self):
+        with mock.patch.object(CloudinaryResource, 'build_url') as build_url:
+            response = self.client.get('/api/experts-coaches/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(build_url.call_count, 0)
+        self.assertEqual(len(response.data), 30)
+        self.assertTrue(all(row['avatar_url'] == row['avatar_urls']['original'] for row in response.data))
+
+    def test_changing_avatar_refreshes_urls(self):
+        expert = User.objects.get(username='expert3')
+        expert.avatar = 'image/upload/v2/user_avatar/new.jpg'
+        expert.save()
+        expert.refresh_from_db()
+        self.assertTrue(expert.avatar_urls['original'].endswith('/v2/user_avatar/new.jpg'))
+        self.assertIn('new.jpg', expert.avatar_urls['small'])
+
+        # Lưu lại mà không đổi avatar: giữ nguyên URL đã tính
+        with mock.patch.object(avatars, 'refresh_urls') as refresh_urls:
+            expert.first_name = 'An'
+            expert.save()
+        refresh_urls.assert_not_called()
+
+        expert.avatar = None
+        expert.save()
+        expert.refresh_from_db()
+        self.assertEqual(expert.avatar_urls, {})
+
+
+def _jpeg(width, height):
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(output, format='JPEG')
+    return output.getvalue()
+
+
+class AvatarPipelineTests(TestCase):
+    """Ảnh đại diện mới được xử lý sau khi commit, không upload trong yêu cầu (xem avatars.py)"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings_override = override_settings(AVATAR_STORAGE='HealthcareApp.avatars.FileSystemAvatarStorage',
+                                              AVATAR_PROCESSING_ASYNC=False, MEDIA_ROOT=self.directory.name,
+                                              MEDIA_URL='/media/')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, name, width, height):
+        return SimpleUploadedFile(name, _jpeg(width, height), content_type='image/jpeg')
+
+    def stored_size(self, user):
+        path = Path(self.directory.name) / user.avatar_urls['original'][len('/media/'):]
+        with Image.open(path) as image:
+            return image.size
+
+    def test_register_processes_after_commit(self):
+        password = 'Abcdef!234xy'
+        with mock.patch('cloudinary.uploader.upload_resource') as upload_resource:
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = APIClient().post('/api/auth/register/', {
+                    'username': 'newbie', 'password': password, 'password2': password,
+                    'avatar': self.upload('a.jpg', 3000, 2000),
+                }, format='multipart')
+            self.assertEqual(response.status_code, 201)
+            user = User.objects.get(username='newbie')
+            # Người dùng được lưu chưa có avatar, việc xử lý chờ transaction commit
+            self.assertIsNone(avatars.avatar_key(user.avatar))
+            self.assertEqual(user.avatar_urls, {})
+            self.assertEqual(len(callbacks), 1)
+            for callback in callbacks:
+                callback()
+        upload_resource.assert_not_called()
+
+        user.refresh_from_db()
+        self.assertTrue(str(user.avatar).startswith(f'user_avatar/{user.id}_'))
+        self.assertTrue(user.avatar_urls['original'].startswith('/media/user_avatar/'))
+        self.assertEqual(user.avatar_urls['small'], user.avatar_urls['original'])
+        self.assertEqual(self.stored_size(user), (1024, 683))
+
+    def test_old_avatar_kept_until_processed(self):
+        user = User.objects.create_user(username='member', password='member')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.avatar = self.upload('a.jpg', 200, 100)
+            user.save()
+        user.refresh_from_db()
+        first = user.avatar_urls
+        self.assertEqual(self.stored_size(user), (200, 100))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            user.avatar = self.upload('b.jpg', 100, 100)
+            user.save()
+            user.refresh_from_db()
+            self.assertEqual(user.avatar_urls, first)
+        for callback in callbacks:
+            callback()
+        user.refresh_from_db()
+        self.assertNotEqual(user.avatar_urls['original'], first['original'])
+        self.assertEqual(self.stored_size(user), (100, 100))
+
+    @override_settings(AVATAR_PROCESSING_ASYNC=True)
+    def test_async_processing_uses_background_thread(self):
+        user = User.objects.create_user(username='member', password='member')
+        with mock.patch.object(avatars._executor, 'submit') as submit, self.captureOnCommitCallbacks(execute=True):
+            user.avatar = self.upload('a.jpg', 100, 100)
+            user.save()
+        submit.assert_called_once_with(avatars._run_processing, user.id, mock.ANY)
+
+
+class ServerTimingTests(TestCase):
+    """Header Server-Timing và log "HealthcareApp.timing" (xem instrumentation.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='member', password='member')
+        for weight in (60, 61, 62):
+            HealthStat.objects.create(user=cls.user, weight=weight, height=1.7)
+
+    def setUp(self):
+        auth_cache.tokens.clear()
+        self.token = Token.objects.create(user=self.user)
+
+    def get(self):
+        # Middleware đọc cấu hình khi được tạo: tạo client mới sau override_settings
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        with self.assertLogs('HealthcareApp.timing', 'INFO') as logs, _count_queries() as queries:
+            response = client.get('/health-stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(logs.records), 1)
+        return response, logs.records[0].timing, len(queries)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1.0)
+    def test_sampled_request(self):
+        response, timing, query_count = self.get()
+        names = [part.split(';')[0] for part in response['Server-Timing'].split(', ')]
+        self.assertEqual(names, ['db', 'auth', 'serialize', 'view', 'total'])
+        self.assertIn(f'desc="{query_count} queries"', response['Server-Timing'])
+        self.assertEqual(timing['db_queries'], query_count)
+        self.assertEqual(timing['view_name'], 'HealthStatViewSet')
+        self.assertEqual(timing['path'], '/health-stats/')
+        self.assertTrue(timing['sampled'])
+        self.assertGreaterEqual(timing['total_ms'], timing['view_ms'])
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1.0, SERVER_TIMING_HEADER=False)
+    def test_header_can_be_disabled(self):
+        response, timing, _ = self.get()
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertTrue(timing['sampled'])
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0.0, SERVER_TIMING_SLOW_MS=0)
+    def test_unsampled_slow_request_is_logged(self):
+        response, timing, _ = self.get()
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(set(timing), {'method', 'path', 'status', 'total_ms', 'sampled'})
+        self.assertFalse(timing['sampled'])
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0.0)
+    def test_unsampled_fast_request_is_not_logged(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        with self.assertNoLogs('HealthcareApp.timing', 'INFO'):
+            response = client.get('/health-stats/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+BENCHMARK_BASELINES = Path(__file__).with_name('benchmark_baselines.json')
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+@skipUnless(os.environ.get('BENCHMARK'), "Chạy benchmark bằng BENCHMARK=1 python manage.py test HealthcareApp.tests.EndpointBenchmarks")
+class EndpointBenchmarks(TestCase):
+    """
+    Đo thời gian và số truy vấn của các API chính trên bộ dữ liệu lớn, so với
+    mốc lưu trong benchmark_baselines.json (theo loại DB), vượt mốc thì kiểm thử lỗi.
+
+    - Số truy vấn phải không lớn hơn mốc.
+    - Thời gian (trung vị của BENCHMARK_ROUNDS lần, cache được xóa trước mỗi lần)
+      phải không lớn hơn mốc * BENCHMARK_TOLERANCE + BENCHMARK_SLACK_MS.
+
+    Dữ liệu: BENCHMARK_USERS người dùng, mỗi người có HealthStat hằng tuần và
+    buổi tập hằng tháng trong BENCHMARK_YEARS năm; người dùng được đo có HealthStat
+    hằng ngày và buổi tập cách ngày, mỗi buổi nhiều bài tập.
+    Ghi lại mốc (sau khi tối ưu, hoặc trên máy khác): BENCHMARK_UPDATE=1.
+    Thời gian phụ thuộc máy chạy: chỉ so sánh các mốc ghi trên cùng một máy.
+    """
+    ENDPOINTS = {
+        'my-statistics weekly': '/api/my-statistics/?period=weekly',
+        'my-statistics monthly': '/api/my-statistics/?period=monthly',
+        'my-statistics yearly': '/api/my-statistics/?period=yearly',
+        'my-statistics custom': '/api/my-statistics/?period=custom&start_date={year_ago}&end_date={today}'
+                                '&granularity=monthly',
+        'health-statistic': '/health-statistic/',
+        'track-changes weekly': '/health-statistic/track-changes/?period=weekly',
+        'track-changes monthly': '/health-statistic/track-changes/?period=monthly',
+        'track-changes yearly': '/health-statistic/track-changes/?period=yearly',
+        'workout-sessions': '/workout-sessions/',
+        'exercises': '/exercises/',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(2025)
+        users_count = _env_int('BENCHMARK_USERS', 2000)
+        days = _env_int('BENCHMARK_YEARS', 3) * 365
+        today = datetime.combine(date.today(), datetime.min.time())
+        first_day = today - timedelta(days=days - 1)
+
+        started = time.perf_counter()
+        password = make_password('benchmark')
+        first_names = ['An', 'Bình', 'Chi', 'Dũng', 'Giang', 'Hà', 'Hiếu', 'Khoa', 'Lan', 'Minh', 'Nam', 'Phương']
+        last_names = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Võ', 'Đặng', 'Bùi']
+        roles = [Role.USER.value] * 8 + [Role.EXPERT.value, Role.COACH.value]
+        User.objects.bulk_create([
+            User(username=f'benchmark{i}', password=password, first_name=rng.choice(first_names),
+                 last_name=rng.choice(last_names), role=Role.USER.value if i == 0 else rng.choice(roles),
+                 date_joined=first_day + timedelta(days=rng.randrange(days)))
+            for i in range(users_count)
+        ], batch_size=1000)
+        users = list(User.objects.filter(username__startswith='benchmark').order_by('id'))
+        cls.user = users[0]
+
+        groups = [MuscleGroup.objects.create(name=f'Nhóm cơ {i}') for i in range(12)]
+        Exercise.objects.bulk_create([
+            Exercise(name=f'Bài tập {i}', description='', difficulty_level=rng.choice(['Easy', 'Medium', 'Hard']),
+                     equipment=rng.choice(['Dumbbell', 'Barbell', 'Mat', None]), duration=rng.randint(5, 30),
+                     calories_burned=round(rng.uniform(50, 300), 2), rating=round(rng.uniform(3, 5), 2),
+                     created_by=users[i % len(users)] if i % 4 == 0 else None)
+            for i in range(400)
+        ], batch_size=1000)
+        exercises = list(Exercise.objects.values_list('id', flat=True))
+        muscle_facets.Membership.objects.bulk_create([
+            muscle_facets.Membership(exercise_id=exercise_id, musclegroup_id=group.id)
+            for exercise_id in exercises for group in rng.sample(groups, k=rng.randint(1, 3))
+        ], batch_size=5000)
+        muscle_facets.recompute_masks(exercises)
+
+        def health_stats(user, step):
+            weight = rng.uniform(50, 95)
+            for day in range(0, days, step):
+                weight += rng.uniform(-0.3, 0.3)
+                yield HealthStat(user=user, date=first_day + timedelta(days=day, hours=rng.randint(6, 21)),
+                                 weight=round(weight, 1), height=1.7, bmi=round(weight / 1.7 ** 2, 2),
+                                 water_intake=round(rng.uniform(1, 3), 1), step_count=rng.randint(1000, 15000),
+                                 heart_rate=rng.randint(55, 110))
+
+        def sessions(user, step, exercise_count):
+            for day in range(0, days, step):
+                session = WorkoutSession(user=user, name=f'Buổi tập {day}', goal=HealthGoals.LOSE_WEIGHT.value,
+                                         schedule=first_day + timedelta(days=day, hours=18))
+                yield session, rng.sample(exercises, k=exercise_count)
+
+        for offset in range(0, len(users), 100):
+            chunk = users[offset:offset + 100]
+            HealthStat.objects.bulk_create(
+                [stat for user in chunk for stat in health_stats(user, 1 if user == cls.user else 7)],
+                batch_size=5000
+            )
+            planned = [item for user in chunk
+                       for item in sessions(user, 2 if user == cls.user else 30, 8 if user == cls.user else 3)]
+            WorkoutSession.objects.bulk_create([session for session, _ in planned], batch_size=5000)
+            WorkoutSession.exercise.through.objects.bulk_create([
+                WorkoutSession.exercise.through(workoutsession_id=session.id, exercise_id=exercise_id)
+                for session, exercise_ids in planned for exercise_id in exercise_ids
+            ], batch_size=5000)
+
+        # bulk_create không gửi signal: dựng lại các dữ liệu dẫn xuất
+        # Bảng tổng hợp được dựng lại ngay sau đó: tính tổng bằng một câu lệnh UPDATE, không cộng chênh lệch
+        WorkoutSession.objects.update(updated_date=F('schedule'), **workout_totals.totals_expressions())
+        for user in users:
+            rollups.rebuild_user(user.id)
+        search_index.rebuild()
+        user_search.rebuild()
+        cls.setup_seconds = time.perf_counter() - started
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def measure(self, url):
+        """(số truy vấn, trung vị thời gian ms) của một API khi chưa có cache"""
+        rounds = _env_int('BENCHMARK_ROUNDS', 5)
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        # CaptureQueriesContext không dùng được: connection.queries bị xóa khi bắt đầu mỗi yêu cầu
+        cache.clear()
+        with connection.execute_wrapper(count_query):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content[:500])
+
+        durations = []
+        for _ in range(rounds):
+            cache.clear()
+            started = time.perf_counter()
+            self.client.get(url)
+            durations.append((time.perf_counter() - started) * 1000)
+        return len(queries), round(statistics.median(durations), 2)
+
+    def test_endpoints(self):
+        stored = json.loads(BENCHMARK_BASELINES.read_text()) if BENCHMARK_BASELINES.exists() else {}
+        baselines = stored.get(connection.vendor, {})
+        tolerance = float(os.environ.get('BENCHMARK_TOLERANCE', 1.5))
+        slack_ms = float(os.environ.get('BENCHMARK_SLACK_MS', 5))
+        update = bool(os.environ.get('BENCHMARK_UPDATE'))
+
+        results = {}
+        for name, url in self.ENDPOINTS.items():
+            url = url.format(year_ago=date.today() - timedelta(days=stats.MAX_CUSTOM_DAYS - 1), today=date.today())
+            query_count, duration_ms = self.measure(url)
+            results[name] = {'queries': query_count, 'ms': duration_ms}
+            baseline = baselines.get(name)
+            print(f"{name:<24} {query_count:>4} truy vấn {duration_ms:>9.2f} ms"
+                  + (f" (mốc {baseline['queries']} truy vấn, {baseline['ms']} ms)" if baseline else ''))
+            if update:
+                continue
+            with self.subTest(endpoint=name):
+                self.assertIsNotNone(baseline, f"Chưa có mốc cho {name}, chạy lại với BENCHMARK_UPDATE=1")
+                self.assertLessEqual(query_count, baseline['queries'], f"{url}: số truy vấn tăng")
+                self.assertLessEqual(duration_ms, baseline['ms'] * tolerance + slack_ms, f"{url}: chậm hơn mốc")
+        print(f"Dựng dữ liệu: {self.setup_seconds:.1f} s")
+
+        if update:
+            stored[connection.vendor] = results
+            BENCHMARK_BASELINES.write_text(json.dumps(stored, indent=2, ensure_ascii=False) + '\n')
@@ -0,0 +1,53 @@
+"""
+Xóa token OAuth2 hết hạn theo từng lô id (không COUNT cả bảng sau mỗi lô như
+oauth2_provider.models.clear_expired), giữ transaction và khóa ở mức nhỏ khi
+bảng token đã rất lớn. Điều kiện xóa giống clear_expired.
+"""
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from oauth2_provider.models import get_access_token_model, get_grant_model, get_id_token_model, \
+    get_refresh_token_model
+from oauth2_provider.settings import oauth2_settings
+
+BATCH_SIZE = 1000
+
+
+def _delete_in_batches(model, condition, batch_size):
+    deleted = 0
+    while True:
+        ids = list(model.objects.filter(condition).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        model.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            return deleted
+
+
+def clear_expired_tokens(batch_size=BATCH_SIZE):
+    """Xóa refresh token đã thu hồi/hết hạn, access token, ID token và grant hết hạn; trả về {loại: số dòng}"""
+    now = timezone.now()
+    deleted = {}
+
+    refresh_expire_seconds = oauth2_settings.REFRESH_TOKEN_EXPIRE_SECONDS
+    if refresh_expire_seconds:
+        if not isinstance(refresh_expire_seconds, timedelta):
+            refresh_expire_seconds = timedelta(seconds=refresh_expire_seconds)
+        refresh_expire_at = now - refresh_expire_seconds
+        deleted['refresh_tokens'] = _delete_in_batches(
+            get_refresh_token_model(),
+            Q(revoked__lt=refresh_expire_at) | Q(access_token__expires__lt=refresh_expire_at),
+            batch_size
+        )
+
+    # Access token còn refresh token được giữ lại để refresh token vẫn dùng được
+    deleted['access_tokens'] = _delete_in_batches(
+        get_access_token_model(), Q(refresh_token__isnull=True, expires__lt=now), batch_size
+    )
+    deleted['id_tokens'] = _delete_in_batches(
+        get_id_token_model(), Q(access_token__isnull=True, expires__lt=now), batch_size
+    )
+    deleted['grants'] = _delete_in_batches(get_grant_model(), Q(expires__lt=now), batch_size)
+    return deleted
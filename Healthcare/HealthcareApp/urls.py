@@ -1,7 +1,7 @@
-from . import views
+from . import views, metrics
 from django.urls import path, include
 from rest_framework import routers
-from .views import RegisterView, FacebookLoginView, GoogleLoginView, PersonalStatisticView, MuscleGroupViewSet, ExpertCoachListView
+from .views import RegisterView, FacebookLoginView, GoogleLoginView, PersonalStatisticView, ClientStatisticView, MuscleGroupViewSet, ExpertCoachListView
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 
@@ -43,7 +43,9 @@ urlpatterns = [
     # Custom API
     path('api/auth/register/', RegisterView.as_view(), name='register'),
     path('api/my-statistics/', PersonalStatisticView.as_view(), name='statistic'),
+    path('api/clients-statistics/', ClientStatisticView.as_view(), name='clients-statistics'),
     path('api/experts-coaches/', ExpertCoachListView.as_view(), name='experts-coaches'),
+    path('metrics/', metrics.metrics_view, name='metrics'),
     # Social login
     # path('api/auth/facebook/', FacebookLoginView.as_view(), name='facebook_login'),
     # path('api/auth/google/', GoogleLoginView.as_view(), name='google_login'),
@@ -0,0 +1,95 @@
+"""
+Chỉ mục tìm kiếm người dùng theo tên (first_name, last_name, username), không
+phân biệt dấu tiếng Việt.
+
+Mỗi từ của tên được lưu vào UserSearchTerm cùng các trigram (3 ký tự liên tiếp,
+đánh dấu bằng TRIGRAM_MARK) của từ đó, kèm role của người dùng để lọc chuyên
+gia/huấn luyện viên ngay trên index. Một từ của câu truy vấn khớp khi nó là
+tiền tố của một từ trong tên ("ngu" -> "Nguyễn"), hoặc khi mọi trigram của nó
+có trong tên ("uyen" -> "Nguyễn"). Mọi từ của câu truy vấn phải khớp.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Max, Q, Value, When
+
+from HealthcareApp.models import User, UserSearchTerm
+from HealthcareApp.search_index import MAX_QUERY_TERMS, match_term, tokenize
+
+FIELDS = ('first_name', 'last_name', 'username')
+TRIGRAM_MARK = '~'  # Không thuộc \w nên không trùng với từ và nằm ngoài mọi khoảng tiền tố
+TRIGRAM_LENGTH = 3
+
+
+def trigrams(word):
+    return {TRIGRAM_MARK + word[i:i + TRIGRAM_LENGTH] for i in range(len(word) - TRIGRAM_LENGTH + 1)}
+
+
+def terms_for(user):
+    """Tập từ và trigram của tên người dùng"""
+    terms = set()
+    for field in FIELDS:
+        for word in tokenize(getattr(user, field)):
+            terms.add(word)
+            # Từ 3 ký tự đã được tìm thấy qua tiền tố
+            if len(word) > TRIGRAM_LENGTH:
+                terms |= trigrams(word)
+    return terms
+
+
+def _rows(user):
+    return [UserSearchTerm(user_id=user.id, term=term, role=user.role) for term in terms_for(user)]
+
+
+def index_user(user):
+    """Cập nhật chỉ mục của một người dùng; người dùng bị khóa bị xóa khỏi chỉ mục"""
+    with transaction.atomic():
+        UserSearchTerm.objects.filter(user=user).delete()
+        if user.is_active:
+            UserSearchTerm.objects.bulk_create(_rows(user))
+
+
+def rebuild(batch_size=1000):
+    """Dựng lại toàn bộ chỉ mục, trả về số người dùng được đánh chỉ mục"""
+    count = 0
+    with transaction.atomic():
+        UserSearchTerm.objects.all().delete()
+        rows = []
+        for user in User.objects.filter(is_active=True).only('id', 'role', *FIELDS).iterator(chunk_size=batch_size):
+            count += 1
+            rows += _rows(user)
+            if len(rows) >= batch_size:
+                UserSearchTerm.objects.bulk_create(rows)
+                rows = []
+        UserSearchTerm.objects.bulk_create(rows)
+    return count
+
+
+def matching_users(query, roles=None):
+    """
+    Subquery id của người dùng khớp với mọi từ trong `query` (chỉ gồm các
+    role trong `roles` nếu có), dùng với `id__in`. Trả về None nếu câu truy
+    vấn không có từ nào.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+
+    condition = Q()
+    matched_all = Q()
+    annotations = {}
+    for index, term in enumerate(terms):
+        condition |= match_term(term)
+        annotations[f'prefix_{index}'] = Max(Case(When(match_term(term), then=Value(1)),
+                                                  default=Value(0), output_field=IntegerField()))
+        matched = Q(**{f'prefix_{index}': 1})
+
+        grams = trigrams(term)
+        if grams:
+            condition |= Q(term__in=grams)
+            annotations[f'trigram_{index}'] = Count('term', distinct=True, filter=Q(term__in=grams))
+            matched |= Q(**{f'trigram_{index}': len(grams)})
+        matched_all &= matched
+
+    rows = UserSearchTerm.objects.filter(condition)
+    if roles:
+        rows = rows.filter(role__in=roles)
+    return rows.values('user_id').annotate(**annotations).filter(matched_all).values('user_id')
@@ -1,3 +1,4 @@
+from datetime import datetime, timedelta
 
 
 def summarize_nutrition(food_items_queryset):
@@ -20,4 +21,13 @@ def summarize_nutrition(food_items_queryset):
         'proteins': round(total_proteins, 2),
         'fats': round(total_fats, 2),
         'quantities': round(total_quantities, 2),
-    }
\ No newline at end of file
+    }
+
+def date_bounds(start_date, end_date):
+    """
+    Chuyển khoảng ngày [start_date, end_date] thành khoảng datetime nửa mở
+    [start, end + 1 ngày) để so sánh trực tiếp trên cột DateTimeField.
+    """
+    lower = datetime.combine(start_date, datetime.min.time())
+    upper = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    return lower, upper
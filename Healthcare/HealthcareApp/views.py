@@ -8,12 +8,14 @@ from rest_framework import (mixins, viewsets,
                             permissions, generics, parsers,
                             status, request)
 from dj_rest_auth.registration.views import SocialLoginView
-from rest_framework.exceptions import MethodNotAllowed, PermissionDenied
+from rest_framework.exceptions import MethodNotAllowed, PermissionDenied, NotFound
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.generics import ListAPIView, RetrieveAPIView
 from rest_framework.permissions import IsAuthenticated
 
-from HealthcareApp import serializers
+from HealthcareApp import serializers, stats, statistics_cache, paginators, rollups, downsampling, catalog, search_index, muscle_facets, user_search
+from HealthcareApp.conditional import ConditionalGetMixin
+from HealthcareApp.query_planner import OptimizedQuerysetMixin
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from allauth.socialaccount.providers.facebook.views import FacebookOAuth2Adapter
@@ -92,7 +94,7 @@ class UserViewSet(viewsets.ViewSet):
         else:
             return Response(serializers.UserSerializer(request.user).data)
 
-class UserInforViewSet(viewsets.ViewSet, generics.UpdateAPIView):
+class UserInforViewSet(OptimizedQuerysetMixin, viewsets.ViewSet, generics.UpdateAPIView):
     queryset = User.objects.filter(is_active=True)
     serializer_class = UserInforSerializer
     permission_classes = [IsAuthenticated]
@@ -114,7 +116,7 @@ class UserInforViewSet(viewsets.ViewSet, generics.UpdateAPIView):
         return self.update(request, *args, **kwargs)
 
 
-class HealthStatViewSet(viewsets.ModelViewSet):
+class HealthStatViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = HealthStatSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -124,6 +126,20 @@ class HealthStatViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @swagger_auto_schema(
+        request_body=serializers.HealthStatBulkSerializer,
+        operation_description="Đồng bộ nhiều bản ghi sức khỏe (từ thiết bị đeo) trong một yêu cầu, "
+                              "mỗi bản ghi có thời điểm ghi nhận 'date'"
+    )
+    @action(methods=['post'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        serializer = serializers.HealthStatBulkSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        result = serializer.save()
+
+        status_code = status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK
+        return Response(result, status=status_code)
+
 
 class HieuUserInforViewSet(viewsets.ViewSet):
     queryset = User.objects.filter(is_active=True)
@@ -131,14 +147,20 @@ class HieuUserInforViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     @swagger_auto_schema(
-        operation_description="Lấy danh sách người dùng",
+        operation_description="Lấy danh sách người dùng (mới tham gia trước) dạng {count, results}. "
+                              "Gửi cursor hoặc page_size để phân trang theo con trỏ, khi đó trả về {next, results}",
         manual_parameters=[
             openapi.Parameter(
                 'search',
                 openapi.IN_QUERY,
-                description="Tìm kiếm theo tên (first_name, last_name, username)",
+                description="Tìm kiếm theo tên (first_name, last_name, username), không phân biệt dấu, "
+                            "khớp theo tiền tố hoặc một phần của từ",
                 type=openapi.TYPE_STRING
-            )
+            ),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Con trỏ trang tiếp theo (lấy từ 'next')",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Số người dùng mỗi trang (1-100), bật phân trang",
+                              type=openapi.TYPE_INTEGER),
         ]
     )
     def list(self, request):
@@ -147,21 +169,25 @@ class HieuUserInforViewSet(viewsets.ViewSet):
         """
         queryset = self.queryset
 
-        # Tìm kiếm theo tên
+        # Tìm kiếm theo tên qua chỉ mục UserSearchTerm
         search = request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(username__icontains=search)
-            )
-
-        # Sắp xếp theo ngày tham gia
-        queryset = queryset.order_by('-date_joined')
-
+            matches = user_search.matching_users(search)
+            if matches is not None:
+                queryset = queryset.filter(id__in=matches)
+
+        # Có cursor/page_size: phân trang theo ngày tham gia, không đếm tổng số dòng
+        paginator = paginators.UserKeysetPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        if page is not None:
+            serializer = self.serializer_class(page, many=True, context={'request': request})
+            return paginator.get_paginated_response(serializer.data)
+
+        # Dạng trả về cũ: toàn bộ danh sách, sắp xếp theo ngày tham gia
+        queryset = queryset.order_by('-date_joined', '-id')
         serializer = self.serializer_class(queryset, many=True, context={'request': request})
         return Response({
-            'count': queryset.count(),
+            'count': len(serializer.data),
             'results': serializer.data
         })
 
@@ -183,7 +209,7 @@ class HieuUserInforViewSet(viewsets.ViewSet):
             )
 
 
-class ExerciseViewSet(viewsets.ModelViewSet):
+class ExerciseViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Exercise.objects.filter(is_active=True)
     serializer_class = ExerciseSerializer
     permission_classes = [IsAuthenticated]
@@ -203,11 +229,90 @@ class ExerciseViewSet(viewsets.ModelViewSet):
             is_active=True
         )
 
-class MuscleGroupViewSet(viewsets.ReadOnlyModelViewSet):  # chỉ GET
+    def list(self, request, *args, **kwargs):
+        # Bài tập gợi ý giống nhau với mọi người dùng: phục vụ từ bản chụp danh mục kèm ETag
+        if request.query_params.get('type') == 'suggested':
+            return catalog.respond(request, catalog.SUGGESTED_EXERCISES)
+        return super().list(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_description="Lọc bài tập theo nhiều nhóm cơ, độ khó, dụng cụ và trả về số lượng theo từng bộ lọc",
+        manual_parameters=[
+            openapi.Parameter('muscle_groups', openapi.IN_QUERY, description="Danh sách ID nhóm cơ, cách nhau bởi dấu phẩy",
+                              type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('match', openapi.IN_QUERY, description="all: có tất cả nhóm cơ, any: có ít nhất một",
+                              type=openapi.TYPE_STRING, enum=['all', 'any'], default='all'),
+            openapi.Parameter('difficulty', openapi.IN_QUERY, description="Độ khó, ví dụ: Medium",
+                              type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('equipment', openapi.IN_QUERY, description="Dụng cụ, 'none' cho bài tập không cần dụng cụ",
+                              type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('type', openapi.IN_QUERY, description="personal / suggested, mặc định cả hai",
+                              type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Số bài tập trả về tối đa (1-200, mặc định 50)",
+                              type=openapi.TYPE_INTEGER, required=False),
+        ]
+    )
+    @action(methods=['get'], detail=False, url_path='facets')
+    def facets(self, request):
+        try:
+            group_ids = [int(value) for value in request.query_params.get('muscle_groups', '').split(',') if value.strip()]
+            limit = max(1, min(int(request.query_params.get('limit', 50)), 200))
+        except ValueError:
+            return Response({'error': 'muscle_groups và limit phải là số nguyên'}, status=400)
+        match = request.query_params.get('match', muscle_facets.MATCH_ALL)
+        if match not in (muscle_facets.MATCH_ALL, muscle_facets.MATCH_ANY):
+            return Response({'error': 'match phải là all hoặc any'}, status=400)
+
+        matches, facets = muscle_facets.facet_search(
+            self.get_queryset(), group_ids, match,
+            difficulty=request.query_params.get('difficulty') or None,
+            equipment=request.query_params.get('equipment') or None,
+        )
+        page = self.filter_queryset(matches.order_by('id'))[:limit]
+        return Response({
+            'count': matches.count(),
+            'results': self.get_serializer(page, many=True).data,
+            'facets': facets
+        })
+
+    @swagger_auto_schema(
+        operation_description="Tìm kiếm bài tập của bản thân và bài tập gợi ý theo tên, dụng cụ, mô tả "
+                              "(không phân biệt dấu, khớp theo tiền tố, xếp hạng theo mức độ liên quan)",
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description="Từ khóa tìm kiếm, ví dụ: 'day nguc'",
+                              type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Số kết quả tối đa (1-50, mặc định 20)",
+                              type=openapi.TYPE_INTEGER, required=False),
+        ]
+    )
+    @action(methods=['get'], detail=False, url_path='search')
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Thiếu tham số q'}, status=400)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 50))
+        except ValueError:
+            return Response({'error': 'limit phải là số nguyên'}, status=400)
+
+        ranked = search_index.search(request.user, query, limit=limit)
+        exercises = self.filter_queryset(Exercise.objects.filter(id__in=[pk for pk, _ in ranked], is_active=True))
+        exercises = {exercise.id: exercise for exercise in exercises}
+        results = []
+        for pk, score in ranked:
+            if pk in exercises:
+                results.append({**self.get_serializer(exercises[pk]).data, 'score': score})
+        return Response(results)
+
+class MuscleGroupViewSet(OptimizedQuerysetMixin, viewsets.ReadOnlyModelViewSet):  # chỉ GET
     queryset = MuscleGroup.objects.filter(is_active=True)
     serializer_class = MuscleGroupSerializer
 
-class WorkoutSessionViewSet(viewsets.ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        return catalog.respond(request, catalog.MUSCLE_GROUPS)
+
+class WorkoutSessionViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
+    conditional_related = ['exercise', 'exercise__muscle_groups']
     permission_classes = [IsAuthenticated]
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
 
@@ -222,7 +327,8 @@ class WorkoutSessionViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class WorkoutSessionReadViewSet(viewsets.ModelViewSet):
+class WorkoutSessionReadViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
+    conditional_related = ['exercise', 'exercise__muscle_groups']
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -236,7 +342,7 @@ class WorkoutSessionReadViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class DiaryViewSet(viewsets.ModelViewSet):
+class DiaryViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Diary.objects.filter(is_active=True)
     serializer_class = serializers.DiarySerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -245,25 +351,27 @@ class DiaryViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class NutritionGoalViewSet(viewsets.ModelViewSet):
+class NutritionGoalViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = NutritionGoal.objects.filter(is_active=True)
     serializer_class = serializers.NutritionGoalSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 
-class NutritionPLanViewSet(viewsets.ModelViewSet):
+class NutritionPLanViewSet(ConditionalGetMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
+    # meals chỉ trả về id: thêm/bớt bữa ăn cập nhật updated_date của thực đơn (xem signals.py)
+    # nên không cần conditional_related
     queryset = NutritionPlan.objects.filter(is_active=True)
     serializer_class = serializers.NutritionPlanSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 
-class MealViewSet(viewsets.ModelViewSet):
+class MealViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Meal.objects.filter(is_active=True)
     serializer_class = serializers.MealSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 
-class FoodItemViewSet(viewsets.ModelViewSet):
+class FoodItemViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = FoodItem.objects.filter(is_active=True)
     serializer_class = serializers.FoodItemSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -287,7 +395,7 @@ class PersonalStatisticView(RetrieveAPIView):
                 openapi.IN_QUERY,
                 description="Khoảng thời gian thống kê",
                 type=openapi.TYPE_STRING,
-                enum=['weekly', 'monthly', 'yearly'],
+                enum=['weekly', 'monthly', 'yearly', 'custom'],
                 default='weekly'
             ),
             openapi.Parameter(
@@ -310,6 +418,28 @@ class PersonalStatisticView(RetrieveAPIView):
                 description="Năm cụ thể (format: YYYY, ví dụ: 2024)",
                 type=openapi.TYPE_STRING,
                 required=False
+            ),
+            openapi.Parameter(
+                'start_date',
+                openapi.IN_QUERY,
+                description="Ngày bắt đầu cho period=custom (format: YYYY-MM-DD)",
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
+            openapi.Parameter(
+                'end_date',
+                openapi.IN_QUERY,
+                description="Ngày kết thúc cho period=custom (format: YYYY-MM-DD)",
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
+            openapi.Parameter(
+                'granularity',
+                openapi.IN_QUERY,
+                description="Độ chi tiết cho period=custom",
+                type=openapi.TYPE_STRING,
+                enum=['daily', 'weekly', 'monthly'],
+                default='daily'
             )
         ]
     )
@@ -339,228 +469,18 @@ class PersonalStatisticView(RetrieveAPIView):
             target_user = request.user
 
         period = request.query_params.get('period', 'weekly')
-        today = now().date()
-        
-        if period == 'weekly':
-            week_param = request.query_params.get('week')
-            
-            if week_param:
-                try:
-                    # Format should be YYYY-Wnn
-                    year_str, week_str = week_param.split('-W')
-                    year = int(year_str)
-                    week = int(week_str)
-                    
-                    # Tính ngày đầu tiên của tuần (thứ 2)
-                    first_day = datetime(year, 1, 1).date()
-                    
-                    # Ngày đầu tiên của tuần đầu tiên của năm (ngày thứ 2 đầu tiên)
-                    if first_day.weekday() > 0:  # Không phải thứ 2
-                        first_day = first_day - timedelta(days=first_day.weekday())
-                        first_day = first_day + timedelta(days=7)  # Đến thứ 2 tuần sau
-                    
-                    # Tính ngày đầu tiên của tuần được chọn
-                    start_date = first_day + timedelta(weeks=week-1)
-                    end_date = start_date + timedelta(days=6)  # 7 ngày từ ngày bắt đầu
-                    
-                except (ValueError, TypeError):
-                    return Response({'error': 'Invalid week format. Use YYYY-Wnn'}, status=400)
-            else:
-                # Default to current week if no week specified
-                start_date = today - timedelta(days=today.weekday())  # Thứ 2 của tuần hiện tại
-                end_date = min(start_date + timedelta(days=6), today)  # Chủ nhật hoặc hôm nay, tùy cái nào sớm hơn
-                
-            date_range = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
-            
-        elif period == 'monthly':
-            month_param = request.query_params.get('month')
-            
-            if month_param:
-                try:
-                    year, month = map(int, month_param.split('-'))
-                    start_date = datetime(year, month, 1).date()
-                    
-                    _, last_day = calendar.monthrange(year, month)
-                    end_date = datetime(year, month, last_day).date()
-
-                    # Nếu là tháng hiện tại, end_date là hôm nay
-                    if year == today.year and month == today.month:
-                        end_date = min(end_date, today)
-                except (ValueError, TypeError):
-                    return Response({'error': 'Invalid month format. Use YYYY-MM'}, status=400)
-            else:
-                # Tháng hiện tại
-                start_date = today.replace(day=1)  # Ngày đầu tiên của tháng
-                _, last_day = calendar.monthrange(today.year, today.month)
-                end_date = min(today.replace(day=last_day), today)  # Ngày cuối cùng của tháng hoặc hôm nay
-                
-            date_range = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
-            
-        elif period == 'yearly':
-            year_param = request.query_params.get('year')
-            
-            if year_param:
-                try:
-                    year = int(year_param)
-                    start_date = datetime(year, 1, 1).date()
-
-                    if year == today.year:
-                        # Nếu là năm hiện tại, end_date là hôm nay
-                        end_date = today
-                    else:
-                        end_date = datetime(year, 12, 31).date()
-                except (ValueError, TypeError):
-                    return Response({'error': 'Invalid year format. Use YYYY'}, status=400)
-            else:
-                # Năm hiện tại
-                start_date = datetime(today.year, 1, 1).date()
-                end_date = today
-                
-            # For yearly, we'll return monthly statistics
-            date_range = []
-            year = start_date.year
-            for month in range(1, 13):
-                # Chỉ tính đến tháng hiện tại nếu đang trong năm hiện tại
-                if year == today.year and month > today.month:
-                    break
-                date_range.append(datetime(year, month, 1).date())
-        else:
-            return Response({'error': 'Invalid period. Use weekly, monthly, or yearly'}, status=400)
-
-        # Lấy dữ liệu tập luyện - sử dụng target_user thay vì request.user
-        workout_sessions = WorkoutSession.objects.filter(
-            user=target_user,
-            updated_date__date__range=(start_date, end_date),
+        try:
+            start_date, end_date, granularity = stats.resolve_period(period, request.query_params, now().date())
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        # Tính toán dữ liệu tập luyện và sức khỏe theo từng chu kỳ (có cache theo người dùng)
+        data = statistics_cache.get_or_compute(
+            'my-statistics', target_user.id, start_date, end_date, (granularity,),
+            lambda: stats.compute_statistics(target_user, start_date, end_date, granularity)
         )
-        
-        # Lấy dữ liệu sức khỏe - sử dụng target_user thay vì request.user
-        health_stats = HealthStat.objects.filter(
-            user=target_user,
-            date__range=(start_date, end_date),
-        ).order_by('date')
-        
-        # Tính toán dữ liệu workout
-        if period == 'yearly':
-            # Nhóm dữ liệu theo tháng
-            monthly_stats = workout_sessions.annotate(
-                month=TruncMonth('updated_date')
-            ).values('month').annotate(
-                calories_burned_sum=Sum('calories_burned'),
-                total_duration_sum=Sum('total_duration')
-            )
-            
-            # Dữ liệu theo tháng
-            calories_per_month = defaultdict(int)
-            time_per_month = defaultdict(int)
-            
-            for entry in monthly_stats:
-                month = entry['month'].date().replace(day=1)
-                calories_per_month[month] = entry['calories_burned_sum'] or 0
-                time_per_month[month] = entry['total_duration_sum'] or 0
-                
-            # Tạo mảng kết quả theo đúng thứ tự tháng
-            calories_array = [calories_per_month[d] for d in date_range]
-            time_array = [time_per_month[d] for d in date_range]
-            
-            # Tính toán chỉ số sức khỏe theo tháng
-            monthly_health = {}
-            for month in range(1, 13):
-                month_start = datetime(year, month, 1).date()
-                _, last_day = calendar.monthrange(year, month)
-                month_end = datetime(year, month, last_day).date()
-                
-                month_stats = health_stats.filter(date__range=(month_start, month_end))
-                if month_stats.exists():
-                    monthly_health[month] = {
-                        'avg_weight': month_stats.aggregate(Avg('weight'))['weight__avg'],
-                        'avg_bmi': month_stats.aggregate(Avg('bmi'))['bmi__avg'],
-                        'avg_water_intake': month_stats.aggregate(Avg('water_intake'))['water_intake__avg'],
-                        'avg_step_count': month_stats.aggregate(Avg('step_count'))['step_count__avg'],
-                        'avg_heart_rate': month_stats.aggregate(Avg('heart_rate'))['heart_rate__avg'],
-                    }
-                else:
-                    monthly_health[month] = {
-                        'avg_weight': None,
-                        'avg_bmi': None,
-                        'avg_water_intake': None,
-                        'avg_step_count': None,
-                        'avg_heart_rate': None,
-                    }
-            
-            # Chuyển đổi thành mảng cho từng chỉ số
-            weight_array = [monthly_health[month]['avg_weight'] for month in range(1, 13)]
-            bmi_array = [monthly_health[month]['avg_bmi'] for month in range(1, 13)]
-            water_array = [monthly_health[month]['avg_water_intake'] for month in range(1, 13)]
-            steps_array = [monthly_health[month]['avg_step_count'] for month in range(1, 13)]
-            heart_rate_array = [monthly_health[month]['avg_heart_rate'] for month in range(1, 13)]
-        else:
-            # Nhóm dữ liệu theo ngày
-            daily_stats = workout_sessions.annotate(
-                date=TruncDate('updated_date')
-            ).values('date').annotate(
-                calories_burned_sum=Sum('calories_burned'),
-                total_duration_sum=Sum('total_duration')
-            )
-            
-            # Dữ liệu theo ngày
-            calories_per_day = defaultdict(int)
-            time_per_day = defaultdict(int)
-            
-            for entry in daily_stats:
-                date = entry['date']
-                calories_per_day[date] = entry['calories_burned_sum'] or 0
-                time_per_day[date] = entry['total_duration_sum'] or 0
-            
-            # Tạo mảng kết quả theo đúng thứ tự ngày
-            calories_array = [calories_per_day[d] for d in date_range]
-            time_array = [time_per_day[d] for d in date_range]
-            
-            # Tính toán chỉ số sức khỏe theo ngày
-            daily_health = {}
-            for date in date_range:
-                day_stats = health_stats.filter(date=date)
-                if day_stats.exists():
-                    latest_stat = day_stats.latest('id')
-                    daily_health[date] = {
-                        'weight': latest_stat.weight,
-                        'bmi': latest_stat.bmi,
-                        'water_intake': latest_stat.water_intake,
-                        'step_count': latest_stat.step_count,
-                        'heart_rate': latest_stat.heart_rate,
-                    }
-                else:
-                    daily_health[date] = {
-                        'weight': None,
-                        'bmi': None,
-                        'water_intake': None,
-                        'step_count': None,
-                        'heart_rate': None,
-                    }
-            
-            # Chuyển đổi thành mảng cho từng chỉ số
-            weight_array = [daily_health[d]['weight'] for d in date_range]
-            bmi_array = [daily_health[d]['bmi'] for d in date_range]
-            water_array = [daily_health[d]['water_intake'] for d in date_range]
-            steps_array = [daily_health[d]['step_count'] for d in date_range]
-            heart_rate_array = [daily_health[d]['heart_rate'] for d in date_range]
-            
-        # Tính các giá trị tổng hợp
-        health_summary = {
-            'avg_weight': health_stats.aggregate(Avg('weight'))['weight__avg'],
-            'avg_bmi': health_stats.aggregate(Avg('bmi'))['bmi__avg'],
-            'avg_water_intake': health_stats.aggregate(Avg('water_intake'))['water_intake__avg'],
-            'avg_step_count': health_stats.aggregate(Avg('step_count'))['step_count__avg'],
-            'avg_heart_rate': health_stats.aggregate(Avg('heart_rate'))['heart_rate__avg'],
-        }
-        
-        # Tính sự thay đổi cân nặng trong kỳ
-        weight_change = None
-        if health_stats.exists() and health_stats.count() > 1:
-            earliest = health_stats.earliest('date')
-            latest = health_stats.latest('date')
-            if earliest.weight and latest.weight:
-                weight_change = latest.weight - earliest.weight
-        
+        data.pop('buckets')
+
         return Response({
             'target_user': {
                 'id': target_user.id,
@@ -571,24 +491,106 @@ class PersonalStatisticView(RetrieveAPIView):
             'start_date': start_date,
             'end_date': end_date,
             'period': period,
-            # Dữ liệu tập luyện
-            'total_calories_burned': calories_array,
-            'total_time': time_array,
-            'total_sessions': workout_sessions.count(),
-            # Dữ liệu sức khỏe
-            'weight_data': weight_array,
-            'bmi_data': bmi_array,
-            'water_intake_data': water_array,
-            'step_count_data': steps_array,
-            'heart_rate_data': heart_rate_array,
-            # Thống kê tổng hợp
-            'health_summary': health_summary,
-            'weight_change': weight_change
+            **data
+        })
+
+class ClientStatisticView(generics.GenericAPIView):
+    """Thống kê của nhiều khách hàng trong một yêu cầu (cho chuyên gia/huấn luyện viên)"""
+    permission_classes = [IsAuthenticated]
+    max_users = 100
+
+    @swagger_auto_schema(
+        operation_description="Lấy thống kê của nhiều khách hàng cùng lúc (chỉ dành cho chuyên gia/huấn luyện viên)",
+        manual_parameters=[
+            openapi.Parameter(
+                'user_ids',
+                openapi.IN_QUERY,
+                description="Danh sách ID người dùng, cách nhau bởi dấu phẩy (tối đa 100)",
+                type=openapi.TYPE_STRING,
+                required=True
+            ),
+            openapi.Parameter(
+                'period',
+                openapi.IN_QUERY,
+                description="Khoảng thời gian thống kê (giống api/my-statistics/)",
+                type=openapi.TYPE_STRING,
+                enum=['weekly', 'monthly', 'yearly', 'custom'],
+                default='weekly'
+            ),
+            openapi.Parameter('week', openapi.IN_QUERY, description="Tuần cụ thể (format: YYYY-Wnn)",
+                              type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('month', openapi.IN_QUERY, description="Tháng cụ thể (format: YYYY-MM)",
+                              type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('year', openapi.IN_QUERY, description="Năm cụ thể (format: YYYY)",
+                              type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('start_date', openapi.IN_QUERY, description="Ngày bắt đầu cho period=custom",
+                              type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('end_date', openapi.IN_QUERY, description="Ngày kết thúc cho period=custom",
+                              type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('granularity', openapi.IN_QUERY, description="Độ chi tiết cho period=custom",
+                              type=openapi.TYPE_STRING, enum=['daily', 'weekly', 'monthly'], required=False),
+        ]
+    )
+    def get(self, request):
+        if request.user.role not in [Role.EXPERT.value, Role.COACH.value]:
+            return Response(
+                {'error': 'Bạn không có quyền xem thống kê của người dùng khác'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            user_ids = list(dict.fromkeys(
+                int(value) for value in request.query_params.get('user_ids', '').split(',') if value.strip()
+            ))
+        except ValueError:
+            return Response({'error': 'user_ids phải là danh sách số nguyên'}, status=400)
+        if not user_ids:
+            return Response({'error': 'Thiếu tham số user_ids'}, status=400)
+        if len(user_ids) > self.max_users:
+            return Response({'error': f'Tối đa {self.max_users} người dùng mỗi yêu cầu'}, status=400)
+
+        period = request.query_params.get('period', 'weekly')
+        try:
+            start_date, end_date, granularity = stats.resolve_period(period, request.query_params, now().date())
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        users = {user.id: user for user in User.objects.filter(id__in=user_ids, is_active=True)}
+        found_ids = [user_id for user_id in user_ids if user_id in users]
+
+        # Một truy vấn cho tất cả người dùng chưa có trong cache
+        results = statistics_cache.get_many_or_compute(
+            'my-statistics', found_ids, start_date, end_date, (granularity,),
+            lambda missing: stats.compute_statistics_for_users(missing, start_date, end_date, granularity)
+        )
+
+        clients = []
+        for user_id in found_ids:
+            target_user = users[user_id]
+            data = results[user_id]
+            data.pop('buckets')
+            clients.append({
+                'target_user': {
+                    'id': target_user.id,
+                    'username': target_user.username,
+                    'full_name': f"{target_user.first_name} {target_user.last_name}".strip(),
+                    'role': target_user.role
+                },
+                **data
+            })
+
+        return Response({
+            'start_date': start_date,
+            'end_date': end_date,
+            'period': period,
+            'users': clients,
+            'not_found': [user_id for user_id in user_ids if user_id not in users]
         })
 
-class HealthStatisticViewSet(viewsets.ModelViewSet):
+class HealthStatisticViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = serializers.HealthStatisticSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = paginators.KeysetPagination
 
     def get_target_user(self, request):
         """Xác định target user dựa trên user_id parameter"""
@@ -630,6 +632,20 @@ class HealthStatisticViewSet(viewsets.ModelViewSet):
                 description="ID của người dùng cần xem dữ liệu (chỉ dành cho chuyên gia/huấn luyện viên)",
                 type=openapi.TYPE_INTEGER,
                 required=False
+            ),
+            openapi.Parameter(
+                'cursor',
+                openapi.IN_QUERY,
+                description="Con trỏ trang tiếp theo (lấy từ trường next)",
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
+            openapi.Parameter(
+                'page_size',
+                openapi.IN_QUERY,
+                description="Số bản ghi mỗi trang (tối đa 200)",
+                type=openapi.TYPE_INTEGER,
+                required=False
             )
         ]
     )
@@ -639,32 +655,30 @@ class HealthStatisticViewSet(viewsets.ModelViewSet):
             if error_response:
                 return error_response
 
-            # Lấy dữ liệu và sắp xếp theo ngày giảm dần
-            queryset = HealthStat.objects.filter(user=target_user).order_by('-date')
+            # Lấy dữ liệu theo trang, sắp xếp theo (date, id) giảm dần
+            queryset = HealthStat.objects.filter(user=target_user)
+            page = self.paginate_queryset(queryset)
 
-            # Lấy bản ghi mới nhất cho các giá trị trung bình
-            latest_record = queryset.first()
-
-            # Khởi tạo giá trị mặc định
-            avg_water_intake = 0
-            avg_step_count = 0
-            avg_heart_rate = None
+            # Bản ghi mới nhất: phần tử đầu của trang đầu tiên, các trang sau cần truy vấn riêng
+            if self.paginator.is_first_page:
+                latest_record = page[0] if page else None
+            else:
+                latest_record = queryset.order_by('-date', '-id').first()
 
-            # Nếu có bản ghi mới nhất, lấy các giá trị từ đó
+            # Giá trị mới nhất chỉ trả về một lần thay vì ghi đè vào từng bản ghi
+            latest = {
+                'water_intake': 0,
+                'step_count': 0,
+                'heart_rate': None
+            }
             if latest_record:
-                avg_water_intake = round(latest_record.water_intake, 2) if latest_record.water_intake is not None else 0
-                avg_step_count = int(latest_record.step_count) if latest_record.step_count is not None else 0
-                avg_heart_rate = latest_record.heart_rate
+                latest = {
+                    'water_intake': round(latest_record.water_intake, 2) if latest_record.water_intake is not None else 0,
+                    'step_count': int(latest_record.step_count) if latest_record.step_count is not None else 0,
+                    'heart_rate': latest_record.heart_rate
+                }
 
-            # Serialize dữ liệu
-            serializer = self.get_serializer(queryset, many=True)
-            data = serializer.data
-
-            # Thêm các giá trị trung bình vào mỗi item
-            for item in data:
-                item['water_intake'] = avg_water_intake
-                item['step_count'] = avg_step_count
-                item['heart_rate'] = avg_heart_rate
+            serializer = self.get_serializer(page, many=True)
 
             # Tạo response data với thông tin người dùng
             response_data = {
@@ -674,10 +688,14 @@ class HealthStatisticViewSet(viewsets.ModelViewSet):
                     'full_name': f"{target_user.first_name} {target_user.last_name}".strip(),
                     'role': target_user.role
                 },
-                'results': data
+                'latest': latest,
+                'next': self.paginator.get_next_link(),
+                'results': serializer.data
             }
 
             return Response(response_data)
+        except NotFound:
+            raise
         except Exception as e:
             # Log lỗi để debug
             print(f"Error in HealthStatisticViewSet.list: {str(e)}")
@@ -760,8 +778,11 @@ class HealthStatisticViewSet(viewsets.ModelViewSet):
             start_date = period_data['start_date']
             end_date = period_data['end_date']
 
-            # Lấy dữ liệu và tính toán thay đổi
-            result = self._calculate_changes_from_records(target_user, start_date, end_date)
+            # Lấy dữ liệu và tính toán thay đổi (có cache theo người dùng)
+            result = statistics_cache.get_or_compute(
+                'track-changes', target_user.id, start_date, end_date, (),
+                lambda: self._calculate_changes_from_records(target_user, start_date, end_date)
+            )
 
             # Tạo dữ liệu trả về
             data = {
@@ -791,6 +812,79 @@ class HealthStatisticViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @swagger_auto_schema(
+        operation_description="Chuỗi thời gian của một chỉ số sức khỏe, được giảm số điểm ở máy chủ (LTTB hoặc min/max)",
+        manual_parameters=[
+            openapi.Parameter('user_id', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=False,
+                              description="ID của người dùng cần xem dữ liệu (chỉ dành cho chuyên gia/huấn luyện viên)"),
+            openapi.Parameter('metric', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=['weight', 'bmi', 'water_intake', 'step_count', 'heart_rate'], default='weight', description="Chỉ số cần lấy"),
+            openapi.Parameter('start_date', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=False,
+                              description="Ngày bắt đầu (format: YYYY-MM-DD)"),
+            openapi.Parameter('end_date', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=False,
+                              description="Ngày kết thúc (format: YYYY-MM-DD)"),
+            openapi.Parameter('max_points', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, default=500,
+                              description="Số điểm tối đa trả về (3 - 5000)"),
+            openapi.Parameter('method', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=['lttb', 'minmax'], default='lttb',
+                              description="Thuật toán giảm số điểm"),
+        ]
+    )
+    @action(detail=False, methods=['get'], url_path='series')
+    def series(self, request):
+        """
+        Trả về chuỗi (thời điểm, giá trị) của một chỉ số với số điểm không vượt quá max_points
+        """
+        target_user, error_response = self.get_target_user(request)
+        if error_response:
+            return error_response
+
+        metric = request.query_params.get('metric', 'weight')
+        if metric not in rollups.HEALTH_FIELDS:
+            return Response({'error': f"Invalid metric. Use {', '.join(rollups.HEALTH_FIELDS)}"}, status=400)
+
+        method = request.query_params.get('method', downsampling.LTTB)
+        if method not in downsampling.METHODS:
+            return Response({'error': 'Invalid method. Use lttb or minmax'}, status=400)
+
+        try:
+            max_points = int(request.query_params.get('max_points', 500))
+            start_date = request.query_params.get('start_date')
+            end_date = request.query_params.get('end_date')
+            start_date = date.fromisoformat(start_date) if start_date else None
+            end_date = date.fromisoformat(end_date) if end_date else None
+        except ValueError:
+            return Response({'error': 'Invalid max_points or date format. Use YYYY-MM-DD'}, status=400)
+        max_points = max(3, min(max_points, 5000))
+
+        queryset = HealthStat.objects.filter(user=target_user, **{f'{metric}__isnull': False})
+        if start_date:
+            queryset = queryset.filter(date__gte=datetime.combine(start_date, datetime.min.time()))
+        if end_date:
+            queryset = queryset.filter(date__lt=datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+
+        points = [
+            (moment.timestamp(), value, moment)
+            for moment, value in queryset.order_by('date', 'id').values_list('date', metric).iterator(chunk_size=5000)
+        ]
+        sampled = downsampling.downsample(points, max_points, method)
+
+        return Response({
+            'target_user': {
+                'id': target_user.id,
+                'username': target_user.username,
+                'full_name': f"{target_user.first_name} {target_user.last_name}".strip(),
+                'role': target_user.role
+            },
+            'metric': metric,
+            'method': method,
+            'total_points': len(points),
+            'points': [
+                {'date': moment.strftime('%Y-%m-%d %H:%M:%S'), 'value': value}
+                for _, value, moment in sampled
+            ]
+        })
+
     def _get_period_dates(self, period, request, today):
         """
         Xác định ngày bắt đầu và kết thúc dựa trên period và tham số
@@ -892,62 +986,15 @@ class HealthStatisticViewSet(viewsets.ModelViewSet):
     def _calculate_changes_from_records(self, user, start_date, end_date):
         """
         Lấy bản ghi đầu tiên và cuối cùng, tính toán thay đổi
+        (cân nặng, chiều cao, BMI, nhịp tim)
         """
-        # Lấy bản ghi đầu tiên - sắp xếp theo ngày tăng dần, lấy bản ghi sớm nhất
-        first_records = HealthStat.objects.filter(
-            user=user,
-            date__range=(start_date, end_date)
-        ).order_by('date')
-
-        first_record = None
-        if first_records.exists():
-            # Lấy ngày đầu tiên có bản ghi
-            first_date = first_records.first().date
-            # Lấy bản ghi đầu tiên của ngày đầu tiên
-            first_record = HealthStat.objects.filter(
-                user=user,
-                date=first_date
-            ).order_by('id').first()
-
-        # Lấy bản ghi cuối cùng - sắp xếp theo ngày giảm dần và ID giảm dần
-        # Để lấy bản ghi mới nhất (ID lớn nhất) của ngày mới nhất
-        last_record = HealthStat.objects.filter(
-            user=user,
-            date__range=(start_date, end_date)
-        ).order_by('-date', '-id').first()
-
-        # Tính sự thay đổi nếu có cả hai bản ghi
-        changes = {
-            'weight_change': None,
-            'height_change': None
-        }
+        return stats.compute_changes(user, start_date, end_date)
 
-        if first_record and last_record and first_record.id != last_record.id:
-            if first_record.weight is not None and last_record.weight is not None:
-                changes['weight_change'] = round(last_record.weight - first_record.weight, 2)
-
-            if first_record.height is not None and last_record.height is not None:
-                changes['height_change'] = round(last_record.height - first_record.height, 2)
-
-        return {
-            'first_record': {
-                'date': first_record.date if first_record else None,
-                'weight': first_record.weight if first_record else None,
-                'height': first_record.height if first_record else None
-            } if first_record else None,
-            'last_record': {
-                'date': last_record.date if last_record else None,
-                'weight': last_record.weight if last_record else None,
-                'height': last_record.height if last_record else None,
-                'id': last_record.id if last_record else None  # Thêm ID để dễ debug
-            } if last_record else None,
-            'changes': changes
-        }
-
-class ExpertCoachListView(generics.ListAPIView):
+class ExpertCoachListView(OptimizedQuerysetMixin, generics.ListAPIView):
     """API lấy danh sách chuyên gia và huấn luyện viên"""
     serializer_class = serializers.ExpertCoachSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = paginators.UserKeysetPagination
 
     def get_queryset(self):
         """
@@ -957,26 +1004,27 @@ class ExpertCoachListView(generics.ListAPIView):
         queryset = User.objects.filter(
             is_active=True,
             role__in=[Role.EXPERT.value, Role.COACH.value]
-        ).order_by('-date_joined')
+        )
 
         # Filter theo role cụ thể nếu có
+        roles = [Role.EXPERT.value, Role.COACH.value]
         role_filter = self.request.query_params.get('role', None)
-        if role_filter and role_filter in [Role.EXPERT.value, Role.COACH.value]:
+        if role_filter and role_filter in roles:
             queryset = queryset.filter(role=role_filter)
+            roles = [role_filter]
 
-        # Tìm kiếm theo tên
+        # Tìm kiếm theo tên qua chỉ mục UserSearchTerm (lọc role ngay trên index)
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                models.Q(first_name__icontains=search) |
-                models.Q(last_name__icontains=search) |
-                models.Q(username__icontains=search)
-            )
+            matches = user_search.matching_users(search, roles=roles)
+            if matches is not None:
+                queryset = queryset.filter(id__in=matches)
 
-        return queryset
+        return queryset.order_by('-date_joined', '-id')
 
     @swagger_auto_schema(
-        operation_description="Lấy danh sách chuyên gia và huấn luyện viên",
+        operation_description="Lấy danh sách chuyên gia và huấn luyện viên (mảng, mới tham gia trước). "
+                              "Gửi cursor hoặc page_size để phân trang theo con trỏ, khi đó trả về {next, results}",
         manual_parameters=[
             openapi.Parameter(
                 'role',
@@ -988,19 +1036,22 @@ class ExpertCoachListView(generics.ListAPIView):
             openapi.Parameter(
                 'search',
                 openapi.IN_QUERY,
-                description="Tìm kiếm theo tên (first_name, last_name, username)",
+                description="Tìm kiếm theo tên (first_name, last_name, username), không phân biệt dấu, "
+                            "khớp theo tiền tố hoặc một phần của từ",
                 type=openapi.TYPE_STRING
-            )
+            ),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Con trỏ trang tiếp theo (lấy từ 'next')",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Số người mỗi trang (1-100), bật phân trang",
+                              type=openapi.TYPE_INTEGER),
         ],
         responses={
             200: openapi.Response(
-                description="Danh sách chuyên gia/huấn luyện viên",
+                description="Danh sách chuyên gia/huấn luyện viên khi phân trang (không phân trang: mảng results)",
                 schema=openapi.Schema(
                     type=openapi.TYPE_OBJECT,
                     properties={
-                        'count': openapi.Schema(type=openapi.TYPE_INTEGER),
                         'next': openapi.Schema(type=openapi.TYPE_STRING, nullable=True),
-                        'previous': openapi.Schema(type=openapi.TYPE_STRING, nullable=True),
                         'results': openapi.Schema(
                             type=openapi.TYPE_ARRAY,
                             items=openapi.Schema(
@@ -1015,6 +1066,10 @@ class ExpertCoachListView(generics.ListAPIView):
                                     'role': openapi.Schema(type=openapi.TYPE_STRING),
                                     'avatar': openapi.Schema(type=openapi.TYPE_STRING),
                                     'avatar_url': openapi.Schema(type=openapi.TYPE_STRING),
+                                    'avatar_urls': openapi.Schema(
+                                        type=openapi.TYPE_OBJECT,
+                                        description="URL ảnh gốc (original) và ảnh thu nhỏ (small 64px, medium 256px)"
+                                    ),
                                     'date_of_birth': openapi.Schema(type=openapi.TYPE_STRING, format='date'),
                                     'health_goals': openapi.Schema(type=openapi.TYPE_STRING),
                                     'date_joined': openapi.Schema(type=openapi.TYPE_STRING, format='date-time'),
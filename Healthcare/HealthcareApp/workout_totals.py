@@ -0,0 +1,164 @@
+"""
+Tổng thời gian (total_duration) và calories (calories_burned) của WorkoutSession
+được tính bằng truy vấn tập hợp trên bảng trung gian WorkoutSession.exercise,
+dùng chung cho serializer, admin (qua m2m_changed) và các lệnh quản trị.
+
+Khi duration/calories_burned của một Exercise thay đổi, các buổi tập chứa bài
+tập đó được tính lại theo từng nhóm id (propagate_exercise), chạy nền sau khi
+transaction được commit để không chặn yêu cầu đang xử lý.
+"""
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import FloatField, F, IntegerField, OuterRef, QuerySet, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from HealthcareApp import rollups
+from HealthcareApp.models import WorkoutSession
+
+logger = logging.getLogger(__name__)
+
+Membership = WorkoutSession.exercise.through
+
+PROPAGATION_CHUNK_SIZE = 1000
+
+# Một luồng nền duy nhất: các lần lan truyền chạy tuần tự, không tranh chấp khóa với nhau
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='exercise-propagation')
+
+
+def _sum_of(field, output_field):
+    # Tổng `field` của các bài tập trong buổi tập (subquery tương quan theo id buổi tập)
+    totals = Membership.objects.filter(
+        workoutsession=OuterRef('pk')
+    ).order_by().values('workoutsession').annotate(
+        total=Sum(f'exercise__{field}')
+    ).values('total')
+    return Coalesce(Subquery(totals), Value(0), output_field=output_field)
+
+
+def totals_expressions():
+    """Biểu thức tính lại total_duration và calories_burned, dùng cho annotate() hoặc update()"""
+    return {
+        'total_duration': _sum_of('duration', IntegerField()),
+        'calories_burned': _sum_of('calories_burned', FloatField()),
+    }
+
+
+def recompute_sessions(sessions):
+    """
+    Tính lại tổng của các buổi tập `sessions` (queryset hoặc danh sách id).
+    Chỉ các buổi tập có tổng thay đổi bị cập nhật (một SELECT và một UPDATE),
+    chênh lệch được cộng vào bảng tổng hợp của người dùng và ngày liên quan.
+    Trả về số buổi tập đã cập nhật.
+    """
+    if not isinstance(sessions, QuerySet):
+        sessions = WorkoutSession.objects.filter(pk__in=list(sessions))
+
+    expressions = totals_expressions()
+    changed = list(sessions.annotate(
+        new_duration=expressions['total_duration'],
+        new_calories=expressions['calories_burned'],
+    ).exclude(
+        total_duration=F('new_duration'),
+        calories_burned=F('new_calories'),
+    ).values_list('pk', 'user_id', 'updated_date', 'is_active',
+                  'total_duration', 'calories_burned', 'new_duration', 'new_calories'))
+    if not changed:
+        return 0
+
+    # Bảng tổng hợp chỉ tính buổi tập đang hoạt động, theo ngày updated_date
+    deltas = defaultdict(lambda: [0, 0])
+    for _, user_id, updated, is_active, duration, calories, new_duration, new_calories in changed:
+        if is_active:
+            delta = deltas[(user_id, updated.date())]
+            delta[0] += new_duration - duration
+            delta[1] += new_calories - calories
+
+    with transaction.atomic():
+        # update() không gửi post_save nên tự cập nhật bảng tổng hợp
+        WorkoutSession.objects.filter(pk__in=[row[0] for row in changed]).update(**totals_expressions())
+        rollups.apply_workout_deltas(deltas)
+    return len(changed)
+
+
+def recompute_all(chunk_size=PROPAGATION_CHUNK_SIZE):
+    """
+    Tính lại tổng của toàn bộ buổi tập, duyệt theo id tăng dần, mỗi lần
+    `chunk_size` buổi tập. Như recompute_sessions, chỉ buổi tập có tổng thay
+    đổi bị cập nhật và bảng tổng hợp được cộng chênh lệch tương ứng.
+    Trả về số buổi tập đã cập nhật.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        session_ids = list(WorkoutSession.objects.filter(pk__gt=last_id).order_by('pk').values_list(
+            'pk', flat=True)[:chunk_size])
+        if not session_ids:
+            return updated
+        updated += recompute_sessions(session_ids)
+        last_id = session_ids[-1]
+
+
+def exercises_changed(session_ids):
+    """
+    Danh sách bài tập của các buổi tập `session_ids` thay đổi: tính lại tổng và
+    cập nhật updated_date như khi lưu buổi tập (GET có điều kiện dựa vào
+    updated_date). Buổi tập được tính vào ngày updated_date nên bảng tổng hợp
+    được tính lại cho cả ngày cũ và ngày mới.
+    """
+    sessions = WorkoutSession.objects.filter(pk__in=list(session_ids))
+    origins = list(sessions.values_list('user_id', 'updated_date'))
+    if not origins:
+        return 0
+
+    moment = timezone.now()
+    with transaction.atomic():
+        updated = sessions.update(updated_date=moment, **totals_expressions())
+        rollups.refresh_days([(user_id, day.date()) for user_id, day in origins]
+                             + [(user_id, moment.date()) for user_id, _ in origins])
+    return updated
+
+
+def propagate_exercise(exercise_id, chunk_size=PROPAGATION_CHUNK_SIZE):
+    """
+    Tính lại tổng của mọi buổi tập chứa bài tập `exercise_id`, duyệt bảng
+    trung gian theo id buổi tập tăng dần, mỗi lần `chunk_size` buổi tập.
+    Trả về số buổi tập đã cập nhật.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        session_ids = list(Membership.objects.filter(
+            exercise_id=exercise_id, workoutsession_id__gt=last_id
+        ).order_by('workoutsession_id').values_list('workoutsession_id', flat=True)[:chunk_size])
+        if not session_ids:
+            return updated
+        updated += recompute_sessions(session_ids)
+        last_id = session_ids[-1]
+
+
+def _run_propagation(exercise_id):
+    try:
+        propagate_exercise(exercise_id)
+    except Exception:
+        logger.exception("Lỗi khi cập nhật tổng của các buổi tập chứa bài tập %s", exercise_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_propagation(exercise_id):
+    """
+    Lan truyền thay đổi của bài tập sau khi transaction hiện tại được commit:
+    chạy nền nếu EXERCISE_PROPAGATION_ASYNC, ngược lại chạy ngay.
+    """
+    def run():
+        if getattr(settings, 'EXERCISE_PROPAGATION_ASYNC', True):
+            _executor.submit(_run_propagation, exercise_id)
+        else:
+            propagate_exercise(exercise_id)
+
+    transaction.on_commit(run)